@@ -0,0 +1,102 @@
+"""
+/api/chat, answered from a local BM25 index (chat/retrieval.py) over the
+datasets, the recommendation rules and the pest treatment guide.
+"""
+import json
+import logging
+import threading
+from flask import Blueprint, Response, jsonify, request
+
+from chat.retrieval import BM25Index, answer_chunks, build_passages
+from pest_detection.treatment import TREATMENT_INFO
+from .data import get_dataset
+from .recommendation import CROP_REQUIREMENTS, SOIL_TRAITS
+from .weather import weather_advisory_rules
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('chat', __name__)
+
+# Datasets read by these endpoints (see api/data.py): the retrieval index
+DATASETS_USED = ('crop', 'fertilizer')
+
+# Retrieval index for /api/chat (see chat/retrieval.py), built when the blueprint is registered
+chat_index = None
+_chat_index_lock = threading.Lock()
+
+def get_chat_index():
+    global chat_index
+    if chat_index is None:
+        with _chat_index_lock:
+            if chat_index is None:
+                chat_index = BM25Index(build_passages(get_dataset('crop'), get_dataset('fertilizer'),
+                                                      CROP_REQUIREMENTS, SOIL_TRAITS, TREATMENT_INFO,
+                                                      weather_advisory_rules()))
+                logger.info("Chat index built with %d passages", len(chat_index.passages))
+    return chat_index
+
+@bp.record_once
+def build_index_on_register(state):
+    # Synchronous (no thread), so it is also safe in serve.py's master before the fork
+    get_chat_index()
+
+def preload():
+    """Build the chat index now (see serve.py)."""
+    get_chat_index()
+
+CHAT_FALLBACK = ("I couldn't find anything on that in the local knowledge base. Try asking about a crop "
+                 "(e.g. rice, wheat, tomato), a fertilizer (e.g. urea, DAP), a soil type, or a plant "
+                 "problem such as pests, disease or nutrient deficiency.")
+
+@bp.route('/api/chat', methods=['POST', 'OPTIONS'])
+def chat():
+    if request.method == 'OPTIONS':
+        response = jsonify({'success': True})
+        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        return response
+
+    # Read the body before streaming starts
+    data = request.get_json(silent=True)
+
+    def generate():
+        try:
+            if not data:
+                yield 'data: ' + json.dumps({
+                    'success': False,
+                    'error': 'No data received in request.'
+                }) + '\n\n'
+                return
+                
+            user_message = str(data.get('message', '')).strip()
+            
+            if not user_message:
+                yield 'data: ' + json.dumps({
+                    'success': False,
+                    'error': 'Message cannot be empty.'
+                }) + '\n\n'
+                return
+
+            chunks, sources = answer_chunks(get_chat_index(), user_message[:2000])
+            if not chunks:
+                chunks = [CHAT_FALLBACK]
+
+            # One event per retrieved passage, as soon as it is ready
+            for chunk in chunks:
+                yield f'data: {json.dumps({"chunk": chunk, "success": True})}\n\n'
+            # Send completion signal
+            yield 'data: ' + json.dumps({
+                'success': True,
+                'done': True,
+                'full_response': ''.join(chunks),
+                'sources': sources
+            }) + '\n\n'
+        except Exception as e:
+            print(f"Error in chat endpoint: {str(e)}")
+            yield 'data: ' + json.dumps({
+                'success': False,
+                'error': 'An error occurred while processing your request.',
+                'details': str(e)
+            }) + '\n\n'
+    return Response(generate(), mimetype='text/event-stream')
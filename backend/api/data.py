@@ -0,0 +1,44 @@
+"""
+Datasets shared by the API blueprints, read on first use.
+
+Each CSV under datasets/ is read once per process by the first request
+that needs it (or by a preloading server before it forks workers), so a
+worker that only serves, say, market prices never imports pandas or reads
+the soil survey. Blueprint modules list the datasets they read in
+DATASETS_USED.
+"""
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATASETS_DIR = os.path.join(PROJECT_ROOT, 'datasets')
+
+DATASETS = {
+    'soil': 'soil_data.csv',
+    'crop': 'crop_data.csv',
+    'fertilizer': 'fertilizer_data.csv'
+}
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+
+def get_dataset(name):
+    """DataFrame for one of DATASETS, read on first use; None if it can't be read."""
+    if name in _datasets:
+        return _datasets[name]
+    with _datasets_lock:
+        if name not in _datasets:
+            import pandas as pd
+            try:
+                _datasets[name] = pd.read_csv(os.path.join(DATASETS_DIR, DATASETS[name]))
+            except Exception as e:
+                logger.error("Error loading %s data: %s", name, e)
+                _datasets[name] = None
+    return _datasets[name]
+
+def is_dataset_loaded(name):
+    """True if `name` was read successfully (without reading it)."""
+    return _datasets.get(name) is not None
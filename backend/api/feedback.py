@@ -0,0 +1,72 @@
+"""
+Feedback endpoints: rating submission (feedback/writer.py) and per-day
+rating stats (feedback/index.py).
+"""
+import time
+from datetime import date, datetime
+from flask import Blueprint, jsonify, request
+
+from feedback.writer import get_feedback_writer
+from feedback.index import get_feedback_index, refresh_feedback_index
+
+bp = Blueprint('feedback', __name__)
+
+@bp.route('/api/feedback', methods=['POST'])
+def feedback():
+    try:
+        data = request.get_json(force=True)
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "payload": data,
+            "client_ip": request.remote_addr
+        }
+        # Written in batches by a background thread (see feedback/writer.py)
+        if not get_feedback_writer().submit(record):
+            response = jsonify({"success": False, "error": "Feedback queue is full, please retry shortly"})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        return jsonify({"success": True})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@bp.route('/api/feedback/stats', methods=['GET'])
+def feedback_stats():
+    """
+    Rating distribution per feature per day.
+
+    Served from aggregates kept up to date by incremental compaction of the
+    feedback segments (see feedback/index.py); optional `feature`, `start`
+    and `end` (ISO dates, inclusive) or `days` narrow the result. With
+    `hours`, "window" adds the distribution per feature over the last
+    `hours` hours, counted from the column chunks.
+    """
+    try:
+        feature = (request.args.get('feature') or '').strip().lower() or None
+        start = request.args.get('start')
+        end = request.args.get('end')
+        if request.args.get('days'):
+            days = max(1, min(int(request.args['days']), 3650))
+            start = date.fromordinal(datetime.now().date().toordinal() - days + 1).isoformat()
+        for value in (start, end):
+            if value:
+                date.fromisoformat(value)  # ValueError -> 400
+        hours = float(request.args['hours']) if request.args.get('hours') else None
+
+        # At most one compaction every FEEDBACK_COMPACT_INTERVAL seconds per worker
+        refresh_feedback_index()
+        index = get_feedback_index()
+        result = {
+            "success": True,
+            "start": start,
+            "end": end,
+            "records": index.meta()['records'],
+            "features": index.daily_stats(feature=feature, start=start, end=end)
+        }
+        if hours is not None:
+            result["hours"] = hours
+            result["window"] = index.window_stats(feature=feature,
+                                                  start=time.time() - max(0.0, min(hours, 24 * 3650)) * 3600)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
@@ -0,0 +1,100 @@
+"""
+Language endpoints: translation (deep_translator) and text-to-speech
+(gTTS), both imported on first use. The *_async variants make the same
+Google calls on an aiohttp ClientSession for asgi.py.
+"""
+import base64
+import re
+from io import BytesIO
+from flask import Blueprint, jsonify, request
+
+bp = Blueprint('i18n', __name__)
+
+# What deep_translator's GoogleTranslator requests and parses
+GOOGLE_TRANSLATE_URL = "https://translate.google.com/m"
+TRANSLATION_ELEMENTS = ({"class": "t0"}, {"class": "result-container"})
+MAX_TRANSLATE_CHARS = 5000
+# gTTS's audio chunk in a batchexecute response line
+TTS_AUDIO = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+
+def translate_text(text: str, target_lang: str = "en") -> str:
+    """Translate text to target language using deep_translator if available; fallback to original text."""
+    try:
+        from deep_translator import GoogleTranslator
+        if not text:
+            return text
+        if target_lang and target_lang != "en":
+            return GoogleTranslator(source="auto", target=target_lang).translate(text)
+        return text
+    except Exception:
+        # If translation fails or package missing, return original
+        return text
+
+async def translate_text_async(session, text: str, target_lang: str = "en") -> str:
+    """translate_text() on an aiohttp ClientSession; falls back to the original text the same way."""
+    try:
+        if not text or not target_lang or target_lang == "en" or len(text) > MAX_TRANSLATE_CHARS:
+            return text
+        from bs4 import BeautifulSoup
+        async with session.get(GOOGLE_TRANSLATE_URL, params={"tl": target_lang, "sl": "auto", "q": text.strip()}) as r:
+            r.raise_for_status()
+            soup = BeautifulSoup(await r.text(), "html.parser")
+        for query in TRANSLATION_ELEMENTS:
+            element = soup.find("div", query)
+            if element:
+                return element.get_text(strip=True)
+        return text
+    except Exception:
+        return text
+
+def synthesize_speech(text: str, lang: str = "en") -> bytes:
+    """MP3 audio of `text` from gTTS."""
+    from gtts import gTTS
+    buf = BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(buf)
+    return buf.getvalue()
+
+async def synthesize_speech_async(session, text: str, lang: str = "en") -> bytes:
+    """synthesize_speech() on an aiohttp ClientSession: gTTS validates and splits the text, the requests are sent here."""
+    from gtts import gTTS
+    tts = gTTS(text=text, lang=lang)
+    url = f"https://translate.google.{tts.tld}/_/TranslateWebserverUi/data/batchexecute"
+    audio = []
+    for body in tts.get_bodies():
+        async with session.post(url, data=body, headers=tts.GOOGLE_TTS_HEADERS) as r:
+            r.raise_for_status()
+            lines = (await r.text()).splitlines()
+        chunks = [TTS_AUDIO.search(line) for line in lines if "jQ1olc" in line]
+        if not chunks or not all(chunks):
+            raise RuntimeError("No audio in the TTS response")
+        audio += [base64.b64decode(chunk.group(1)) for chunk in chunks]
+    return b"".join(audio)
+
+@bp.route('/api/translate', methods=['POST'])
+def api_translate():
+    try:
+        data = request.get_json(force=True)
+        text = data.get('text', '')
+        lang = data.get('language', 'en')
+        out = translate_text(text, lang)
+        return jsonify({"success": True, "translated": out, "language": lang})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@bp.route('/api/tts', methods=['POST'])
+def tts():
+    """Text-to-speech: returns base64-encoded MP3 audio for given text and language."""
+    try:
+        data = request.get_json(force=True)
+        text = data.get('text')
+        lang = data.get('language', 'en')
+        if not text:
+            return jsonify({"success": False, "error": "text is required"}), 400
+        try:
+            b64 = base64.b64encode(synthesize_speech(text, lang)).decode('utf-8')
+            return jsonify({"success": True, "audio_base64": b64, "format": "mp3"})
+        except Exception as e:
+            return jsonify({"success": False, "error": f"TTS failed: {e}"}), 500
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
@@ -0,0 +1,202 @@
+"""
+Market price endpoints: current prices, history and bulk history, from
+the local market store (market/store.py) when data has been ingested,
+else mock series (market/prices.py).
+"""
+import os
+from datetime import datetime
+import numpy as np
+from flask import Blueprint, jsonify, request
+
+from market.prices import UNIT as MARKET_UNIT, current_prices, history_matrix, mock_rolling_stats, price_history
+from market.store import get_market_store, from_ordinals
+
+bp = Blueprint('market', __name__)
+
+# Longest window served from the market store, and accepted `freq` values
+MARKET_HISTORY_MAX_DAYS = 3650
+MARKET_FREQUENCIES = {'d': 'D', 'daily': 'D', 'w': 'W', 'weekly': 'W', 'm': 'M', 'monthly': 'M'}
+MARKET_FREQUENCY_NAMES = {'D': 'daily', 'W': 'weekly', 'M': 'monthly'}
+# Most series one bulk request may ask for
+MARKET_BULK_MAX_SERIES = int(os.getenv("MARKET_BULK_MAX_SERIES", "500"))
+
+def market_freq(value, days):
+    """Store downsampling code for a `freq` parameter; by default weekly beyond 180 days, monthly beyond 2 years."""
+    if not value:
+        return 'M' if days > 730 else 'W' if days > 180 else 'D'
+    freq = MARKET_FREQUENCIES.get(str(value).lower())
+    if freq is None:
+        raise ValueError("freq must be daily, weekly or monthly")
+    return freq
+
+def market_series_points(result):
+    """Store query result -> list of {"date", "min", "avg", "max"} points."""
+    dates = from_ordinals(result['date']).astype(str).tolist()
+    return [
+        {"date": d, "min": int(round(mn)), "avg": int(round(av)), "max": int(round(mx))}
+        for d, mn, av, mx in zip(dates, result['min'].tolist(), result['modal'].tolist(), result['max'].tolist())
+    ]
+
+@bp.route('/api/market-prices', methods=['GET'])
+def market_prices():
+    """Return market price tracking for a crop and state (mock + hook for integration)."""
+    try:
+        crop = (request.args.get('crop') or 'wheat').lower()
+        state = (request.args.get('state') or 'Maharashtra').strip()
+        market = (request.args.get('market') or '').strip()
+
+        # Latest ingested day from the local store, else the mock band
+        part = get_market_store().partition(crop, state)
+        if part is not None and len(part):
+            # Newest day with data for the market (or any market) in the last 90 days
+            latest = get_market_store().query(crop, state, start=part.date_range()[1] - 90, market=market or None)
+            if not len(latest['date']):
+                return jsonify({"success": False, "error": f"No recent prices for market '{market}'"}), 404
+            # Precomputed at ingest: 7/30/90-day moving average, volatility and min/max band
+            rolling = get_market_store().rolling(crop, state, market=market or None)
+            entry = {
+                "min": int(round(float(latest['min'][-1]))),
+                "avg": int(round(float(latest['modal'][-1]))),
+                "max": int(round(float(latest['max'][-1]))),
+                "unit": MARKET_UNIT, "crop": crop, "state": part.meta['state'], "source": "store",
+                "as_of": str(from_ordinals(latest['date'][-1])),
+                "markets": int(latest['count'][-1]),
+                "market": market or None,
+                "rolling": rolling['stats'] if rolling else None
+            }
+            return jsonify({"success": True, "prices": entry})
+
+        prices = current_prices(crop, state)
+        entry = {**prices, "unit": MARKET_UNIT, "crop": crop, "state": state, "source": "mock", "note": "State-wise variation applied. Integrate Agmarknet for live data.",
+                 "rolling": mock_rolling_stats(crop, state, datetime.utcnow().date())}
+        return jsonify({"success": True, "prices": entry})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@bp.route('/api/market-prices/history', methods=['GET'])
+def market_prices_history():
+    """
+    Return historical market price trends for a crop and state for the last `days` (default 30).
+
+    Ingested data (see market/store.py) is served for up to 10 years,
+    downsampled with `freq` (daily, weekly or monthly; by default weekly
+    beyond 180 days and monthly beyond 2 years). Without it, a mock series
+    of up to 120 days is returned.
+    """
+    try:
+        crop = (request.args.get('crop') or 'wheat').lower()
+        state = (request.args.get('state') or 'Maharashtra').strip()
+        district = (request.args.get('district') or '').strip()
+        days = int(request.args.get('days', 30))
+
+        store_days = max(7, min(days, MARKET_HISTORY_MAX_DAYS))
+        freq = market_freq(request.args.get('freq'), store_days)
+        # Window ends at the newest ingested day (or today, if the data is current)
+        result = get_market_store().history(crop, state, store_days, district=district or None, freq=freq,
+                                            today=datetime.utcnow().date().toordinal())
+        if result is not None:
+            return jsonify({
+                "success": True,
+                "unit": MARKET_UNIT,
+                "crop": crop,
+                "state": result['state'],
+                "district": district or None,
+                "days": store_days,
+                "freq": MARKET_FREQUENCY_NAMES[freq],
+                "source": "store",
+                "series": market_series_points(result)
+            })
+
+        days = max(7, min(days, 120))
+
+        # Same inputs on the same day give the same series on every worker (memoized)
+        series = price_history(crop, state, district, days, datetime.utcnow().date())
+
+        return jsonify({
+            "success": True,
+            "unit": MARKET_UNIT,
+            "crop": crop,
+            "state": state,
+            "district": district or None,
+            "days": days,
+            "series": series
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@bp.route('/api/market-prices/bulk', methods=['GET', 'POST'])
+def market_prices_bulk():
+    """
+    Price history for every combination of `crops` x `states` x `districts`
+    in one request (JSON body lists, or comma-separated query parameters).
+
+    Series are returned column-wise: series.crop[i], series.state[i], ...,
+    series.date[i] and series.avg[i] describe the i-th series. Ingested
+    data comes from the market store (see /history for `days` and `freq`);
+    the remaining combinations are computed together as mock series.
+    """
+    try:
+        params = (request.get_json(silent=True) or {}) if request.method == 'POST' else {}
+
+        def param_list(name):
+            value = params.get(name, request.args.get(name))
+            if value is None:
+                return []
+            if isinstance(value, str):
+                value = value.split(',')
+            return [str(v).strip() for v in value if str(v).strip()]
+
+        crops = list(dict.fromkeys(c.lower() for c in param_list('crops'))) or ['wheat']
+        states = list(dict.fromkeys(param_list('states'))) or ['Maharashtra']
+        districts = list(dict.fromkeys(param_list('districts'))) or ['']
+        days = int(params.get('days', request.args.get('days', 30)))
+        count = len(crops) * len(states) * len(districts)
+        if count > MARKET_BULK_MAX_SERIES:
+            return jsonify({"success": False, "error": f"Too many series ({count}); at most {MARKET_BULK_MAX_SERIES} per request"}), 400
+
+        today = datetime.utcnow().date()
+        store_days = max(7, min(days, MARKET_HISTORY_MAX_DAYS))
+        mock_days = max(7, min(days, 120))
+        freq = market_freq(params.get('freq', request.args.get('freq')), store_days)
+
+        # All mock combinations in one vectorized pass; only the ones without store data are used
+        ordinals, mock_min, mock_avg, mock_max = history_matrix(crops, states, districts, mock_days, today)
+        mock_dates = from_ordinals(ordinals).astype(str).tolist()
+
+        columns = {key: [] for key in ("crop", "state", "district", "source", "freq", "date", "min", "avg", "max")}
+        store = get_market_store()
+        for i, crop in enumerate(crops):
+            for j, state in enumerate(states):
+                for k, district in enumerate(districts):
+                    result = store.history(crop, state, store_days, district=district or None, freq=freq,
+                                           today=today.toordinal())
+                    if result is not None:
+                        columns["state"].append(result['state'])
+                        columns["source"].append("store")
+                        columns["freq"].append(MARKET_FREQUENCY_NAMES[freq])
+                        columns["date"].append(from_ordinals(result['date']).astype(str).tolist())
+                        columns["min"].append(np.rint(result['min']).astype(int).tolist())
+                        columns["avg"].append(np.rint(result['modal']).astype(int).tolist())
+                        columns["max"].append(np.rint(result['max']).astype(int).tolist())
+                    else:
+                        columns["state"].append(state)
+                        columns["source"].append("mock")
+                        columns["freq"].append("daily")
+                        columns["date"].append(mock_dates)
+                        columns["min"].append(mock_min[i, j, k].tolist())
+                        columns["avg"].append(mock_avg[i, j, k].tolist())
+                        columns["max"].append(mock_max[i, j, k].tolist())
+                    columns["crop"].append(crop)
+                    columns["district"].append(district or None)
+
+        return jsonify({
+            "success": True,
+            "unit": MARKET_UNIT,
+            "days": {"store": store_days, "mock": mock_days},
+            "count": count,
+            "series": columns
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
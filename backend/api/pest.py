@@ -0,0 +1,530 @@
+"""
+Pest detection endpoints: single image, streamed batches, queued jobs and
+the /metrics stage histograms.
+
+torch and torchvision (pest_detection/model.py) are imported by the
+background warm-up started when the blueprint is registered, or by the
+first prediction with PEST_WARMUP=0. With PEST_MODEL_SOCKET set,
+predictions go to a shared model server (python -m pest_detection.server)
+and this process never imports torch.
+"""
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from flask import Blueprint, Response, jsonify, request
+from PIL import Image
+
+from pest_detection.utils import decode_image, fit_image, is_leaf_image
+from pest_detection.cache import PredictionCache, perceptual_hash
+from pest_detection.metrics import StageTimer, render_metrics
+from pest_detection.jobs import JobQueue, QueueFull
+from pest_detection.tiers import check_requested_tier
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('pest', __name__)
+
+# Predictions run in this process (torch) or on the model server at PEST_MODEL_SOCKET
+PEST_BACKEND = 'pest_detection.remote' if os.getenv("PEST_MODEL_SOCKET") else 'pest_detection.model'
+
+def pest_backend():
+    """The detector module, imported on first use."""
+    return importlib.import_module(PEST_BACKEND)
+
+def get_pest_detector(tier=None):
+    detector = pest_backend().get_pest_detector(tier=tier)
+    if not WARMUP_ENABLED:
+        # No warm-up will mark it ready: it is once loaded
+        pest_backend().mark_pest_detector_ready()
+    return detector
+
+def warm_up_pest_detector(iterations=3, tiers=None):
+    return pest_backend().warm_up_pest_detector(iterations=iterations, tiers=tiers)
+
+def is_pest_detector_ready():
+    """True once the detector is warmed up (False, without importing it, before it was ever loaded)."""
+    # The warm-up thread may still be importing it: a partial module has no check yet
+    check = getattr(sys.modules.get(PEST_BACKEND), 'is_pest_detector_ready', None)
+    return check is not None and check()
+
+def pest_readiness():
+    """
+    The detector's state for /api/ready: True once warmed up (with
+    PEST_WARMUP=0, once loaded), False until then, or "lazy" while it
+    waits, with PEST_WARMUP=0, for the first request to load it. That
+    request only comes once the probe passes, so "lazy" counts as ready.
+    """
+    if is_pest_detector_ready():
+        return True
+    return False if WARMUP_ENABLED else "lazy"
+
+def warmup_tiers():
+    """Tiers to load at startup: PEST_WARMUP_TIERS, or None for the default tier only."""
+    return [t for t in os.getenv("PEST_WARMUP_TIERS", "").split(",") if t.strip()] or None
+
+def start_pest_warmup():
+    """
+    Load and warm up the pest detector in the background so /api/ready can gate traffic.
+
+    A failed warm-up (e.g. the model server not up yet) is retried with
+    exponential backoff, up to PEST_WARMUP_MAX_BACKOFF seconds apart.
+    """
+    def run():
+        delay = 1.0
+        max_delay = float(os.getenv("PEST_WARMUP_MAX_BACKOFF", "60"))
+        while True:
+            try:
+                warm_up_pest_detector(iterations=int(os.getenv("PEST_WARMUP_ITERATIONS", "3")), tiers=warmup_tiers())
+                logger.info("Pest detector warmed up and ready")
+                return
+            except Exception:
+                logger.exception("Error warming up pest detector; retrying in %.0fs", delay)
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+    thread = threading.Thread(target=run, name="pest-warmup", daemon=True)
+    thread.start()
+    return thread
+
+# With PEST_WARMUP=0 the detector loads on first use, and is ready once loaded
+WARMUP_ENABLED = os.getenv("PEST_WARMUP", "1") != "0"
+# serve.py clears this in its master, which must not start threads before forking,
+# and starts the warm-up in each worker instead
+WARMUP_ON_REGISTER = WARMUP_ENABLED
+
+@bp.record_once
+def warm_up_on_register(state):
+    if WARMUP_ON_REGISTER:
+        start_pest_warmup()
+
+def preload():
+    """Load the detector weights for the warm-up tiers now, without running them (see serve.py)."""
+    if PEST_BACKEND == 'pest_detection.remote':
+        return  # the model lives in the model server; its client connects per process
+    for tier in warmup_tiers() or [None]:
+        get_pest_detector(tier=tier)
+
+# Responses for recently seen pest images, keyed by perceptual hash, one cache per model tier
+pest_caches = {}
+
+def get_pest_cache(tier):
+    cache = pest_caches.get(tier)
+    if cache is None:
+        cache = pest_caches.setdefault(tier, PredictionCache(
+            max_entries=int(os.getenv("PEST_CACHE_SIZE", "1024")),
+            max_distance=int(os.getenv("PEST_CACHE_MAX_DISTANCE", "0"))
+        ))
+    return cache
+
+def simple_leaf_diagnosis(image: Image.Image):
+    """Legacy function for backward compatibility."""
+    try:
+        # Use the new model for prediction
+        detector = get_pest_detector()
+        result = detector.predict(image)
+        
+        if result['status'] == 'success':
+            pred = result['prediction']
+            return {
+                "label": pred['class'],
+                "confidence": pred['confidence'],
+                "advice": pred['advice']
+            }
+        else:
+            return {"label": "error", "confidence": 0, "advice": result.get('message', 'Prediction error')}
+    except Exception as e:
+        return {"label": "error", "confidence": 0.0, "advice": str(e)}
+
+PEST_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.tiff', '.tif')
+
+def pest_response(result):
+    """Client-facing response for a successful PestDetectionModel result."""
+    return {
+        "success": True,
+        "error": None,
+        "prediction": {
+            "class": result['prediction']['class'],
+            "confidence": result['prediction']['confidence'],
+            "advice": result['prediction']['advice']
+        }
+    }
+
+def detect_pest_image(source, timer, tier=None):
+    """
+    Run the single-image pest pipeline (decode, cache, leaf gate, model) on an upload.
+    
+    Args:
+        source: File-like upload
+        timer: StageTimer for this request
+        tier: Model tier (see pest_detection.tiers); None for the deployment default
+    
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    try:
+        with timer.stage('decode'):
+            decoded, original_size = decode_image(source)
+        with timer.stage('preprocess'):
+            img = fit_image(decoded)
+            del decoded
+        logger.debug("Image decoded. Original size: %s, size: %s", original_size, img.size)
+        
+        # Same or near-identical photo seen recently: skip leaf check and model
+        with timer.stage('cache_lookup'):
+            image_hash = perceptual_hash(img)
+            cache = get_pest_cache(tier)
+            cached = cache.get(image_hash)
+        if cached is not None:
+            timer.log_sampled(logger, "pest-detect cached hash=%016x", image_hash)
+            return cached, 200
+        
+        # Check if the image is likely a leaf
+        with timer.stage('leaf_gate'):
+            is_leaf, leaf_message = is_leaf_image(img, original_size=original_size)
+        logger.debug("Leaf check result: %s - %s", is_leaf, leaf_message)
+        
+        if not is_leaf:
+            # Use the detailed message from the leaf detection
+            error_msg = leaf_message if leaf_message else "The uploaded image doesn't appear to be a plant leaf. Please upload a clear image of a plant leaf."
+            timer.log_sampled(logger, "pest-detect rejected by leaf gate")
+            return {"success": False, "error": error_msg, "prediction": None}, 400
+            
+        # Get predictions (tensor conversion and forward pass are timed by the model)
+        detector = get_pest_detector(tier=tier)
+        result = detector.predict(img, timer=timer)
+        
+        if result['status'] == 'error':
+            error_msg = f"Prediction error: {result.get('message', 'Unknown error')}"
+            logger.warning(error_msg)
+            return {"success": False, "error": error_msg, "prediction": None}, 400
+            
+        # Return the prediction in the expected format
+        response = pest_response(result)
+        cache.put(image_hash, response)
+        timer.log_sampled(logger, "pest-detect class=%s confidence=%.4f",
+                          response['prediction']['class'], response['prediction']['confidence'])
+        return response, 200
+        
+    except Exception as e:
+        logger.exception("Error processing pest image")
+        return {"success": False, "error": f"Error processing image: {str(e)}", "prediction": None}, 400
+
+def check_pest_upload():
+    """Return (file, None) for a valid 'image' upload, or (None, error response body)."""
+    if 'image' not in request.files:
+        return None, {"success": False, "error": "No image file found (field 'image')", "prediction": None}
+    
+    # Get the uploaded file
+    file = request.files['image']
+    logger.debug("Received file: %s", file.filename)
+    
+    # Check if the file is an image (supporting most common image formats)
+    if not file.filename.lower().endswith(PEST_IMAGE_EXTENSIONS):
+        error_msg = f"Invalid file type. Supported formats: {', '.join(ext for ext in PEST_IMAGE_EXTENSIONS)}"
+        return None, {"success": False, "error": error_msg, "prediction": None}
+    return file, None
+
+def requested_pest_tier():
+    """Model tier from the 'tier' form field or query parameter; raises ValueError if unknown or not allowed."""
+    requested = request.form.get('tier') or request.args.get('tier')
+    tier = check_requested_tier(requested)
+    if requested and PEST_BACKEND == 'pest_detection.remote':
+        # The model server runs one tier whatever is asked for
+        served = get_pest_detector().server_tier()
+        if served is not None and tier != served:
+            raise ValueError(f"Model tier '{tier}' is not served here; the model server runs '{served}'")
+    return tier
+
+@bp.route('/api/pest-detect', methods=['POST'])
+def pest_detect():
+    timer = StageTimer()
+    try:
+        with timer.stage('upload_read'):
+            file, error = check_pest_upload()
+        if error:
+            logger.debug("Rejected pest request: %s", error['error'])
+            return jsonify(error), 400
+        try:
+            tier = requested_pest_tier()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e), "prediction": None}), 400
+        
+        body, status = detect_pest_image(file.stream, timer, tier=tier)
+        with timer.stage('response'):
+            return jsonify(body), status
+            
+    except Exception as e:
+        logger.exception("Unexpected error in pest detection")
+        return jsonify({
+            "success": False,
+            "error": f"An unexpected error occurred: {str(e)}",
+            "prediction": None
+        }), 500
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus-format pest pipeline stage latency histograms for this worker."""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# Batch pest detection limits
+PEST_BATCH_SIZE = int(os.getenv("PEST_BATCH_SIZE", "16"))
+PEST_BATCH_MAX_IMAGES = int(os.getenv("PEST_BATCH_MAX_IMAGES", "2000"))
+PEST_BATCH_MAX_IMAGE_BYTES = int(os.getenv("PEST_BATCH_MAX_IMAGE_BYTES", str(25 * 1024 * 1024)))
+PEST_DECODE_WORKERS = int(os.getenv("PEST_DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+def detach_upload_stream(upload):
+    """
+    Take ownership of an uploaded file's stream.
+
+    Request teardown closes uploaded files, which can happen before a
+    streamed response has been consumed; the caller closes the stream.
+    """
+    stream = upload.stream
+    upload.stream = BytesIO()
+    return stream
+
+def iter_pest_uploads(files, archive):
+    """
+    Yield (filename, file-like or None, error) for every uploaded image.
+
+    `files` is a list of (filename, stream) and `archive` an optional
+    (filename, stream) zip. Zip members are read one at a time, so only the
+    images currently being decoded are held in memory regardless of archive size.
+    """
+    for filename, stream in files:
+        if not filename.lower().endswith(PEST_IMAGE_EXTENSIONS):
+            yield filename, None, "Invalid file type"
+        else:
+            yield filename, stream, None
+    if archive is None:
+        return
+    archive_name, archive_stream = archive
+    try:
+        zf = zipfile.ZipFile(archive_stream)
+    except zipfile.BadZipFile:
+        yield archive_name, None, "Invalid zip archive"
+        return
+    with zf:
+        for info in zf.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(PEST_IMAGE_EXTENSIONS):
+                continue
+            if info.file_size > PEST_BATCH_MAX_IMAGE_BYTES:
+                yield info.filename, None, "Image too large"
+                continue
+            with zf.open(info) as member:
+                data = member.read(PEST_BATCH_MAX_IMAGE_BYTES + 1)
+            if len(data) > PEST_BATCH_MAX_IMAGE_BYTES:
+                yield info.filename, None, "Image too large"
+                continue
+            yield info.filename, BytesIO(data), None
+
+def prepare_pest_image(upload):
+    """Decode, hash and leaf-check one upload; runs in the decode worker pool."""
+    filename, source, error = upload
+    item = {"filename": filename, "image": None, "hash": None, "error": error}
+    if source is None:
+        return item
+    timer = StageTimer()
+    try:
+        with timer.stage('decode'):
+            decoded, original_size = decode_image(source)
+        with timer.stage('preprocess'):
+            img = fit_image(decoded)
+            del decoded
+        item["hash"] = perceptual_hash(img)
+        with timer.stage('leaf_gate'):
+            is_leaf, leaf_message = is_leaf_image(img, original_size=original_size)
+        if is_leaf:
+            item["image"] = img
+        else:
+            item["error"] = leaf_message
+    except Exception as e:
+        item["error"] = f"Error processing image: {str(e)}"
+    return item
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+@bp.route('/api/pest-detect/batch', methods=['POST'])
+def pest_detect_batch():
+    """
+    Batch pest detection for many images ('images' fields and/or a zip 'archive').
+
+    Streams one NDJSON line per image, in upload order, as each model batch
+    completes, followed by a summary line.
+    """
+    uploads = request.files.getlist('images') + request.files.getlist('image')
+    if not uploads and 'archive' not in request.files:
+        return jsonify({"success": False, "error": "No images found (fields 'images' or 'archive')"}), 400
+    try:
+        tier = requested_pest_tier()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    cache = get_pest_cache(tier)
+    files = [(f.filename, detach_upload_stream(f)) for f in uploads]
+    archive = None
+    if 'archive' in request.files:
+        archive = (request.files['archive'].filename, detach_upload_stream(request.files['archive']))
+    streams = [stream for _, stream in files] + ([archive[1]] if archive else [])
+
+    def generate():
+        detector = get_pest_detector(tier=tier)
+        count = 0
+        succeeded = 0
+        uploads = iter_pest_uploads(files, archive)
+        with ThreadPoolExecutor(max_workers=PEST_DECODE_WORKERS) as pool:
+            for chunk in chunked(uploads, PEST_BATCH_SIZE):
+                if count >= PEST_BATCH_MAX_IMAGES:
+                    yield json.dumps({"success": False, "error": f"Batch limit of {PEST_BATCH_MAX_IMAGES} images reached; remaining images skipped"}) + "\n"
+                    break
+                chunk = chunk[:PEST_BATCH_MAX_IMAGES - count]
+                items = list(pool.map(prepare_pest_image, chunk))
+
+                # Serve repeats from the cache, run the rest through the model together
+                responses = {}
+                pending = []
+                for i, item in enumerate(items):
+                    if item["image"] is None:
+                        continue
+                    cached = cache.get(item["hash"])
+                    if cached is not None:
+                        responses[i] = cached
+                    else:
+                        pending.append(i)
+                if pending:
+                    results = detector.predict_batch([items[i]["image"] for i in pending])
+                    for i, result in zip(pending, results):
+                        if result['status'] == 'error':
+                            items[i]["error"] = f"Prediction error: {result.get('message', 'Unknown error')}"
+                            continue
+                        responses[i] = pest_response(result)
+                        cache.put(items[i]["hash"], responses[i])
+
+                for i, item in enumerate(items):
+                    if i in responses:
+                        line = {"index": count, "filename": item["filename"], **responses[i]}
+                        succeeded += 1
+                    else:
+                        line = {"index": count, "filename": item["filename"], "success": False, "error": item["error"], "prediction": None}
+                    count += 1
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+
+        yield json.dumps({"done": True, "count": count, "succeeded": succeeded}) + "\n"
+
+    def generate_and_close():
+        try:
+            yield from generate()
+        finally:
+            for stream in streams:
+                stream.close()
+
+    return Response(generate_and_close(), mimetype='application/x-ndjson')
+
+
+# Asynchronous pest detection jobs
+PEST_JOB_WORKERS = int(os.getenv("PEST_JOB_WORKERS", "2"))
+PEST_JOB_MAX_PENDING = int(os.getenv("PEST_JOB_MAX_PENDING", "64"))
+PEST_JOB_RESULT_TTL = int(os.getenv("PEST_JOB_RESULT_TTL", "600"))
+pest_jobs = None
+_pest_jobs_lock = threading.Lock()
+
+def run_pest_job(stream, tier):
+    try:
+        return detect_pest_image(stream, StageTimer(), tier=tier)
+    finally:
+        stream.close()
+
+def get_pest_jobs():
+    """Get or create the pest job queue (its worker threads start on first use)."""
+    global pest_jobs
+    if pest_jobs is None:
+        with _pest_jobs_lock:
+            if pest_jobs is None:
+                pest_jobs = JobQueue(run_pest_job, workers=PEST_JOB_WORKERS,
+                                     max_pending=PEST_JOB_MAX_PENDING, result_ttl=PEST_JOB_RESULT_TTL)
+    return pest_jobs
+
+@bp.route('/api/pest-detect/jobs', methods=['POST'])
+def submit_pest_job():
+    """Queue an 'image' upload for pest detection and return a job id immediately (202)."""
+    file, error = check_pest_upload()
+    if error:
+        return jsonify(error), 400
+    try:
+        tier = requested_pest_tier()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e), "prediction": None}), 400
+    stream = detach_upload_stream(file)
+    try:
+        job_id = get_pest_jobs().submit(stream, tier)
+    except QueueFull as e:
+        stream.close()
+        response = jsonify({"success": False, "error": str(e), "prediction": None})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/pest-detect/jobs/{job_id}",
+        "events_url": f"/api/pest-detect/jobs/{job_id}/events"
+    }), 202
+
+@bp.route('/api/pest-detect/jobs/<job_id>', methods=['GET'])
+def pest_job_status(job_id):
+    """Poll a pest detection job; once done, 'result' holds the /api/pest-detect response."""
+    job = get_pest_jobs().get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown or expired job"}), 404
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": job["status"],
+        "result": job["result"]
+    })
+
+@bp.route('/api/pest-detect/jobs/<job_id>/events', methods=['GET'])
+def pest_job_events(job_id):
+    """Server-sent events for a pest detection job: a status event, keep-alives, then the result."""
+    jobs = get_pest_jobs()
+    if jobs.get(job_id) is None:
+        return jsonify({"success": False, "error": "Unknown or expired job"}), 404
+
+    expired = 'data: ' + json.dumps({'job_id': job_id, 'success': False, 'error': 'Job expired', 'done': True}) + '\n\n'
+
+    def generate():
+        job = jobs.get(job_id)
+        if job is None:
+            yield expired
+            return
+        yield 'data: ' + json.dumps({'job_id': job_id, 'status': job['status'], 'done': False}) + '\n\n'
+        while not jobs.wait(job_id, timeout=15):
+            if jobs.get(job_id) is None:
+                yield expired
+                return
+            yield ': keep-alive\n\n'
+        job = jobs.get(job_id)
+        if job is None:
+            yield expired
+            return
+        yield 'data: ' + json.dumps({
+            'job_id': job_id,
+            'status': job['status'],
+            'done': True,
+            'result': job['result']
+        }, ensure_ascii=False) + '\n\n'
+
+    return Response(generate(), mimetype='text/event-stream')
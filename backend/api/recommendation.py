@@ -0,0 +1,322 @@
+"""
+Fertilizer recommendation endpoints: rule-based advice (with the learned
+model's suggestions when a registry version is active), crop and
+fertilizer lists and dashboard stats.
+
+The model (fertilizer/online.py, which pulls in scikit-learn) is imported
+by the first /api/recommend request, not when the blueprint is loaded.
+"""
+from datetime import datetime
+from flask import Blueprint, jsonify, request
+
+bp = Blueprint('recommendation', __name__)
+
+def preload():
+    """Load the active fertilizer model now (see serve.py)."""
+    from fertilizer.online import get_fertilizer_model
+    get_fertilizer_model().get()
+
+# Crop-specific nutrient requirements
+CROP_REQUIREMENTS = {
+    'rice': {'N': 120, 'P': 60, 'K': 40, 'ph_range': (5.5, 6.5)},
+    'wheat': {'N': 150, 'P': 80, 'K': 60, 'ph_range': (6.0, 7.5)},
+    'corn': {'N': 180, 'P': 90, 'K': 80, 'ph_range': (6.0, 7.0)},
+    'soybean': {'N': 50, 'P': 70, 'K': 100, 'ph_range': (6.0, 7.0)},
+    'cotton': {'N': 120, 'P': 60, 'K': 80, 'ph_range': (5.8, 8.0)},
+    'tomato': {'N': 200, 'P': 100, 'K': 150, 'ph_range': (6.0, 7.0)},
+    'potato': {'N': 150, 'P': 80, 'K': 200, 'ph_range': (5.2, 6.4)},
+    'sugarcane': {'N': 250, 'P': 75, 'K': 100, 'ph_range': (6.0, 7.5)}
+}
+
+# Soil type traits to adjust recommendations
+SOIL_TRAITS = {
+    'sandy': {
+        'notes': 'Sandy soils leach N and K faster; split applications recommended',
+        'prefer_k': 'Sulfate of Potash (0-0-50)',
+        'organic': True,
+        'ph_bias': 0.0
+    },
+    'clay': {
+        'notes': 'Clay soils may fix P; consider band placement and organic matter',
+        'prefer_p': 'DAP (18-46-0)',
+        'organic': True,
+        'ph_bias': 0.1
+    },
+    'loam': {
+        'notes': 'Loam soils are generally balanced; maintain with NPK',
+        'prefer_balanced': 'NPK (10-10-10)',
+        'organic': False,
+        'ph_bias': 0.0
+    },
+    'red': {
+        'notes': 'Red soils often low in N and OM',
+        'organic': True,
+        'ph_bias': -0.1
+    },
+    'black': {
+        'notes': 'Black (vertisol) soils may be slightly alkaline; monitor Zn and S',
+        'micronutrient': 'Zinc Sulfate',
+        'ph_bias': 0.2
+    },
+    'alluvial': {
+        'notes': 'Alluvial soils moderately fertile; balanced NPK works well',
+        'prefer_balanced': 'NPK (10-10-10)',
+        'ph_bias': 0.0
+    },
+    'laterite': {
+        'notes': 'Laterite soils are acidic and low in bases; lime and OM helpful',
+        'organic': True,
+        'ph_bias': -0.2
+    }
+}
+
+def get_fertilizer_recommendations(crop_type, soil_ph, nitrogen, phosphorus, potassium, organic_matter, moisture, temperature, soil_type="", soil_name=""):
+    """Rule-based fertilizer recommendation system with soil type awareness"""
+    
+    recommendations = []
+    
+    if crop_type.lower() not in CROP_REQUIREMENTS:
+        return [{"type": "error", "message": "Crop type not supported"}]
+    
+    req = CROP_REQUIREMENTS[crop_type.lower()]
+    
+    # Calculate nutrient deficiencies
+    n_deficit = max(0, req['N'] - nitrogen)
+    p_deficit = max(0, req['P'] - phosphorus)
+    k_deficit = max(0, req['K'] - potassium)
+
+    traits = SOIL_TRAITS.get(soil_type, {}) if soil_type else {}
+
+    # pH recommendations (adjust awareness based on soil type bias)
+    ph_min, ph_max = req['ph_range']
+    # Adjust target slightly by soil_type bias
+    adj_ph_min = ph_min + traits.get('ph_bias', 0.0)
+    adj_ph_max = ph_max + traits.get('ph_bias', 0.0)
+
+    if soil_ph < adj_ph_min:
+        recommendations.append({
+            "type": "pH_adjustment",
+            "product": "Lime (CaCO3)",
+            "quantity": f"{(adj_ph_min - soil_ph) * 500:.0f} kg/hectare",
+            "reason": f"Soil pH ({soil_ph}) is too acidic for {crop_type}. Target pH: {ph_min}-{ph_max}",
+            "priority": "high"
+        })
+    elif soil_ph > adj_ph_max:
+        recommendations.append({
+            "type": "pH_adjustment", 
+            "product": "Sulfur or Aluminum Sulfate",
+            "quantity": f"{(soil_ph - adj_ph_max) * 300:.0f} kg/hectare",
+            "reason": f"Soil pH ({soil_ph}) is too alkaline for {crop_type}. Target pH: {ph_min}-{ph_max}",
+            "priority": "high"
+        })
+    
+    # Nitrogen recommendations
+    if n_deficit > 50:
+        recommendations.append({
+            "type": "primary_nutrient",
+            "product": "Urea (46-0-0)",
+            "quantity": f"{n_deficit * 2.17:.0f} kg/hectare",
+            "reason": f"Nitrogen deficiency: {n_deficit:.0f} kg/ha needed",
+            "priority": "high"
+        })
+    elif n_deficit > 20:
+        recommendations.append({
+            "type": "primary_nutrient",
+            "product": "Ammonium Sulfate (21-0-0)",
+            "quantity": f"{n_deficit * 4.76:.0f} kg/hectare",
+            "reason": f"Moderate nitrogen deficiency: {n_deficit:.0f} kg/ha needed",
+            "priority": "medium"
+        })
+    
+    # Phosphorus recommendations
+    if p_deficit > 30:
+        recommendations.append({
+            "type": "primary_nutrient",
+            "product": "Triple Super Phosphate (0-46-0)",
+            "quantity": f"{p_deficit * 2.17:.0f} kg/hectare",
+            "reason": f"Phosphorus deficiency: {p_deficit:.0f} kg/ha needed",
+            "priority": "high"
+        })
+    elif p_deficit > 10:
+        recommendations.append({
+            "type": "primary_nutrient",
+            "product": "DAP (18-46-0)",
+            "quantity": f"{p_deficit * 2.17:.0f} kg/hectare",
+            "reason": f"Moderate phosphorus deficiency: {p_deficit:.0f} kg/ha needed",
+            "priority": "medium"
+        })
+    
+    # Potassium recommendations (prefer SOP on sandy soils or chloride-sensitive scenarios)
+    if k_deficit > 40:
+        recommendations.append({
+            "type": "primary_nutrient",
+            "product": traits.get('prefer_k', "Muriate of Potash (0-0-60)"),
+            "quantity": f"{k_deficit * 1.67:.0f} kg/hectare",
+            "reason": f"Potassium deficiency: {k_deficit:.0f} kg/ha needed",
+            "priority": "high"
+        })
+    elif k_deficit > 15:
+        recommendations.append({
+            "type": "primary_nutrient",
+            "product": traits.get('prefer_k', "Sulfate of Potash (0-0-50)"),
+            "quantity": f"{k_deficit * 2:.0f} kg/hectare",
+            "reason": f"Moderate potassium deficiency: {k_deficit:.0f} kg/ha needed",
+            "priority": "medium"
+        })
+    
+    # Organic matter recommendations
+    if organic_matter < 2.0:
+        recommendations.append({
+            "type": "organic",
+            "product": "Compost or Farm Yard Manure",
+            "quantity": "5-10 tons/hectare",
+            "reason": f"Low organic matter ({organic_matter}%). Improve soil health and nutrient retention",
+            "priority": "medium"
+        })
+    
+    # Micronutrient recommendations based on crop and soil conditions
+    if crop_type.lower() in ['rice', 'wheat'] and soil_ph > 7.5:
+        recommendations.append({
+            "type": "micronutrient",
+            "product": "Zinc Sulfate",
+            "quantity": "25 kg/hectare",
+            "reason": "High pH can cause zinc deficiency in cereals",
+            "priority": "medium"
+        })
+    
+    if crop_type.lower() in ['tomato', 'potato'] and soil_ph > 7.0:
+        recommendations.append({
+            "type": "micronutrient",
+            "product": "Iron Chelate",
+            "quantity": "10 kg/hectare",
+            "reason": "Alkaline soil can cause iron deficiency in vegetables",
+            "priority": "medium"
+        })
+    
+    # Soil-type driven micronutrient or organic matter suggestions
+    if traits.get('micronutrient'):
+        recommendations.append({
+            "type": "micronutrient",
+            "product": traits['micronutrient'],
+            "quantity": "25 kg/hectare",
+            "reason": f"{traits['notes']}",
+            "priority": "low"
+        })
+
+    if traits.get('organic') and organic_matter < 3.0:
+        recommendations.append({
+            "type": "organic",
+            "product": "Compost or Vermicompost",
+            "quantity": "2-5 tons/hectare",
+            "reason": f"{traits.get('notes', 'Improve soil structure and CEC')}",
+            "priority": "medium"
+        })
+
+    # If no specific recommendations, provide balanced fertilizer
+    if not recommendations:
+        recommendations.append({
+            "type": "balanced",
+            "product": traits.get('prefer_balanced', "NPK (10-10-10)"),
+            "quantity": "200-300 kg/hectare",
+            "reason": "Soil nutrients are adequate. Apply balanced fertilizer for maintenance",
+            "priority": "low"
+        })
+    
+    return recommendations
+
+@bp.route('/api/recommend', methods=['POST'])
+def recommend_fertilizer():
+    try:
+        data = request.get_json()
+        
+        # Extract input parameters
+        crop_type = data.get('crop_type')
+        soil_name = data.get('soil_name', '')  # free text, optional
+        soil_type = data.get('soil_type', '').lower()  # e.g., red, black, alluvial, sandy, clay, loam, laterite
+        soil_ph = float(data.get('soil_ph', 7.0))
+        nitrogen = float(data.get('nitrogen', 0))
+        phosphorus = float(data.get('phosphorus', 0))
+        potassium = float(data.get('potassium', 0))
+        organic_matter = float(data.get('organic_matter', 2.5))
+        moisture = float(data.get('moisture', 50))
+        temperature = float(data.get('temperature', 25))
+        
+        # Rule-based recommendation system
+        recommendations = get_fertilizer_recommendations(
+            crop_type=crop_type,
+            soil_ph=soil_ph,
+            nitrogen=nitrogen,
+            phosphorus=phosphorus,
+            potassium=potassium,
+            organic_matter=organic_matter,
+            moisture=moisture,
+            temperature=temperature,
+            soil_type=soil_type,
+            soil_name=soil_name
+        )
+
+        # Learned suggestions (hot-reloaded as feedback is folded in, see fertilizer/online.py)
+        from fertilizer.online import get_fertilizer_model
+        fertilizer_model = get_fertilizer_model()
+        # The model's inputs, echoed so a client can rate the suggestions through /api/feedback
+        inputs = {
+            "crop_type": crop_type, "soil_ph": soil_ph, "nitrogen": nitrogen, "phosphorus": phosphorus,
+            "potassium": potassium, "organic_matter": organic_matter, "moisture": moisture,
+            "temperature": temperature
+        }
+        model_suggestions = fertilizer_model.suggest(inputs)
+        
+        return jsonify({
+            "success": True,
+            "recommendations": recommendations,
+            "model_suggestions": model_suggestions,
+            "model_version": fertilizer_model.version if model_suggestions else None,
+            "inputs": inputs,
+            "input_parameters": data,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+
+@bp.route('/api/crops', methods=['GET'])
+def get_crops():
+    crops = [
+        {"name": "Rice", "value": "rice", "season": "Kharif", "duration": "120-150 days"},
+        {"name": "Wheat", "value": "wheat", "season": "Rabi", "duration": "120-140 days"},
+        {"name": "Corn", "value": "corn", "season": "Kharif", "duration": "90-120 days"},
+        {"name": "Soybean", "value": "soybean", "season": "Kharif", "duration": "90-120 days"},
+        {"name": "Cotton", "value": "cotton", "season": "Kharif", "duration": "180-200 days"},
+        {"name": "Tomato", "value": "tomato", "season": "All seasons", "duration": "90-120 days"},
+        {"name": "Potato", "value": "potato", "season": "Rabi", "duration": "90-120 days"},
+        {"name": "Sugarcane", "value": "sugarcane", "season": "Annual", "duration": "365 days"}
+    ]
+    return jsonify({"crops": crops})
+
+@bp.route('/api/fertilizers', methods=['GET'])
+def get_fertilizers():
+    fertilizers = [
+        {"name": "Urea", "composition": "46-0-0", "type": "Nitrogen", "price_per_kg": 6.5},
+        {"name": "DAP", "composition": "18-46-0", "type": "Phosphorus", "price_per_kg": 27.0},
+        {"name": "MOP", "composition": "0-0-60", "type": "Potassium", "price_per_kg": 17.5},
+        {"name": "NPK", "composition": "10-26-26", "type": "Complex", "price_per_kg": 24.0},
+        {"name": "SSP", "composition": "0-16-0", "type": "Phosphorus", "price_per_kg": 8.5},
+        {"name": "Zinc Sulfate", "composition": "Zn-21%", "type": "Micronutrient", "price_per_kg": 65.0},
+        {"name": "Iron Chelate", "composition": "Fe-12%", "type": "Micronutrient", "price_per_kg": 120.0}
+    ]
+    return jsonify({"fertilizers": fertilizers})
+
+@bp.route('/api/stats', methods=['GET'])
+def get_stats():
+    stats = {
+        "total_crops_supported": 8,
+        "total_fertilizers": 7,
+        "recommendation_accuracy": "92%",
+        "avg_yield_improvement": "15-25%",
+        "farmers_helped": 1250,
+        "last_updated": datetime.now().isoformat()
+    }
+    return jsonify(stats)
@@ -0,0 +1,262 @@
+"""
+Soil endpoints: search of the soil survey (datasets/soil_data.csv),
+state/district lists and soil health analysis.
+"""
+import numpy as np
+from flask import Blueprint, jsonify, request
+
+from .data import get_dataset
+
+bp = Blueprint('soils', __name__)
+
+# Datasets read by these endpoints (see api/data.py)
+DATASETS_USED = ('soil',)
+
+def preload():
+    """Read the datasets these endpoints use now (see serve.py)."""
+    for name in DATASETS_USED:
+        get_dataset(name)
+
+def avg_soil_for_location(query: str):
+    """Find average soil metrics for a location/district/state query; fallback to neutral values."""
+    soil_data = get_dataset('soil')
+    try:
+        if soil_data is None or soil_data.empty:
+            return {
+                "soil_ph": 6.8, "nitrogen": 90, "phosphorus": 50, "potassium": 70,
+                "organic_matter": 2.5, "moisture": 55, "temperature": 26, "soil_type": "loam"
+            }
+        df = soil_data.copy()
+        q = (query or "").strip().lower()
+        if q:
+            mask = (
+                df['location'].astype(str).str.lower().str.contains(q) |
+                df['district'].astype(str).str.lower().str.contains(q) |
+                df['state'].astype(str).str.lower().str.contains(q) |
+                df['soil_type'].astype(str).str.lower().str.contains(q)
+            )
+            df = df[mask]
+        if df.empty:
+            df = soil_data
+        vals = {
+            "soil_ph": float(df['ph'].dropna().mean()) if 'ph' in df else 6.8,
+            "nitrogen": float(df['nitrogen'].dropna().mean()) if 'nitrogen' in df else 90,
+            "phosphorus": float(df['phosphorus'].dropna().mean()) if 'phosphorus' in df else 50,
+            "potassium": float(df['potassium'].dropna().mean()) if 'potassium' in df else 70,
+            "organic_matter": float(df['organic_matter'].dropna().mean()) if 'organic_matter' in df else 2.5,
+            "moisture": float(df['moisture'].dropna().mean()) if 'moisture' in df else 55,
+            "temperature": float(df['temperature'].dropna().mean()) if 'temperature' in df else 26,
+            "soil_type": str(df['soil_type'].mode().iloc[0]).lower() if 'soil_type' in df and not df['soil_type'].mode().empty else "loam"
+        }
+        return vals
+    except Exception:
+        return {
+            "soil_ph": 6.8, "nitrogen": 90, "phosphorus": 50, "potassium": 70,
+            "organic_matter": 2.5, "moisture": 55, "temperature": 26, "soil_type": "loam"
+        }
+
+@bp.route('/api/soils', methods=['GET'])
+def search_soils():
+    """Search soils by query q across location, district, state, soil_type."""
+    soil_data = get_dataset('soil')
+    try:
+        if soil_data is None:
+            return jsonify({"success": False, "error": "Soil dataset not loaded"}), 500
+
+        import pandas as pd
+        q = request.args.get('q', '').strip().lower()
+        limit = int(request.args.get('limit', 10))
+
+        df = soil_data.copy()
+        if q:
+            mask = (
+                df['location'].astype(str).str.lower().str.contains(q) |
+                df['district'].astype(str).str.lower().str.contains(q) |
+                df['state'].astype(str).str.lower().str.contains(q) |
+                df['soil_type'].astype(str).str.lower().str.contains(q)
+            )
+            df = df[mask]
+
+        # Prepare compact results
+        results = []
+        for _, row in df.head(limit).iterrows():
+            results.append({
+                "soil_id": int(row.get('soil_id', 0)) if not pd.isna(row.get('soil_id', 0)) else None,
+                "label": f"{row.get('location', '')}, {row.get('district', '')}, {row.get('state', '')} — {row.get('soil_type', '')}",
+                "location": row.get('location', ''),
+                "district": row.get('district', ''),
+                "state": row.get('state', ''),
+                "soil_type": row.get('soil_type', ''),
+                "ph": float(row.get('ph', 0)) if not pd.isna(row.get('ph', 0)) else None,
+                "nitrogen": float(row.get('nitrogen', 0)) if not pd.isna(row.get('nitrogen', 0)) else None,
+                "phosphorus": float(row.get('phosphorus', 0)) if not pd.isna(row.get('phosphorus', 0)) else None,
+                "potassium": float(row.get('potassium', 0)) if not pd.isna(row.get('potassium', 0)) else None,
+                "organic_matter": float(row.get('organic_matter', 0)) if not pd.isna(row.get('organic_matter', 0)) else None,
+                "moisture": float(row.get('moisture', 0)) if not pd.isna(row.get('moisture', 0)) else None,
+                "temperature": float(row.get('temperature', 0)) if not pd.isna(row.get('temperature', 0)) else None,
+                "season": row.get('season', '')
+            })
+
+        return jsonify({"success": True, "count": len(results), "results": results})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/api/locations/states', methods=['GET'])
+def list_states():
+    soil_data = get_dataset('soil')
+    try:
+        if soil_data is None or soil_data.empty:
+            return jsonify({"success": True, "states": []})
+        states = (
+            soil_data['state']
+            .dropna()
+            .astype(str)
+            .str.strip()
+            .replace('', np.nan)
+            .dropna()
+            .unique()
+        )
+        states_sorted = sorted(states, key=lambda x: x.lower())
+        return jsonify({"success": True, "states": states_sorted})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/api/locations/districts', methods=['GET'])
+def list_districts():
+    soil_data = get_dataset('soil')
+    try:
+        state = request.args.get('state', '').strip()
+        if soil_data is None or soil_data.empty:
+            return jsonify({"success": True, "districts": []})
+        df = soil_data.copy()
+        if state:
+            df = df[df['state'].astype(str).str.strip().str.lower() == state.lower()]
+        districts = (
+            df['district']
+            .dropna()
+            .astype(str)
+            .str.strip()
+            .replace('', np.nan)
+            .dropna()
+            .unique()
+        )
+        districts_sorted = sorted(districts, key=lambda x: x.lower())
+        return jsonify({"success": True, "districts": districts_sorted})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/api/soil-analysis', methods=['POST'])
+def analyze_soil():
+    try:
+        data = request.get_json()
+        
+        soil_ph = float(data.get('soil_ph', 7.0))
+        nitrogen = float(data.get('nitrogen', 0))
+        phosphorus = float(data.get('phosphorus', 0))
+        potassium = float(data.get('potassium', 0))
+        organic_matter = float(data.get('organic_matter', 2.5))
+        
+        analysis = {
+            "ph_status": get_ph_status(soil_ph),
+            "nitrogen_status": get_nutrient_status(nitrogen, "nitrogen"),
+            "phosphorus_status": get_nutrient_status(phosphorus, "phosphorus"),
+            "potassium_status": get_nutrient_status(potassium, "potassium"),
+            "organic_matter_status": get_organic_matter_status(organic_matter),
+            "overall_rating": calculate_soil_rating(soil_ph, nitrogen, phosphorus, potassium, organic_matter)
+        }
+        
+        return jsonify({
+            "success": True,
+            "analysis": analysis
+        })
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+
+def get_ph_status(ph):
+    if ph < 5.5:
+        return {"level": "Very Acidic", "color": "red", "recommendation": "Add lime to increase pH"}
+    elif ph < 6.0:
+        return {"level": "Acidic", "color": "orange", "recommendation": "Consider adding lime"}
+    elif ph < 7.5:
+        return {"level": "Optimal", "color": "green", "recommendation": "pH is in good range"}
+    elif ph < 8.0:
+        return {"level": "Slightly Alkaline", "color": "orange", "recommendation": "Monitor pH levels"}
+    else:
+        return {"level": "Very Alkaline", "color": "red", "recommendation": "Add sulfur to decrease pH"}
+
+def get_nutrient_status(value, nutrient):
+    thresholds = {
+        "nitrogen": {"low": 50, "medium": 100, "high": 150},
+        "phosphorus": {"low": 30, "medium": 60, "high": 90},
+        "potassium": {"low": 40, "medium": 80, "high": 120}
+    }
+    
+    thresh = thresholds[nutrient]
+    
+    if value < thresh["low"]:
+        return {"level": "Low", "color": "red", "recommendation": f"Apply {nutrient} fertilizer"}
+    elif value < thresh["medium"]:
+        return {"level": "Medium", "color": "orange", "recommendation": f"Moderate {nutrient} application needed"}
+    elif value < thresh["high"]:
+        return {"level": "Good", "color": "green", "recommendation": f"{nutrient} levels are adequate"}
+    else:
+        return {"level": "High", "color": "blue", "recommendation": f"{nutrient} levels are sufficient"}
+
+def get_organic_matter_status(om):
+    if om < 1.0:
+        return {"level": "Very Low", "color": "red", "recommendation": "Add compost or manure"}
+    elif om < 2.0:
+        return {"level": "Low", "color": "orange", "recommendation": "Increase organic matter"}
+    elif om < 4.0:
+        return {"level": "Good", "color": "green", "recommendation": "Organic matter is adequate"}
+    else:
+        return {"level": "High", "color": "blue", "recommendation": "Excellent organic matter content"}
+
+def calculate_soil_rating(ph, n, p, k, om):
+    score = 0
+    
+    # pH score (0-25 points)
+    if 6.0 <= ph <= 7.5:
+        score += 25
+    elif 5.5 <= ph < 6.0 or 7.5 < ph <= 8.0:
+        score += 15
+    else:
+        score += 5
+    
+    # Nutrient scores (0-25 points each)
+    nutrients = [n, p, k]
+    thresholds = [100, 60, 80]  # Good levels for N, P, K
+    
+    for nutrient, threshold in zip(nutrients, thresholds):
+        if nutrient >= threshold:
+            score += 25
+        elif nutrient >= threshold * 0.7:
+            score += 15
+        elif nutrient >= threshold * 0.4:
+            score += 10
+        else:
+            score += 5
+    
+    # Organic matter score (0-25 points)
+    if om >= 3.0:
+        score += 25
+    elif om >= 2.0:
+        score += 15
+    elif om >= 1.0:
+        score += 10
+    else:
+        score += 5
+    
+    rating = "Poor"
+    if score >= 90:
+        rating = "Excellent"
+    elif score >= 75:
+        rating = "Good"
+    elif score >= 60:
+        rating = "Fair"
+    
+    return {"score": score, "rating": rating, "max_score": 100}
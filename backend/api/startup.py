@@ -0,0 +1,141 @@
+"""
+Startup cost of each API blueprint.
+
+Every measurement runs in a fresh interpreter (so nothing is cached in
+sys.modules): the time to import the blueprint's module after Flask, which
+every worker imports anyway, and to register it on an app, plus the heavy
+libraries that pulled in. `--first-request` also times one typical request
+per blueprint, which is where lazily imported libraries and datasets are
+loaded. The `app` row is the whole API (app:app). From backend/:
+
+    python -m api.startup
+    python -m api.startup --repeats 5 --first-request
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries worth knowing about when a worker starts (each costs 0.1-2 s to import)
+HEAVY_MODULES = ('torch', 'torchvision', 'sklearn', 'scipy', 'pandas', 'requests', 'PIL', 'numpy')
+
+RECOMMEND_INPUTS = {"crop_type": "rice", "soil_ph": 6.5, "nitrogen": 80, "phosphorus": 40, "potassium": 60,
+                    "organic_matter": 2.5, "moisture": 50, "temperature": 26}
+
+# One typical request per blueprint (app.BLUEPRINTS, then the whole app): (method, url, JSON body);
+# 'image' posts a generated leaf photo
+FIRST_REQUESTS = {
+    'recommendation': ('POST', '/api/recommend', RECOMMEND_INPUTS),
+    'soils': ('GET', '/api/soils?q=pune', None),
+    'weather': ('POST', '/api/advisory', {"crop_type": "wheat", "location_query": "Pune"}),
+    'pest': ('POST', '/api/pest-detect', 'image'),
+    'market': ('GET', '/api/market-prices/history?days=30', None),
+    'i18n': ('POST', '/api/translate', {"text": "Apply urea", "language": "en"}),
+    'feedback': ('GET', '/api/feedback/stats?days=30', None),
+    'chat': ('POST', '/api/chat', {"message": "How much urea does rice need?"}),
+    'app': ('GET', '/api/ready', None),
+}
+
+def heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+def leaf_image():
+    from io import BytesIO
+    import numpy as np
+    from PIL import Image
+    pixels = np.random.default_rng(0).integers(0, 256, (224, 224, 3)) * np.array([0.3, 0.8, 0.3])
+    buffer = BytesIO()
+    Image.fromarray(pixels.astype(np.uint8)).save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+def measure(name, first_request=False):
+    """Import and register one blueprint ('app' for the whole API) in this, fresh, process."""
+    started = time.perf_counter()
+    import flask
+    import flask_cors  # noqa: F401 (imported by every worker)
+    flask_seconds = time.perf_counter() - started
+
+    before = len(sys.modules)
+    started = time.perf_counter()
+    module = importlib.import_module('app' if name == 'app' else f"api.{name}")
+    import_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    if name == 'app':
+        app = module.app
+    else:
+        app = flask.Flask(__name__)
+        app.register_blueprint(module.bp)
+    register_seconds = time.perf_counter() - started
+    result = {
+        "blueprint": name,
+        "flask_ms": flask_seconds * 1000,
+        "import_ms": import_seconds * 1000,
+        "register_ms": register_seconds * 1000,
+        "modules": len(sys.modules) - before,
+        "heavy": heavy_modules()
+    }
+    if first_request:
+        method, url, body = FIRST_REQUESTS[name]
+        client = app.test_client()
+        started = time.perf_counter()
+        if body == 'image':
+            response = client.open(url, method=method, data={'image': (leaf_image(), 'leaf.png')},
+                                   content_type='multipart/form-data')
+        else:
+            response = client.open(url, method=method, json=body)
+        response.get_data()
+        result.update(first_request_ms=(time.perf_counter() - started) * 1000, status=response.status_code,
+                      heavy_after_request=heavy_modules())
+    return result
+
+def run(name, first_request):
+    """measure() in a fresh interpreter."""
+    command = [sys.executable, '-m', 'api.startup', '--measure', name] + (['--first-request'] if first_request else [])
+    # No warm-up thread: the pest model load should show up in the first request, not race with it
+    env = dict(os.environ, PEST_WARMUP='0', LOG_LEVEL='WARNING')
+    output = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Import cost of each API blueprint")
+    parser.add_argument('--blueprints', default=None, help="Comma-separated (default: all, then the whole app)")
+    parser.add_argument('--repeats', type=int, default=3, help="Fresh processes per blueprint (fastest is reported)")
+    parser.add_argument('--first-request', action='store_true', help="Also time one typical request")
+    parser.add_argument('--measure', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.first_request)))
+        return
+
+    # Not imported from app.py: that would load the whole API into this process
+    names = args.blueprints.split(',') if args.blueprints else list(FIRST_REQUESTS)
+    header = f"{'blueprint':<15}{'import ms':>10}{'register ms':>12}{'modules':>9}"
+    if args.first_request:
+        header += f"{'1st request ms':>16}  heavy libraries (after first request)"
+    else:
+        header += "  heavy libraries"
+    print(header)
+    flask_ms = []
+    for name in names:
+        runs = [run(name, args.first_request) for _ in range(args.repeats)]
+        flask_ms += [r['flask_ms'] for r in runs]
+        best = min(runs, key=lambda r: r['import_ms'])
+        line = (f"{name:<15}{best['import_ms']:>10.1f}{min(r['register_ms'] for r in runs):>12.1f}"
+                f"{best['modules']:>9}")
+        if args.first_request:
+            line += (f"{min(r['first_request_ms'] for r in runs):>16.1f}  {','.join(best['heavy']) or '-'}"
+                     f" ({','.join(best['heavy_after_request']) or '-'}; HTTP {best['status']})")
+        else:
+            line += f"  {','.join(best['heavy']) or '-'}"
+        print(line)
+    print(f"(Flask itself: {min(flask_ms):.0f} ms, paid once per worker; the app row includes creating the app)")
+
+if __name__ == '__main__':
+    main()
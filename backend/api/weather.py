@@ -0,0 +1,303 @@
+"""
+Weather endpoints: location-specific advisory (soil + weather + fertilizer
+guidance) and weather alerts from OpenWeather (OPENWEATHER_API_KEY).
+"""
+import os
+from datetime import datetime
+from flask import Blueprint, jsonify, request
+
+from .data import get_dataset
+from .i18n import translate_text
+from .recommendation import get_fertilizer_recommendations
+from .soils import avg_soil_for_location
+
+bp = Blueprint('weather', __name__)
+
+# Datasets read by these endpoints (see api/data.py): the advisory's soil snapshot
+DATASETS_USED = ('soil',)
+
+def preload():
+    """Read the datasets these endpoints use now (see serve.py)."""
+    for name in DATASETS_USED:
+        get_dataset(name)
+
+ONECALL_URL = "https://api.openweathermap.org/data/2.5/onecall"
+GEOCODE_URL = "http://api.openweathermap.org/geo/1.0/direct"
+UPSTREAM_TIMEOUT = 10  # seconds per upstream call (also asgi.py's default)
+
+def onecall_params(lat: float, lon: float, api_key: str):
+    return {
+        "lat": lat,
+        "lon": lon,
+        "appid": api_key,
+        "units": "metric",
+        "exclude": "minutely"
+    }
+
+def geocode_params(query: str, state: str, country: str, limit: int, api_key: str):
+    # Build q string like "Pune,Maharashtra,IN"
+    parts = [p for p in [query, state, country] if p]
+    return {"q": ",".join(parts), "limit": limit, "appid": api_key}
+
+def parse_geocode(data):
+    if isinstance(data, list) and data:
+        item = data[0]
+        return {
+            "name": item.get("name"),
+            "state": item.get("state"),
+            "country": item.get("country"),
+            "lat": item.get("lat"),
+            "lon": item.get("lon")
+        }
+    return None
+
+def openweather_get(lat: float, lon: float):
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        return {"success": False, "warning": "OPENWEATHER_API_KEY not set", "current": {}, "daily": []}
+    try:
+        import requests
+        r = requests.get(ONECALL_URL, params=onecall_params(lat, lon, api_key), timeout=UPSTREAM_TIMEOUT)
+        r.raise_for_status()
+        return r.json()
+    except Exception as e:
+        return {"success": False, "error": str(e), "current": {}, "daily": []}
+
+def geocode_openweather(query: str, state: str = None, country: str = "IN", limit: int = 1):
+    """Resolve place name to coordinates using OpenWeather Geocoding API."""
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        return None
+    try:
+        import requests
+        r = requests.get(GEOCODE_URL, params=geocode_params(query, state, country, limit, api_key),
+                         timeout=UPSTREAM_TIMEOUT)
+        r.raise_for_status()
+        return parse_geocode(r.json())
+    except Exception:
+        return None
+
+async def openweather_get_async(session, lat: float, lon: float):
+    """openweather_get() on an aiohttp ClientSession (asgi.py)."""
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        return {"success": False, "warning": "OPENWEATHER_API_KEY not set", "current": {}, "daily": []}
+    try:
+        async with session.get(ONECALL_URL, params=onecall_params(lat, lon, api_key)) as r:
+            r.raise_for_status()
+            return await r.json(content_type=None)
+    except Exception as e:
+        return {"success": False, "error": str(e), "current": {}, "daily": []}
+
+async def geocode_openweather_async(session, query: str, state: str = None, country: str = "IN", limit: int = 1):
+    """geocode_openweather() on an aiohttp ClientSession (asgi.py)."""
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        return None
+    try:
+        async with session.get(GEOCODE_URL, params=geocode_params(query, state, country, limit, api_key)) as r:
+            r.raise_for_status()
+            return parse_geocode(await r.json(content_type=None))
+    except Exception:
+        return None
+
+# Advisory thresholds and texts (also indexed for /api/chat, see weather_advisory_rules)
+HEAT_ALERT_C = 38
+COLD_ALERT_C = 10
+RAIN_ALERT_POP = 0.5
+HUMIDITY_INSIGHT_PCT = 85
+WIND_INSIGHT_MS = 10
+RAIN_ALERT = "High chance of rain; plan irrigation and fertilizer accordingly"
+HUMIDITY_INSIGHT = "High humidity may increase fungal disease risk. Monitor leaves and ensure airflow."
+WIND_INSIGHT = "High winds expected. Secure structures and avoid foliar sprays."
+
+def weather_advisory_rules():
+    """(title, text) for each weather alert and insight the advisory can give."""
+    return [
+        ("Heat alert in the weather advisory",
+         f"A high temperature alert is raised when a daily maximum of {HEAT_ALERT_C} °C or more is forecast "
+         f"in the next three days."),
+        ("Cold alert in the weather advisory",
+         f"A low temperature alert is raised when a daily minimum of {COLD_ALERT_C} °C or less is forecast "
+         f"in the next three days."),
+        ("Rain alert in the weather advisory",
+         f"When the chance of rain is {RAIN_ALERT_POP:.0%} or more on one of the next three days: "
+         f"{RAIN_ALERT}."),
+        ("Humidity and fungal disease in the weather advisory",
+         f"At {HUMIDITY_INSIGHT_PCT}% humidity or more: {HUMIDITY_INSIGHT}"),
+        ("Wind and spraying in the weather advisory",
+         f"At wind speeds of {WIND_INSIGHT_MS} m/s or more: {WIND_INSIGHT}")
+    ]
+
+def generate_weather_insights(ow):
+    insights = []
+    alerts = []
+    try:
+        daily = ow.get("daily", [])[:3]
+        current = ow.get("current", {})
+        # Temperature alerts
+        for d in daily:
+            dt = d.get("dt")
+            tmax = d.get("temp", {}).get("max")
+            tmin = d.get("temp", {}).get("min")
+            pop = d.get("pop", 0)
+            if tmax is not None and tmax >= HEAT_ALERT_C:
+                alerts.append({"type": "heat", "message": f"High temperature expected: {tmax}°C"})
+            if tmin is not None and tmin <= COLD_ALERT_C:
+                alerts.append({"type": "cold", "message": f"Low temperature expected: {tmin}°C"})
+            if pop and pop >= RAIN_ALERT_POP:
+                alerts.append({"type": "rain", "message": RAIN_ALERT})
+
+        if current:
+            humidity = current.get("humidity")
+            wind = current.get("wind_speed")
+            if humidity and humidity >= HUMIDITY_INSIGHT_PCT:
+                insights.append(HUMIDITY_INSIGHT)
+            if wind and wind >= WIND_INSIGHT_MS:
+                insights.append(WIND_INSIGHT)
+    except Exception:
+        pass
+
+    return alerts, insights
+
+def weather_note(ow):
+    """Why fetched weather data is missing, else None."""
+    if not ow or ow.get('success') is False:
+        return ow.get('warning') or ow.get('error') or 'Weather data unavailable.'
+    return None
+
+def compose_advisory(crop, location_query, soil_snapshot, resolved_loc, lat, lon, ow, note):
+    """The advisory text (English) for `crop` from the soil snapshot and OpenWeather data `ow`."""
+    # Fertilizer recommendations
+    recs = get_fertilizer_recommendations(
+        crop_type=crop,
+        soil_ph=soil_snapshot['soil_ph'],
+        nitrogen=soil_snapshot['nitrogen'],
+        phosphorus=soil_snapshot['phosphorus'],
+        potassium=soil_snapshot['potassium'],
+        organic_matter=soil_snapshot['organic_matter'],
+        moisture=soil_snapshot['moisture'],
+        temperature=soil_snapshot['temperature'],
+        soil_type=soil_snapshot.get('soil_type', 'loam'),
+        soil_name=location_query
+    )
+
+    alerts, insights = generate_weather_insights(ow if isinstance(ow, dict) else {})
+
+    lines = []
+    lines.append(f"Crop: {crop.capitalize()}")
+    # Location lines
+    if location_query:
+        lines.append(f"Location: {location_query}")
+    if resolved_loc:
+        pretty = ", ".join([str(x) for x in [resolved_loc.get('name'), resolved_loc.get('state'), resolved_loc.get('country')] if x])
+        if pretty:
+            lines.append(f"Resolved: {pretty}")
+    if lat is not None and lon is not None:
+        lines.append(f"Coordinates: {lat}, {lon}")
+    lines.append("Soil snapshot: "
+                 f"pH {soil_snapshot['soil_ph']:.1f}, N {soil_snapshot['nitrogen']:.0f}, "
+                 f"P {soil_snapshot['phosphorus']:.0f}, K {soil_snapshot['potassium']:.0f}, "
+                 f"OM {soil_snapshot['organic_matter']:.1f}%")
+    if insights:
+        lines.append("Weather insights: " + "; ".join(insights))
+    if alerts:
+        lines.append("Alerts: " + "; ".join([a['message'] for a in alerts]))
+    if note:
+        lines.append(f"Note: {note}")
+    lines.append("Fertilizer guidance:")
+    for r in recs:
+        lines.append(f"- [{r['priority']}] {r['type']}: {r['product']} — {r['quantity']} ({r['reason']})")
+    return "\n".join(lines)
+
+def advisory_result(advisory_out, advisory_en, target_lang, soil_snapshot, ow, resolved_loc):
+    return {
+        "success": True,
+        "advisory": advisory_out,
+        "advisory_en": advisory_en,
+        "language": target_lang,
+        "soil": soil_snapshot,
+        "weather_available": bool(ow),
+        "resolved_location": resolved_loc,
+        "timestamp": datetime.now().isoformat()
+    }
+
+def alerts_result(ow, resolved_loc):
+    alerts, insights = generate_weather_insights(ow if isinstance(ow, dict) else {})
+    return {
+        "success": True,
+        "alerts": alerts,
+        "insights": insights,
+        "warning": ow.get('warning') if isinstance(ow, dict) else None,
+        "resolved_location": resolved_loc
+    }
+
+# The same two endpoints are served on asyncio by asgi.py, where the
+# OpenWeather and translation calls don't hold a worker thread each.
+
+@bp.route('/api/advisory', methods=['POST'])
+def advisory():
+    """Multilingual, location-specific crop advisory combining soil + weather + fertilizer guidance."""
+    try:
+        data = request.get_json(force=True)
+        crop = data.get('crop_type', 'rice')
+        location_query = data.get('location_query', '')  # e.g., district/state name
+        lat = data.get('lat')
+        lon = data.get('lon')
+        target_lang = data.get('language', 'en')
+        # Optional separated fields for better geocoding
+        district = data.get('district')
+        state = data.get('state')
+
+        # Soil snapshot for location
+        soil_snapshot = avg_soil_for_location(location_query)
+
+        # Weather (geocode if needed)
+        ow = {}
+        note = None
+        resolved_loc = None
+        if (lat is None or lon is None) and (location_query or state or district):
+            # Try geocoding from provided human-readable location
+            q = location_query or district or ""
+            resolved_loc = geocode_openweather(q, state=state or None)
+            if resolved_loc and resolved_loc.get('lat') is not None and resolved_loc.get('lon') is not None:
+                lat = resolved_loc['lat']
+                lon = resolved_loc['lon']
+        if lat is not None and lon is not None:
+            ow = openweather_get(float(lat), float(lon))
+            note = weather_note(ow)
+
+        advisory_en = compose_advisory(crop, location_query, soil_snapshot, resolved_loc, lat, lon, ow, note)
+        advisory_out = translate_text(advisory_en, target_lang)
+        return jsonify(advisory_result(advisory_out, advisory_en, target_lang, soil_snapshot, ow, resolved_loc))
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@bp.route('/api/weather-alerts', methods=['GET'])
+def weather_alerts():
+    try:
+        lat_param = request.args.get('lat')
+        lon_param = request.args.get('lon')
+        q = request.args.get('q')
+        state = request.args.get('state')
+        district = request.args.get('district')
+
+        resolved_loc = None
+        if lat_param and lon_param:
+            lat = float(lat_param)
+            lon = float(lon_param)
+        else:
+            # Try to resolve by name
+            query = q or district or ''
+            if not (query or state):
+                return jsonify({"success": False, "error": "Provide lat/lon or q/state/district"}), 400
+            resolved_loc = geocode_openweather(query, state=state or None)
+            if not resolved_loc or resolved_loc.get('lat') is None or resolved_loc.get('lon') is None:
+                return jsonify({"success": False, "error": "Failed to resolve location name"}), 400
+            lat = float(resolved_loc['lat'])
+            lon = float(resolved_loc['lon'])
+        ow = openweather_get(lat, lon)
+        return jsonify(alerts_result(ow, resolved_loc))
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
@@ -0,0 +1,173 @@
+"""
+Async (ASGI) app for the endpoints that spend their time waiting on
+upstream services: /api/advisory and /api/weather-alerts (OpenWeather),
+/api/translate and /api/tts (Google).
+
+On the sync workers each of these holds a thread for the whole upstream
+call. Here they run on one asyncio event loop per worker with a shared
+aiohttp ClientSession, so a process can have thousands of upstream calls
+in flight. Responses are the same as from app.py, which keeps serving these
+routes too. Route the four paths to this server (e.g. from the reverse
+proxy) and leave the rest of the API on the sync workers, with CPU-heavy
+pest detection on its own (API_BLUEPRINTS=pest). From backend/:
+
+    python serve.py run --asgi --bind 0.0.0.0:5001
+
+ASGI_MAX_CONNECTIONS caps the upstream connections per worker (default 1000).
+"""
+import base64
+from contextlib import asynccontextmanager
+import logging
+import os
+import sys
+import aiohttp
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+load_dotenv()
+
+from api.data import get_dataset
+from api.i18n import synthesize_speech_async, translate_text_async
+from api.soils import avg_soil_for_location
+from api.weather import (UPSTREAM_TIMEOUT, advisory_result, alerts_result, compose_advisory,
+                         geocode_openweather_async, openweather_get_async, weather_note)
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv("ASGI_MAX_CONNECTIONS", "1000"))
+
+@asynccontextmanager
+async def lifespan(app):
+    # Read before serving: the first advisory would otherwise block the event loop on the CSV
+    get_dataset('soil')
+    # aiohttp rather than httpx: at a thousand open connections httpx's pool costs
+    # milliseconds of CPU per call, aiohttp's about a quarter of one
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
+    timeout = aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        app.state.http = session
+        logger.info("Async upstream client ready (up to %d connections)", MAX_CONNECTIONS)
+        yield
+
+async def advisory(request):
+    """Async /api/advisory (see api/weather.py)."""
+    session = request.app.state.http
+    try:
+        data = await request.json()
+        crop = data.get('crop_type', 'rice')
+        location_query = data.get('location_query', '')
+        lat = data.get('lat')
+        lon = data.get('lon')
+        target_lang = data.get('language', 'en')
+        district = data.get('district')
+        state = data.get('state')
+
+        soil_snapshot = avg_soil_for_location(location_query)
+
+        ow = {}
+        note = None
+        resolved_loc = None
+        if (lat is None or lon is None) and (location_query or state or district):
+            q = location_query or district or ""
+            resolved_loc = await geocode_openweather_async(session, q, state=state or None)
+            if resolved_loc and resolved_loc.get('lat') is not None and resolved_loc.get('lon') is not None:
+                lat = resolved_loc['lat']
+                lon = resolved_loc['lon']
+        if lat is not None and lon is not None:
+            ow = await openweather_get_async(session, float(lat), float(lon))
+            note = weather_note(ow)
+
+        advisory_en = compose_advisory(crop, location_query, soil_snapshot, resolved_loc, lat, lon, ow, note)
+        advisory_out = await translate_text_async(session, advisory_en, target_lang)
+        return JSONResponse(advisory_result(advisory_out, advisory_en, target_lang, soil_snapshot, ow, resolved_loc))
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+
+async def weather_alerts(request):
+    """Async /api/weather-alerts (see api/weather.py)."""
+    session = request.app.state.http
+    try:
+        lat_param = request.query_params.get('lat')
+        lon_param = request.query_params.get('lon')
+        q = request.query_params.get('q')
+        state = request.query_params.get('state')
+        district = request.query_params.get('district')
+
+        resolved_loc = None
+        if lat_param and lon_param:
+            lat = float(lat_param)
+            lon = float(lon_param)
+        else:
+            query = q or district or ''
+            if not (query or state):
+                return JSONResponse({"success": False, "error": "Provide lat/lon or q/state/district"}, status_code=400)
+            resolved_loc = await geocode_openweather_async(session, query, state=state or None)
+            if not resolved_loc or resolved_loc.get('lat') is None or resolved_loc.get('lon') is None:
+                return JSONResponse({"success": False, "error": "Failed to resolve location name"}, status_code=400)
+            lat = float(resolved_loc['lat'])
+            lon = float(resolved_loc['lon'])
+        ow = await openweather_get_async(session, lat, lon)
+        return JSONResponse(alerts_result(ow, resolved_loc))
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+
+async def api_translate(request):
+    """Async /api/translate (see api/i18n.py)."""
+    try:
+        data = await request.json()
+        text = data.get('text', '')
+        lang = data.get('language', 'en')
+        out = await translate_text_async(request.app.state.http, text, lang)
+        return JSONResponse({"success": True, "translated": out, "language": lang})
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+
+async def tts(request):
+    """Async /api/tts (see api/i18n.py)."""
+    try:
+        data = await request.json()
+        text = data.get('text')
+        lang = data.get('language', 'en')
+        if not text:
+            return JSONResponse({"success": False, "error": "text is required"}, status_code=400)
+        try:
+            audio = await synthesize_speech_async(request.app.state.http, text, lang)
+            b64 = base64.b64encode(audio).decode('utf-8')
+            return JSONResponse({"success": True, "audio_base64": b64, "format": "mp3"})
+        except Exception as e:
+            return JSONResponse({"success": False, "error": f"TTS failed: {e}"}, status_code=500)
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+
+async def ready(request):
+    """Readiness probe: this app has no models to load, only the soil dataset."""
+    return JSONResponse({"ready": True, "datasets": get_dataset('soil') is not None})
+
+def create_app():
+    return Starlette(
+        routes=[
+            Route('/api/advisory', advisory, methods=['POST']),
+            Route('/api/weather-alerts', weather_alerts, methods=['GET']),
+            Route('/api/translate', api_translate, methods=['POST']),
+            Route('/api/tts', tts, methods=['POST']),
+            Route('/api/ready', ready, methods=['GET']),
+        ],
+        # Same CORS policy as app.py
+        middleware=[Middleware(CORSMiddleware, allow_origins=["*"],
+                               allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+                               allow_headers=["Content-Type", "Authorization"])],
+        lifespan=lifespan
+    )
+
+app = create_app()
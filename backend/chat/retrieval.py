@@ -0,0 +1,175 @@
+"""
+Local retrieval for /api/chat: BM25 over the app's own agronomy knowledge.
+
+Passages come from the crop and fertilizer datasets, the per-crop nutrient
+requirements and soil-type notes used by the rule-based recommender, the
+weather alert and insight rules of the location advisory, and the pest
+detection treatment guide. No remote model is involved.
+
+The inverted index stores, per term, the ids of the passages containing it
+with their precomputed BM25 term weight (idf x saturated, length-normalised
+term frequency). These weights don't depend on the query, so ranking only
+adds up a few short arrays per query term, well under a millisecond for
+this corpus.
+"""
+import re
+from dataclasses import dataclass
+import numpy as np
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in is it my of on or should so the their this to
+what when which who why will with you your me we our about into than then there these those much many
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def stem(token):
+    """Crude plural folding so 'potatoes'/'potato' and 'leaves'/'leaf' meet."""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 4 and token.endswith('ves'):
+        return token[:-3] + 'f'
+    if len(token) > 4 and token.endswith('oes'):
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def tokenize(text):
+    return [stem(t) for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+@dataclass
+class Passage:
+    title: str
+    text: str
+    source: str
+    crop: str = None  # stemmed name of the crop it is about, if any
+
+class BM25Index:
+    def __init__(self, passages, k1=1.5, b=0.75):
+        self.passages = list(passages)
+        self.crops = {p.crop for p in self.passages if p.crop}
+        docs = [tokenize(p.title) * 2 + tokenize(p.text) for p in self.passages]  # titles count double
+        lengths = np.array([len(d) for d in docs], dtype=np.float64)
+        avg_length = lengths.mean() if len(docs) else 1.0
+        postings = {}
+        for doc_id, tokens in enumerate(docs):
+            terms, counts = np.unique(tokens, return_counts=True) if tokens else ((), ())
+            for term, count in zip(terms, counts):
+                postings.setdefault(str(term), []).append((doc_id, count))
+        n = len(docs)
+        self.postings = {}
+        for term, entries in postings.items():
+            ids = np.array([e[0] for e in entries], dtype=np.int32)
+            tf = np.array([e[1] for e in entries], dtype=np.float64)
+            idf = np.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = k1 * (1 - b + b * lengths[ids] / avg_length)
+            self.postings[term] = (ids, idf * tf * (k1 + 1) / (tf + norm))
+
+    def search(self, query, k=3):
+        """
+        Best passages for a free-text query.
+
+        Returns:
+            list: (score, Passage) pairs, best first; empty if no term matches
+        """
+        scores = np.zeros(len(self.passages))
+        matched = False
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is not None:
+                scores[entry[0]] += entry[1]
+                matched = True
+        if not matched:
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.passages[i]) for i in top if scores[i] > 0]
+
+def _join(items):
+    return '; '.join(str(item) for item in items)
+
+def build_passages(crop_data=None, fertilizer_data=None, crop_requirements=None, soil_traits=None, treatment_info=None,
+                   advisory_rules=None):
+    """Passages from whichever knowledge sources are available (None ones are skipped)."""
+    passages = []
+    for title, text in advisory_rules or ():
+        passages.append(Passage(title, text, 'advisory templates'))
+    for crop, req in (crop_requirements or {}).items():
+        ph_min, ph_max = req['ph_range']
+        passages.append(Passage(
+            f"{crop.capitalize()} fertilizer requirement",
+            f"{crop.capitalize()} needs about N {req['N']}, P {req['P']} and K {req['K']} kg/ha of nitrogen, "
+            f"phosphorus and potassium, and grows best at soil pH {ph_min}-{ph_max}. Below that apply lime; "
+            f"above it apply sulfur. Make up nutrient deficits with urea for nitrogen, DAP or superphosphate "
+            f"for phosphorus and muriate of potash for potassium.",
+            'recommendation rules', stem(crop.lower())))
+    for soil, traits in (soil_traits or {}).items():
+        extras = [f"preferred {key.split('_', 1)[1]} source: {value}" for key, value in traits.items()
+                  if key.startswith('prefer_')]
+        if traits.get('micronutrient'):
+            extras.append(f"watch micronutrients, apply {traits['micronutrient']}")
+        if traits.get('organic'):
+            extras.append("benefits from compost or vermicompost")
+        text = f"{traits['notes']}."
+        if extras:
+            text += f" {_join(extras)[0].upper()}{_join(extras)[1:]}."
+        passages.append(Passage(f"{soil.capitalize()} soil", text, 'soil types'))
+    if crop_data is not None:
+        for row in crop_data.itertuples(index=False):
+            passages.append(Passage(
+                f"{row.crop_name} ({row.variety})",
+                f"{row.crop_name} variety {row.variety} is a {row.season} crop of {row.duration_days} days. "
+                f"Nutrient requirement N {row.nitrogen_req}, P {row.phosphorus_req}, K {row.potassium_req} kg/ha; "
+                f"pH {row.ph_min}-{row.ph_max}, temperature {row.temperature_min}-{row.temperature_max} °C, "
+                f"rainfall {row.rainfall_min}-{row.rainfall_max} mm. Typical yield {row.yield_per_hectare} t/ha, "
+                f"market price about Rs {row.market_price_per_kg}/kg.",
+                'crop dataset', stem(str(row.crop_name).lower())))
+    if fertilizer_data is not None:
+        for row in fertilizer_data.itertuples(index=False):
+            passages.append(Passage(
+                f"{row.fertilizer_name} ({row.brand})",
+                f"{row.fertilizer_name} ({row.composition}, {row.nutrient_content}) is a {row.type} fertilizer "
+                f"costing about Rs {row.price_per_kg}/kg, availability {row.availability}. Suitable crops: "
+                f"{row.suitable_crops}. Apply by {row.application_method.lower()} at {row.dosage_per_hectare} "
+                f"kg per hectare; season: {row.season_preference}.",
+                'fertilizer dataset'))
+    for condition, info in (treatment_info or {}).items():
+        name = condition.replace('_', ' ')
+        for section, content in info.items():
+            if section == 'description':
+                continue
+            if section == 'common_deficiencies':
+                for nutrient, details in content.items():
+                    passages.append(Passage(
+                        f"{nutrient.capitalize()} deficiency in plants",
+                        f"Symptoms: {_join(details['symptoms'])}. Solutions: {_join(details['solutions'])}.",
+                        'pest detection guide'))
+                continue
+            passages.append(Passage(f"{name.capitalize()} plant: {section.replace('_', ' ')}",
+                                    f"{info.get('description', '')} {_join(content)}".strip(), 'pest detection guide'))
+    return passages
+
+def answer_chunks(index, question, k=3, min_ratio=0.7):
+    """
+    Chunks of an answer to `question`: the best passage plus runners-up
+    scoring at least `min_ratio` of it. If the question names crops,
+    passages about other crops are left out.
+
+    Returns:
+        tuple: (list of chunk strings, list of {"title", "source", "score"})
+    """
+    hits = index.search(question, k=k * 3)
+    asked = set(tokenize(question)) & index.crops
+    if asked:
+        hits = [(score, passage) for score, passage in hits if passage.crop is None or passage.crop in asked]
+    hits = hits[:k]
+    if not hits:
+        return [], []
+    best = hits[0][0]
+    hits = [(score, passage) for score, passage in hits if score >= best * min_ratio]
+    chunks = [f"{passage.title}: {passage.text}" + ("\n\n" if i < len(hits) - 1 else "")
+              for i, (_, passage) in enumerate(hits)]
+    sources = [{"title": p.title, "source": p.source, "score": round(score, 3)} for score, p in hits]
+    return chunks, sources
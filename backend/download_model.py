@@ -1,23 +1,30 @@
+import argparse
 import os
 import torch
 from pest_detection.model import PestDetector
+from pest_detection.tiers import BACKBONES, resolve_tier, weights_filename
 
-def download_model():
+def download_model(tier=None):
     # Create models directory if it doesn't exist
     os.makedirs('models', exist_ok=True)
     
-    # Initialize the model
-    model = PestDetector(num_classes=4)
+    tier = resolve_tier(tier)
+    backbone = BACKBONES[tier]
     
-    # Save the model with random weights (for now)
-    model_path = os.path.join('models', 'pest_detection.pth')
+    # Initialize the model with the ImageNet backbone (downloads once)
+    model = PestDetector(num_classes=4, pretrained=True, backbone=backbone)
+    
+    # Save the model with a random head (for now)
+    model_path = os.path.join('models', weights_filename(tier))
     torch.save(model.state_dict(), model_path)
     print(f"Model saved to {model_path}")
     
     # Verify the model can be loaded
-    loaded_model = PestDetector(num_classes=4)
+    loaded_model = PestDetector(num_classes=4, backbone=backbone)
     loaded_model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
     print("Model loaded successfully")
 
 if __name__ == '__main__':
-    download_model()
+    parser = argparse.ArgumentParser(description="Save pest detection weights with an ImageNet backbone")
+    parser.add_argument('--tier', default=None, help="Model tier: fast, balanced or accurate (default PEST_MODEL_TIER)")
+    download_model(parser.parse_args().tier)
@@ -0,0 +1,381 @@
+"""
+Columnar index and incremental aggregates over the feedback segments.
+
+Compaction reads only what it hasn't seen: for every segment (active
+.jsonl or sealed .jsonl.gz, see writer.py) the number of bytes already
+consumed is kept, so an active segment is read from where the last run
+stopped and a sealed one is skipped once done. New records are
+
+  * appended as a column chunk (int64 epoch seconds, uint16 feature code,
+    int8 rating with 0 for unrated) sorted by (feature, time), which
+    count() answers arbitrary time windows from, and
+  * folded into per-feature, per-day rating counts, one file per month.
+
+Feature names come from an unauthenticated POST, so only FEATURES are kept
+as they are; anything else is counted as "other".
+
+Everything lives under <feedback dir>/index/. Chunks and month files are
+written under new names, and meta.json (dictionary, offsets, chunk and
+month file names) is replaced atomically after them, so a compaction only
+rewrites the months it touched. An flock keeps compactions in different
+processes from overlapping. From backend/:
+
+    python -m feedback.index compact
+"""
+import argparse
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .writer import DEFAULT_DIR
+
+logger = logging.getLogger(__name__)
+
+# Ratings are 1..5; bucket 0 counts records without a valid rating
+RATINGS = 6
+# Features the clients rate; other names are counted as OTHER_FEATURE
+FEATURES = ('recommendation', 'advisory', 'weather', 'pest-detect', 'market-prices')
+UNKNOWN_FEATURE = 'unknown'
+OTHER_FEATURE = 'other'
+# Merge column chunks once there are more than this many
+MAX_CHUNKS = 16
+
+def parse_record(line):
+    """(epoch seconds, day, feature, rating) for a JSONL feedback line, or None if unreadable."""
+    try:
+        record = json.loads(line)
+        stamp = datetime.fromisoformat(record['timestamp'])
+        payload = record.get('payload') or {}
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(payload, dict):
+        payload = {}
+    feature = str(payload.get('feature') or '').strip().lower() or UNKNOWN_FEATURE
+    if feature not in FEATURES and feature != UNKNOWN_FEATURE:
+        feature = OTHER_FEATURE
+    try:
+        rating = int(payload.get('rating'))
+    except (TypeError, ValueError):
+        rating = 0
+    if not 1 <= rating <= 5:
+        rating = 0
+    return int(stamp.timestamp()), stamp.date().isoformat(), feature, rating
+
+def segment_sources(directory, legacy_paths=()):
+    """(key, path, compressed, sealed) for every feedback segment in `directory` and legacy file."""
+    sources = []
+    for path in legacy_paths:
+        if path and os.path.exists(path):
+            sources.append(('legacy:' + os.path.basename(path), path, False, False))
+    for path in glob.glob(os.path.join(directory, 'feedback-*.jsonl')):
+        sources.append((os.path.basename(path), path, False, False))
+    # A sealed segment keeps its active name as key, so its offset carries over
+    for path in glob.glob(os.path.join(directory, 'feedback-*.jsonl.gz')):
+        sources.append((os.path.basename(path)[:-3], path, True, True))
+    return sources
+
+def read_new_lines(sources, offsets, done):
+    """
+    Complete lines of `sources` not read before.
+
+    `offsets` (key -> bytes consumed) and `done` (keys of fully read sealed
+    segments) are updated in place; persist them with the results.
+    """
+    lines = []
+    for key, path, compressed, sealed in sources:
+        if key in done:
+            continue
+        offset = offsets.get(key, 0)
+        try:
+            with (gzip.open(path, 'rb') if compressed else open(path, 'rb')) as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            # Sealed between listing and reading; picked up as .gz next time
+            continue
+        # Only whole lines: an active segment may end mid-write
+        end = data.rfind(b'\n') + 1
+        lines.extend(data[:end].splitlines())
+        offsets[key] = offset + end
+        if sealed:
+            done.add(key)
+            offsets.pop(key, None)
+    return lines
+
+class FeedbackIndex:
+    def __init__(self, directory=DEFAULT_DIR, legacy_paths=()):
+        self.directory = directory
+        self.index_dir = os.path.join(directory, 'index')
+        self.legacy_paths = [p for p in legacy_paths if p]
+        self._meta = None
+        self._meta_mtime = None
+        self._month_cache = {}
+        self._lock = threading.Lock()
+
+    def _empty_meta(self):
+        return {"version": 0, "features": [], "offsets": {}, "done": [], "chunks": [], "months": {}, "records": 0}
+
+    def meta(self):
+        """Current meta.json (cached until it changes on disk)."""
+        path = os.path.join(self.index_dir, 'meta.json')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return self._empty_meta()
+        with self._lock:
+            if mtime != self._meta_mtime:
+                with open(path) as f:
+                    self._meta = json.load(f)
+                self._meta_mtime = mtime
+                current = set(self._meta.get('months', {}).values())
+                self._month_cache = {name: data for name, data in self._month_cache.items() if name in current}
+            return self._meta
+
+    def month(self, meta, month):
+        """{feature: {day: counts}} for a "YYYY-MM" month (month files never change, so they are cached by name)."""
+        name = meta['months'].get(month)
+        if name is None:
+            return {}
+        data = self._month_cache.get(name)
+        if data is None:
+            with open(os.path.join(self.index_dir, name)) as f:
+                data = json.load(f)
+            self._month_cache[name] = data
+        return data
+
+    def compact(self):
+        """
+        Index everything written since the last compaction.
+
+        Returns:
+            int: number of new records, or None if another process is compacting
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        lock_fd = os.open(os.path.join(self.index_dir, '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return None
+            return self._compact_locked()
+        finally:
+            os.close(lock_fd)
+
+    def _compact_locked(self):
+        meta = json.loads(json.dumps(self.meta()))  # private copy
+        months = {}
+        if 'daily' in meta:
+            # Written before the aggregates were split by month
+            for feature, days in meta.pop('daily').items():
+                for day, counts in days.items():
+                    months.setdefault(day[:7], {}).setdefault(feature, {})[day] = counts
+            meta['months'] = {}
+        offsets, done = meta['offsets'], set(meta['done'])
+        rows = []
+        for line in read_new_lines(segment_sources(self.directory, self.legacy_paths), offsets, done):
+            parsed = parse_record(line)
+            if parsed is not None:
+                rows.append(parsed)
+        if not rows and not months:
+            if done != set(meta['done']) or offsets != self.meta()['offsets']:
+                meta['done'] = sorted(done)
+                self._publish(meta)
+            return 0
+
+        features = meta['features']
+        codes = {name: i for i, name in enumerate(features)}
+        for _, day, feature, rating in rows:
+            if feature not in codes:
+                codes[feature] = len(features)
+                features.append(feature)
+            month = months.get(day[:7])
+            if month is None:
+                month = months[day[:7]] = json.loads(json.dumps(self.month(meta, day[:7])))
+            counts = month.setdefault(feature, {}).setdefault(day, [0] * RATINGS)
+            counts[rating] += 1
+
+        stamps = np.array([r[0] for r in rows], dtype=np.int64)
+        feature_codes = np.array([codes[r[2]] for r in rows], dtype=np.uint16)
+        ratings = np.array([r[3] for r in rows], dtype=np.int8)
+        meta['version'] += 1
+        old_files = []
+        if rows:
+            chunk = f"chunk-{meta['version']}"
+            self._write_chunk(chunk, stamps, feature_codes, ratings)
+            meta['chunks'].append(chunk)
+        meta['records'] += len(rows)
+        meta['done'] = sorted(done)
+        if len(meta['chunks']) > MAX_CHUNKS:
+            merged = f"chunk-{meta['version']}m"
+            columns = [self.chunk_columns(name) for name in meta['chunks']]
+            self._write_chunk(merged, *(np.concatenate([c[i] for c in columns]) for i in range(3)))
+            old_files += [f"{name}.{column}.npy" for name in meta['chunks'] for column in ('time', 'feature', 'rating')]
+            meta['chunks'] = [merged]
+        for month, data in months.items():
+            name = f"daily-{month}.v{meta['version']}.json"
+            with open(os.path.join(self.index_dir, name), 'w') as f:
+                json.dump(data, f)
+            if month in meta['months']:
+                old_files.append(meta['months'][month])
+            meta['months'][month] = name
+        self._publish(meta)
+        for name in old_files:
+            try:
+                os.unlink(os.path.join(self.index_dir, name))
+            except FileNotFoundError:
+                pass
+        return len(rows)
+
+    def _write_chunk(self, name, stamps, feature_codes, ratings):
+        order = np.lexsort((stamps, feature_codes))
+        for column, values in (('time', stamps), ('feature', feature_codes), ('rating', ratings)):
+            np.save(os.path.join(self.index_dir, f"{name}.{column}.npy"), values[order])
+
+    def _publish(self, meta):
+        tmp_path = os.path.join(self.index_dir, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.index_dir, 'meta.json'))
+
+    def chunk_columns(self, name):
+        """(epoch seconds, feature codes, ratings) of a chunk, memory-mapped and sorted by (feature, time)."""
+        return tuple(np.load(os.path.join(self.index_dir, f"{name}.{column}.npy"), mmap_mode='r')
+                     for column in ('time', 'feature', 'rating'))
+
+    def count(self, feature=None, start=None, end=None):
+        """
+        Rating counts over the indexed records for start <= time < end (epoch seconds).
+
+        Returns:
+            list: RATINGS counts (index 0: unrated)
+        """
+        meta = self.meta()
+        totals = np.zeros(RATINGS, dtype=np.int64)
+        if feature is not None and feature not in meta['features']:
+            return totals.tolist()
+        code = None if feature is None else meta['features'].index(feature)
+        for name in meta['chunks']:
+            stamps, codes, ratings = self.chunk_columns(name)
+            if code is not None:
+                lo, hi = np.searchsorted(codes, code, 'left'), np.searchsorted(codes, code, 'right')
+                stamps, ratings = stamps[lo:hi], ratings[lo:hi]
+                # Sorted by time within one feature
+                lo = 0 if start is None else np.searchsorted(stamps, start, 'left')
+                hi = len(stamps) if end is None else np.searchsorted(stamps, end, 'left')
+                ratings = ratings[lo:hi]
+            else:
+                mask = np.ones(len(stamps), dtype=bool)
+                if start is not None:
+                    mask &= stamps >= start
+                if end is not None:
+                    mask &= stamps < end
+                ratings = ratings[mask]
+            totals += np.bincount(ratings, minlength=RATINGS)
+        return totals.tolist()
+
+    def daily_stats(self, feature=None, start=None, end=None):
+        """
+        Rating distribution per feature per day from the incremental aggregates.
+
+        Args:
+            feature: Only this feature (None for all)
+            start, end: Inclusive ISO dates (None for open-ended)
+
+        Returns:
+            dict: {feature: {"total", "rated", "average", "ratings", "daily": [...]}}
+        """
+        meta = self.meta()
+        by_feature = {}
+        for month in sorted(meta['months']):
+            # Only the month files overlapping [start, end]
+            if (start and month < start[:7]) or (end and month > end[:7]):
+                continue
+            for name, days in self.month(meta, month).items():
+                if feature is None or name == feature:
+                    by_feature.setdefault(name, {}).update(days)
+        result = {}
+        for name, days in sorted(by_feature.items()):
+            daily = []
+            totals = [0] * RATINGS
+            for day in sorted(days):
+                if (start and day < start) or (end and day > end):
+                    continue
+                counts = days[day]
+                totals = [a + b for a, b in zip(totals, counts)]
+                daily.append({"date": day, **_summary(counts)})
+            if daily:
+                result[name] = {**_summary(totals), "daily": daily}
+        return result
+
+    def window_stats(self, feature=None, start=None, end=None):
+        """Rating distribution per feature for start <= time < end (epoch seconds), from the column chunks."""
+        result = {}
+        for name in self.meta()['features'] if feature is None else [feature]:
+            counts = self.count(feature=name, start=start, end=end)
+            if sum(counts):
+                result[name] = _summary(counts)
+        return result
+
+def _summary(counts):
+    rated = sum(counts[1:])
+    return {
+        "total": sum(counts),
+        "rated": rated,
+        "average": round(sum(r * n for r, n in enumerate(counts)) / rated, 3) if rated else None,
+        "ratings": {str(r): counts[r] for r in range(1, RATINGS)}
+    }
+
+# Legacy single-file log written before segments existed
+LEGACY_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'feedback.jsonl')
+
+feedback_index = None
+_last_compaction = 0.0
+_compaction_lock = threading.Lock()
+
+def get_feedback_index():
+    """Get or create the FeedbackIndex for FEEDBACK_DIR (including the legacy feedback.jsonl)."""
+    global feedback_index
+    if feedback_index is None:
+        feedback_index = FeedbackIndex(legacy_paths=[LEGACY_LOG])
+    return feedback_index
+
+def refresh_feedback_index(min_interval=None):
+    """Compact new feedback if the last compaction in this process is older than `min_interval` seconds."""
+    global _last_compaction
+    if min_interval is None:
+        min_interval = float(os.getenv("FEEDBACK_COMPACT_INTERVAL", "10"))
+    if not _compaction_lock.acquire(blocking=False):
+        return None
+    try:
+        if time.monotonic() - _last_compaction < min_interval:
+            return None
+        _last_compaction = time.monotonic()
+        return get_feedback_index().compact()
+    finally:
+        _compaction_lock.release()
+
+def main():
+    parser = argparse.ArgumentParser(description="Feedback index")
+    parser.add_argument('command', choices=['compact', 'stats'])
+    parser.add_argument('--feature', default=None)
+    args = parser.parse_args()
+    index = get_feedback_index()
+    if args.command == 'compact':
+        print(f"Indexed {index.compact()} new records ({index.meta()['records']} total)")
+    else:
+        print(json.dumps(index.daily_stats(feature=args.feature), indent=2))
+
+if __name__ == '__main__':
+    main()
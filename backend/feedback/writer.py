@@ -0,0 +1,204 @@
+"""
+Buffered feedback sink.
+
+Requests only put records on an in-memory queue; a background thread per
+process appends them to that process's own segment file in batches, so
+request latency never includes disk I/O and concurrent workers never
+interleave writes. Segments are named
+
+    <dir>/feedback-<start>-<host>-<pid>-<seq>.jsonl       (active, flock-ed by its writer)
+    <dir>/feedback-<start>-<host>-<pid>-<seq>.jsonl.gz    (sealed)
+
+and are sealed (gzip-compressed) once they reach FEEDBACK_SEGMENT_BYTES or
+FEEDBACK_SEGMENT_SECONDS, and at exit. Segments left active by a process
+that died are sealed by the next writer that starts.
+
+FEEDBACK_FSYNC controls durability: 'batch' (fsync after every batch,
+default), 'never' (leave it to the OS) or a number of seconds between
+fsyncs.
+"""
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import socket
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locks, orphan recovery is skipped
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.getenv("FEEDBACK_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'datasets', 'feedback')
+
+SEGMENT_GLOB = 'feedback-*.jsonl'
+
+class FeedbackWriter:
+    def __init__(self, directory=DEFAULT_DIR, batch_size=256, flush_interval=0.5, max_pending=10000,
+                 fsync='batch', max_segment_bytes=64 * 1024 * 1024, max_segment_seconds=3600):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._fd = None
+        self._path = None
+        self._opened = 0.0
+        self._size = 0
+        self._sequence = 0
+        self._last_fsync = time.monotonic()
+        self._closed = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self.seal_orphans()
+        self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """Queue a JSON-serialisable record; False if the queue is full."""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=5.0):
+        """Flush what is queued, seal the active segment and stop the flusher."""
+        self._closed.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._write(batch)
+                if self._fd is not None and self._due_for_rotation():
+                    self._seal_active()
+            except Exception:
+                logger.exception("Failed to write %d feedback records", len(batch))
+            if self._closed.is_set() and self._queue.empty():
+                try:
+                    self._seal_active()
+                except Exception:
+                    logger.exception("Failed to seal feedback segment")
+                return
+
+    def _write(self, batch):
+        if self._fd is None:
+            self._open_segment()
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in batch).encode('utf-8')
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        self._size += len(data)
+        if self.fsync == 'batch' or (self.fsync != 'never' and time.monotonic() - self._last_fsync >= float(self.fsync)):
+            os.fsync(self._fd)
+            self._last_fsync = time.monotonic()
+
+    def _open_segment(self):
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime())
+        self._sequence += 1
+        name = f"feedback-{stamp}-{socket.gethostname()}-{os.getpid()}-{self._sequence}.jsonl"
+        self._path = os.path.join(self.directory, name)
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._opened = time.monotonic()
+        self._size = os.fstat(self._fd).st_size
+
+    def _due_for_rotation(self):
+        return self._size >= self.max_segment_bytes or time.monotonic() - self._opened >= self.max_segment_seconds
+
+    def _seal_active(self):
+        if self._fd is None:
+            return
+        if self.fsync != 'never':
+            os.fsync(self._fd)
+        path, fd = self._path, self._fd
+        self._fd = self._path = None
+        try:
+            if os.fstat(fd).st_size:
+                seal_segment(path)
+            else:
+                os.unlink(path)
+        finally:
+            os.close(fd)
+
+    def seal_orphans(self):
+        """Seal active segments whose writer is gone (their lock is free)."""
+        if fcntl is None:
+            return
+        for path in glob.glob(os.path.join(self.directory, SEGMENT_GLOB)):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            try:
+                # Another process may have sealed it first; a new segment may not be locked yet
+                if os.path.exists(path) and os.fstat(fd).st_size:
+                    logger.info("Sealing orphaned feedback segment %s", path)
+                    seal_segment(path)
+            except OSError:
+                logger.exception("Failed to seal orphaned feedback segment %s", path)
+            finally:
+                os.close(fd)
+
+def seal_segment(path):
+    """gzip `path` to `path`.gz (atomically) and remove the original."""
+    tmp_path = path + '.gz.tmp'
+    with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path + '.gz')
+    os.unlink(path)
+
+# One writer per process (recreated after fork: threads don't survive it)
+feedback_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+def get_feedback_writer():
+    """Get or create this process's FeedbackWriter, configured from FEEDBACK_* settings."""
+    global feedback_writer, _writer_pid
+    if feedback_writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if feedback_writer is None or _writer_pid != os.getpid():
+                fsync = os.getenv("FEEDBACK_FSYNC", "batch")
+                feedback_writer = FeedbackWriter(
+                    batch_size=int(os.getenv("FEEDBACK_BATCH_SIZE", "256")),
+                    flush_interval=float(os.getenv("FEEDBACK_FLUSH_INTERVAL", "0.5")),
+                    max_pending=int(os.getenv("FEEDBACK_MAX_PENDING", "10000")),
+                    fsync=fsync if fsync in ('batch', 'never') else float(fsync),
+                    max_segment_bytes=int(os.getenv("FEEDBACK_SEGMENT_BYTES", str(64 * 1024 * 1024))),
+                    max_segment_seconds=float(os.getenv("FEEDBACK_SEGMENT_SECONDS", "3600"))
+                )
+                _writer_pid = os.getpid()
+                atexit.register(feedback_writer.close)
+    return feedback_writer
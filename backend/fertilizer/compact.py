@@ -0,0 +1,98 @@
+"""
+Compact, quantized form of a fitted RandomForestClassifier.
+
+sklearn stores 64-bit node fields plus a float64 class distribution for
+every node. CompactForest flattens all trees into a few plain arrays:
+
+    feature    uint8     split feature per node
+    threshold  float32   split threshold, rounded down to the nearest float32
+                         at or below it, so `x <= threshold` gives the same
+                         result for the float32 inputs sklearn compares
+    left/right int32     child node ids (a leaf points to itself)
+    value      uint8     leaf class probabilities quantized to 1/255
+
+This is roughly 6-7x smaller, can be memory-mapped from .npy files, and
+predicts one row by stepping all trees together for max_depth iterations,
+with no per-tree Python loop.
+"""
+import json
+import os
+import numpy as np
+
+ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+class CompactForest:
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            ids = np.arange(n, dtype=np.int64)
+            leaf = tree.children_left < 0
+            left = np.where(leaf, ids, tree.children_left) + offset
+            right = np.where(leaf, ids, tree.children_right) + offset
+            threshold = tree.threshold.astype(np.float32)
+            too_high = threshold.astype(np.float64) > tree.threshold
+            threshold[too_high] = np.nextafter(threshold[too_high], np.float32(-np.inf))
+            # Normalise per node (older sklearn stores counts, newer ones fractions)
+            value = tree.value[:, 0, :]
+            value = value / np.maximum(value.sum(axis=1, keepdims=True), 1e-12)
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.float32(0), threshold))
+            lefts.append(left)
+            rights.append(right)
+            values.append(np.round(value * 255))
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+        if offset >= 2 ** 31 or model.n_features_in_ > 256:
+            raise ValueError("Forest too large for the compact format")
+        return cls(np.concatenate(features).astype(np.uint8), np.concatenate(thresholds).astype(np.float32),
+                   np.concatenate(lefts).astype(np.int32), np.concatenate(rights).astype(np.int32),
+                   np.concatenate(values).astype(np.uint8), np.array(roots, dtype=np.int32),
+                   model.classes_, max_depth)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        proba = self.value[node].sum(axis=1, dtype=np.float64)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, directory):
+        """One .npy per array plus compact.json (so load() can memory-map them)."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, 'compact.json'), 'w') as f:
+            json.dump({"classes": self.classes_.tolist(), "max_depth": self.max_depth}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        with open(os.path.join(directory, 'compact.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS}
+        return cls(classes=meta['classes'], max_depth=meta['max_depth'], **arrays)
@@ -0,0 +1,406 @@
+"""
+Online updates of the fertilizer classifier from rated recommendations.
+
+/api/recommend returns the model's suggestions and the `inputs` they were
+made for; the Recommendation page rates them through /api/feedback with
+
+    {"feature": "recommendation", "rating": 1-5, "fertilizer": "<applied>",
+     "inputs": {"crop_type": ..., "soil_ph": ..., "nitrogen": ..., ...}}
+
+Every update reads only feedback not seen before (see feedback/index.py)
+and turns well-rated records (rating >= 4) into training examples; records
+with an unknown fertilizer or crop, or inputs outside INPUT_RANGES, are
+dropped. A few new trees are fitted on those examples plus a stratified
+replay sample of the original training data (models/train_model.py), and
+added to the random forest (warm_start). This takes seconds instead of a
+full retrain. The original trees are always kept, and the newest online
+ones may make up at most --max-online-fraction (default 0.25) of them, so
+feedback can never outvote the trained forest.
+
+The feedback endpoint is unauthenticated, so an update is only trusted if
+it doesn't hurt the model: the candidate and its parent are scored on a
+held-out slice of the training data with the same number of rows of every
+fertilizer (disjoint from the replay sample), and the candidate's accuracy
+has to stay within --max-accuracy-drop (default 0.01) of the parent's, both
+balanced (every fertilizer counts the same, so rare ones can't be traded
+away) and for the natural distribution (the hold-out rows weighted by how
+common their fertilizer is in the training data). That catches broad
+damage but not a few targeted votes (they move the forest only near the
+posted inputs, where there is no held-out row), so at least
+--min-agreement (default 0.5) of the new examples also have to agree with
+the parent's prediction. The candidate is published to the model registry
+as a new version either way; one failing these checks waits for a manual
+`python -m fertilizer.registry activate <version>`. Running workers switch
+to an activated version on their next check, at most every
+FERTILIZER_MODEL_CHECK_INTERVAL seconds, without a restart. An flock on
+the registry directory keeps two updates from running at once (they would
+build on the same parent and read the same feedback). From backend/:
+
+    python -m fertilizer.online update            # once, e.g. from cron
+    python -m fertilizer.online update --every 600
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are not locked against each other
+    fcntl = None
+
+from feedback.index import LEGACY_LOG, read_new_lines, segment_sources
+from feedback.writer import DEFAULT_DIR as FEEDBACK_DIR
+from .registry import FEATURES, PROJECT_ROOT, SOIL_FEATURES, encoder, get_model_registry
+
+logger = logging.getLogger(__name__)
+
+# Columnar dataset written by models/train_model.py (a CSV with the same columns also works)
+DEFAULT_TRAINING_DATA = os.path.join(PROJECT_ROOT, 'datasets', 'training_data')
+
+# Feedback feature name for rated recommendations, and the lowest rating used as a label
+FEEDBACK_FEATURE = 'recommendation'
+MIN_POSITIVE_RATING = 4
+MAX_RATING = 5
+
+# Accepted inputs in rated feedback: the limits of the synthetic training data
+# (models/train_model.py), outside which the forest has never seen an example
+INPUT_RANGES = {
+    'soil_ph': (4.5, 8.5),
+    'nitrogen': (10, 300),
+    'phosphorus': (5, 150),
+    'potassium': (10, 250),
+    'organic_matter': (0.5, 5.0),
+    'moisture': (20, 70),
+    'temperature': (15, 40)
+}
+
+def feature_frame(rows, crop_encoder):
+    """FEATURES frame for dicts with crop_type and SOIL_FEATURES (rows with unknown crops are dropped)."""
+    frame = pd.DataFrame(rows, columns=['crop_type'] + SOIL_FEATURES)
+    frame['crop_type'] = frame['crop_type'].astype(str).str.strip().str.lower()
+    frame = frame[frame['crop_type'].isin(crop_encoder.classes_)].copy()
+    frame[SOIL_FEATURES] = frame[SOIL_FEATURES].apply(pd.to_numeric, errors='coerce')
+    frame = frame.dropna()
+    frame['crop_encoded'] = crop_encoder.transform(frame['crop_type'])
+    return frame[FEATURES]
+
+def feedback_examples(lines, crop_encoder, fertilizer_encoder):
+    """
+    Training examples from raw feedback lines (validated: known fertilizer
+    and crop, rating 1-5, every input within INPUT_RANGES).
+
+    Returns:
+        tuple: (FEATURES frame, encoded labels, sample weights), weight 1 for
+        rating 4 and 2 for rating 5
+    """
+    rows, labels, weights = [], [], []
+    for line in lines:
+        try:
+            payload = json.loads(line).get('payload') or {}
+            if str(payload.get('feature', '')).lower() != FEEDBACK_FEATURE:
+                continue
+            rating = int(payload.get('rating'))
+            fertilizer = payload.get('fertilizer')
+            inputs = payload.get('inputs') or {}
+        except (ValueError, TypeError, AttributeError):
+            continue
+        if not MIN_POSITIVE_RATING <= rating <= MAX_RATING or not isinstance(inputs, dict):
+            continue
+        if not isinstance(fertilizer, str) or fertilizer not in fertilizer_encoder.classes_:
+            continue
+        rows.append(inputs)
+        labels.append(fertilizer)
+        weights.append(float(rating - MIN_POSITIVE_RATING + 1))
+    if not rows:
+        return pd.DataFrame(columns=FEATURES), np.empty(0, dtype=np.int64), np.empty(0)
+    frame = feature_frame(rows, crop_encoder)
+    in_range = np.logical_and.reduce([frame[name].between(low, high) for name, (low, high) in INPUT_RANGES.items()])
+    frame = frame[in_range]
+    keep = frame.index.to_numpy()
+    return (frame.reset_index(drop=True), fertilizer_encoder.transform(np.asarray(labels, dtype=object)[keep]),
+            np.asarray(weights)[keep])
+
+def replay_sample(training_data, crop_encoder, fertilizer_encoder, per_class, rng):
+    """Up to `per_class` rows of every fertilizer from the original training data."""
+    if os.path.isdir(training_data):
+        # Columnar: pick row indices from the label column, then read only those rows
+        with open(os.path.join(training_data, 'meta.json')) as f:
+            meta = json.load(f)
+        columns = {name: np.load(os.path.join(training_data, f"{name}.npy"), mmap_mode='r') for name in meta['columns']}
+        names = meta['categories']['recommended_fertilizer']
+        labels = np.asarray(columns['recommended_fertilizer'])
+        rows = np.sort(np.concatenate([
+            rng.choice(found, min(per_class, len(found)), replace=False)
+            for found in (np.flatnonzero(labels == code) for code in range(len(names))) if len(found)
+        ]))
+        df = pd.DataFrame({name: values[rows] for name, values in columns.items()})
+        for name, categories in meta['categories'].items():
+            df[name] = np.asarray(categories, dtype=object)[df[name].to_numpy()]
+    else:
+        df = pd.read_csv(training_data)
+        picks = [group.iloc[rng.choice(len(group), min(per_class, len(group)), replace=False)]
+                 for _, group in df.groupby('recommended_fertilizer')]
+        df = pd.concat(picks, ignore_index=True)
+    df = df[df['recommended_fertilizer'].isin(fertilizer_encoder.classes_)].reset_index(drop=True)
+    frame = feature_frame(df.to_dict('records'), crop_encoder)
+    labels = fertilizer_encoder.transform(df.loc[frame.index, 'recommended_fertilizer'])
+    return frame.reset_index(drop=True), labels
+
+def label_shares(training_data, fertilizer_encoder):
+    """Share of every encoded fertilizer among the rows of the original training data."""
+    if os.path.isdir(training_data):
+        with open(os.path.join(training_data, 'meta.json')) as f:
+            names = json.load(f)['categories']['recommended_fertilizer']
+        codes = np.load(os.path.join(training_data, 'recommended_fertilizer.npy'), mmap_mode='r')
+        counts = pd.Series(np.bincount(codes, minlength=len(names)), index=names)
+    else:
+        counts = pd.read_csv(training_data, usecols=['recommended_fertilizer'])['recommended_fertilizer'].value_counts()
+    counts = counts.reindex(fertilizer_encoder.classes_, fill_value=0).to_numpy(dtype=float)
+    return counts / counts.sum()
+
+def split_holdout(labels, per_class, rng):
+    """Mask of up to `per_class` random rows of each label (at most half of them, the rest is for replay)."""
+    mask = np.zeros(len(labels), dtype=bool)
+    for label in np.unique(labels):
+        rows = np.flatnonzero(labels == label)
+        mask[rng.choice(rows, min(per_class, len(rows) // 2), replace=False)] = True
+    return mask
+
+def accuracy(model, X, y, weights=None):
+    return float(np.average(model.predict(X) == y, weights=weights)) if len(y) else float('nan')
+
+def natural_weights(labels, shares):
+    """Row weights that make a per-class hold-out count like the training data's class mix."""
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    return shares[labels] / counts[inverse]
+
+def update_model(registry=None, feedback_dir=FEEDBACK_DIR, training_data=DEFAULT_TRAINING_DATA,
+                 min_examples=20, trees=10, max_online_fraction=0.25, replay_per_class=50,
+                 holdout_per_class=200, max_accuracy_drop=0.01, min_agreement=0.5, seed=None):
+    """
+    Fold new rated recommendations into the current model version.
+
+    Feedback is consumed only once the model built from it is published;
+    with fewer than `min_examples` new examples nothing is consumed, so
+    they accumulate until the next run. A candidate that is published but
+    not activated (hold-out accuracy, balanced or natural, more than
+    `max_accuracy_drop` below its parent's, or less than `min_agreement`
+    of the examples predicted by the parent) still consumes its feedback,
+    and the next update builds on the active version again.
+
+    Returns:
+        dict: summary of the update (examples, trees, updated, activated,
+        version, holdout_accuracy, parent_holdout_accuracy,
+        holdout_balanced_accuracy, parent_holdout_balanced_accuracy,
+        agreement), or None if another update holds the registry lock
+    """
+    registry = registry or get_model_registry()
+    os.makedirs(registry.root, exist_ok=True)
+    lock_fd = os.open(os.path.join(registry.root, '.online.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+        return _update_locked(registry, feedback_dir, training_data, min_examples, trees, max_online_fraction,
+                              replay_per_class, holdout_per_class, max_accuracy_drop, min_agreement, seed)
+    finally:
+        os.close(lock_fd)
+
+def _update_locked(registry, feedback_dir, training_data, min_examples, trees, max_online_fraction,
+                   replay_per_class, holdout_per_class, max_accuracy_drop, min_agreement, seed):
+    state_path = os.path.join(registry.root, 'online_state.json')
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        state = {"offsets": {}, "done": [], "updates": 0, "examples": 0}
+    offsets, done = dict(state['offsets']), set(state['done'])
+    lines = read_new_lines(segment_sources(feedback_dir, [LEGACY_LOG]), offsets, done)
+
+    model, meta = registry.load_sklearn()
+    crop_encoder, fertilizer_encoder = encoder(meta['crop_classes']), encoder(meta['fertilizer_classes'])
+    X_new, y_new, w_new = feedback_examples(lines, crop_encoder, fertilizer_encoder)
+    summary = {"lines": len(lines), "examples": len(y_new), "updated": False, "trees": len(model.estimators_),
+               "version": meta['version']}
+    if len(y_new) < min_examples:
+        return summary
+
+    rng = np.random.default_rng(seed)
+    X_sample, y_sample = replay_sample(training_data, crop_encoder, fertilizer_encoder,
+                                       replay_per_class + holdout_per_class, rng)
+    held = split_holdout(y_sample, holdout_per_class, rng)
+    X_holdout, y_holdout = X_sample[held].reset_index(drop=True), y_sample[held]
+    X_replay, y_replay = X_sample[~held].reset_index(drop=True), y_sample[~held]
+    # The hold-out has up to holdout_per_class rows of every fertilizer: unweighted its
+    # accuracy is the balanced one; weighted by class share, the natural distribution's
+    holdout_weights = natural_weights(y_holdout, label_shares(training_data, fertilizer_encoder))
+    # warm_start refits classes_ from y: every class the forest knows has to be present
+    missing = set(model.classes_.tolist()) - set(y_replay.tolist()) - set(y_new.tolist())
+    if missing:
+        raise ValueError(f"Replay data lacks classes {sorted(missing)}; regenerate {training_data}")
+    # ... and no class it doesn't know (the old trees have no output for it)
+    X = pd.concat([X_new, X_replay], ignore_index=True)
+    y = np.concatenate([y_new, y_replay])
+    weights = np.concatenate([w_new, np.ones(len(y_replay))])
+    known = np.isin(y, model.classes_)
+    X, y, weights = X[known], y[known], weights[known]
+
+    # Trees of the last full training run (kept by every online descendant)
+    base_trees = meta.get('base_trees') or len(model.estimators_)
+    max_online_trees = max(1, int(base_trees * max_online_fraction))
+    parent_balanced = accuracy(model, X_holdout, y_holdout)
+    parent_accuracy = accuracy(model, X_holdout, y_holdout, holdout_weights)
+    agreement = accuracy(model, X_new, y_new)
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + min(trees, max_online_trees),
+                     random_state=int(rng.integers(2 ** 31)))
+    model.fit(X, y, sample_weight=weights)
+    online = len(model.estimators_) - base_trees
+    if online > max_online_trees:
+        del model.estimators_[base_trees:base_trees + online - max_online_trees]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    candidate_balanced = accuracy(model, X_holdout, y_holdout)
+    candidate_accuracy = accuracy(model, X_holdout, y_holdout, holdout_weights)
+    activate = (candidate_accuracy >= parent_accuracy - max_accuracy_drop
+                and candidate_balanced >= parent_balanced - max_accuracy_drop and agreement >= min_agreement)
+
+    version = registry.publish(model, meta['crop_classes'], meta['fertilizer_classes'],
+                               metrics={"feedback_examples": len(y_new), "holdout_rows": len(y_holdout),
+                                        "holdout_accuracy": candidate_accuracy,
+                                        "parent_holdout_accuracy": parent_accuracy,
+                                        "holdout_balanced_accuracy": candidate_balanced,
+                                        "parent_holdout_balanced_accuracy": parent_balanced,
+                                        "agreement": agreement},
+                               parent=meta['version'], activate=activate, base_trees=base_trees)
+    state.update(offsets=offsets, done=sorted(done), updates=state['updates'] + 1,
+                 examples=state['examples'] + len(y_new), updated_at=time.time())
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+    summary.update(updated=True, activated=activate, trees=len(model.estimators_), updates=state['updates'],
+                   version=version, holdout_accuracy=candidate_accuracy, parent_holdout_accuracy=parent_accuracy,
+                   holdout_balanced_accuracy=candidate_balanced, parent_holdout_balanced_accuracy=parent_balanced,
+                   agreement=agreement)
+    if activate:
+        logger.info("Fertilizer model %s published with %d feedback examples (%d trees, hold-out accuracy %.3f, "
+                    "balanced %.3f)", version, len(y_new), len(model.estimators_), candidate_accuracy,
+                    candidate_balanced)
+    else:
+        logger.warning("Fertilizer model %s not activated: hold-out accuracy %.3f vs %.3f for %s (balanced "
+                       "%.3f vs %.3f), %.0f%% of the feedback agrees with it (activate it with "
+                       "python -m fertilizer.registry activate %s)",
+                       version, candidate_accuracy, parent_accuracy, meta['version'], candidate_balanced,
+                       parent_balanced, agreement * 100, version)
+    return summary
+
+class FertilizerModel:
+    """A worker's view of the current registry version, switched when another one is activated."""
+
+    def __init__(self, registry=None, check_interval=30.0):
+        self.registry = registry or get_model_registry()
+        self.check_interval = check_interval
+        self._bundle = None
+        self._stamp = None
+        self._checked = float('-inf')
+        self._reload_lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Registry version in use, or None."""
+        return self._bundle.version if self._bundle is not None else None
+
+    def get(self):
+        """The current Bundle (forest memory-mapped), or None if no usable model is available."""
+        now = time.monotonic()
+        # One thread checks; the others keep using the current bundle meanwhile
+        if now - self._checked >= self.check_interval and self._reload_lock.acquire(blocking=False):
+            try:
+                self._checked = now
+                stamp = self.registry.current_stamp()
+                if stamp != self._stamp:
+                    try:
+                        bundle = self.registry.load()
+                        if bundle is not None:
+                            logger.info("Using fertilizer model %s", bundle.version)
+                        self._bundle = bundle
+                    except Exception as e:
+                        logger.warning("Fertilizer model not usable: %s", e)
+                        self._bundle = None
+                    self._stamp = stamp
+            finally:
+                self._reload_lock.release()
+        return self._bundle
+
+    def suggest(self, inputs, top=3):
+        """
+        Top fertilizers for one set of /api/recommend inputs.
+
+        Returns:
+            list: [{"fertilizer", "confidence"}] (confidence in percent), empty
+            without a usable model or for an unknown crop
+        """
+        bundle = self.get()
+        if bundle is None:
+            return []
+        frame = feature_frame([inputs], bundle.crop_encoder)
+        if frame.empty:
+            return []
+        forest = bundle.forest
+        probabilities = forest.predict_proba(frame.to_numpy(np.float32))[0]
+        best = np.argsort(probabilities)[::-1][:top]
+        return [{"fertilizer": str(bundle.fertilizer_encoder.classes_[forest.classes_[i]]),
+                 "confidence": round(float(probabilities[i]) * 100, 2)} for i in best]
+
+fertilizer_model = None
+
+def get_fertilizer_model():
+    """Get or create this process's FertilizerModel."""
+    global fertilizer_model
+    if fertilizer_model is None:
+        fertilizer_model = FertilizerModel(check_interval=float(os.getenv("FERTILIZER_MODEL_CHECK_INTERVAL", "30")))
+    return fertilizer_model
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold rated recommendations from feedback into the fertilizer model")
+    parser.add_argument('command', choices=['update'])
+    parser.add_argument('--feedback-dir', default=FEEDBACK_DIR)
+    parser.add_argument('--training-data', default=DEFAULT_TRAINING_DATA,
+                        help="Original training data for replay (columnar directory or CSV, see models/train_model.py)")
+    parser.add_argument('--min-examples', type=int, default=20)
+    parser.add_argument('--trees', type=int, default=10, help="Trees added per update")
+    parser.add_argument('--max-online-fraction', type=float, default=0.25,
+                        help="Online trees allowed, as a fraction of the trained forest's trees")
+    parser.add_argument('--replay-per-class', type=int, default=50)
+    parser.add_argument('--holdout-per-class', type=int, default=200, help="Training rows per fertilizer to score on")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help="Largest hold-out accuracy loss (balanced or natural) against the parent that is still activated")
+    parser.add_argument('--min-agreement', type=float, default=0.5,
+                        help="Share of new examples the parent has to predict for the update to be activated")
+    parser.add_argument('--every', type=float, default=None, help="Repeat every N seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    while True:
+        started = time.perf_counter()
+        summary = update_model(None, args.feedback_dir, args.training_data, args.min_examples, args.trees,
+                               max_online_fraction=args.max_online_fraction,
+                               replay_per_class=args.replay_per_class,
+                               holdout_per_class=args.holdout_per_class,
+                               max_accuracy_drop=args.max_accuracy_drop,
+                               min_agreement=args.min_agreement)
+        if summary is None:
+            print("Another update is running; skipped")
+        else:
+            print(f"{summary} in {time.perf_counter() - started:.2f}s")
+        if args.every is None:
+            break
+        time.sleep(args.every)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Versioned registry of fertilizer model bundles.
+
+    <root>/versions/<version>/
+        compact/        CompactForest arrays (.npy, memory-mapped by the workers)
+        model.pkl       sklearn forest (compressed; only read by online updates)
+        bundle.json     encoder classes, feature schema, metrics, lineage
+    <root>/current.json {"version": ...}, replaced atomically to switch versions
+
+A bundle is written under a temporary name and renamed into place, so it
+is never seen half-written. Activating a version replaces current.json
+(os.replace); workers check it every FERTILIZER_MODEL_CHECK_INTERVAL
+seconds and switch on the next request. The compact arrays are opened
+with mmap_mode='r', so every worker on a host shares one copy through
+the page cache instead of unpickling its own.
+
+The root is models/registry (or FERTILIZER_REGISTRY_DIR). From backend/:
+
+    python -m fertilizer.registry list
+    python -m fertilizer.registry activate <version>
+    python -m fertilizer.registry import-legacy      # models/fertilizer_model.pkl + encoders
+    python -m fertilizer.registry gc --keep 5
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import time
+from dataclasses import dataclass
+import joblib
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+from .compact import CompactForest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_MODEL_DIR = os.getenv("FERTILIZER_MODEL_DIR") or os.path.join(PROJECT_ROOT, 'models')
+
+# Feature schema of every bundle (as in models/train_model.py)
+SOIL_FEATURES = ['soil_ph', 'nitrogen', 'phosphorus', 'potassium', 'organic_matter', 'moisture', 'temperature']
+FEATURES = SOIL_FEATURES + ['crop_encoded']
+
+DEFAULT_ROOT = os.getenv("FERTILIZER_REGISTRY_DIR") or os.path.join(DEFAULT_MODEL_DIR, 'registry')
+
+def encoder(classes):
+    """LabelEncoder for known, sorted `classes` without refitting."""
+    fitted = LabelEncoder()
+    fitted.classes_ = np.asarray(classes, dtype=object)
+    return fitted
+
+def load_bundle(model_dir=DEFAULT_MODEL_DIR):
+    """
+    (model, crop encoder, fertilizer encoder) as written by models/train_model.py.
+
+    Raises:
+        ValueError: if the model was not trained on FEATURES (e.g. a
+            crop_id/season model of the retired backend/train_model.py)
+    """
+    model = joblib.load(os.path.join(model_dir, 'fertilizer_model.pkl'))
+    if getattr(model, 'n_features_in_', None) != len(FEATURES):
+        raise ValueError("fertilizer_model.pkl does not use the soil/crop feature schema; "
+                         "train it with models/train_model.py first, or publish a default model "
+                         "with python -m fertilizer.train --bootstrap")
+    crop_encoder = joblib.load(os.path.join(model_dir, 'crop_encoder.pkl'))
+    fertilizer_encoder = joblib.load(os.path.join(model_dir, 'fertilizer_encoder.pkl'))
+    return model, crop_encoder, fertilizer_encoder
+
+@dataclass
+class Bundle:
+    version: str
+    forest: CompactForest
+    crop_encoder: LabelEncoder
+    fertilizer_encoder: LabelEncoder
+    meta: dict
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self.versions_dir = os.path.join(root, 'versions')
+
+    def path(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def versions(self):
+        """Published versions, oldest first."""
+        try:
+            return sorted(name for name in os.listdir(self.versions_dir) if not name.startswith('.'))
+        except FileNotFoundError:
+            return []
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.root, 'current.json')) as f:
+                return json.load(f)['version']
+        except FileNotFoundError:
+            return None
+
+    def current_stamp(self):
+        """mtime (ns) of current.json, a cheap change check; None without one."""
+        try:
+            return os.stat(os.path.join(self.root, 'current.json')).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def publish(self, model, crop_classes, fertilizer_classes, metrics=None, parent=None, activate=True,
+                compress=3, **extra):
+        """
+        Store a fitted forest with its encoders and schema as a new version.
+
+        Returns:
+            str: the new version
+        """
+        os.makedirs(self.versions_dir, exist_ok=True)
+        version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{socket.gethostname()}-{os.getpid()}"
+        suffix = 0
+        while os.path.exists(self.path(version if not suffix else f"{version}.{suffix}")):
+            suffix += 1
+        version = version if not suffix else f"{version}.{suffix}"
+        tmp_dir = os.path.join(self.versions_dir, f".{version}.tmp")
+        os.makedirs(tmp_dir)
+        CompactForest.from_sklearn(model).save(os.path.join(tmp_dir, 'compact'))
+        joblib.dump(model, os.path.join(tmp_dir, 'model.pkl'), compress=compress)
+        with open(os.path.join(tmp_dir, 'bundle.json'), 'w') as f:
+            json.dump({
+                "version": version,
+                "created": time.time(),
+                "parent": parent,
+                "features": FEATURES,
+                "crop_classes": [str(c) for c in crop_classes],
+                "fertilizer_classes": [str(c) for c in fertilizer_classes],
+                "trees": len(model.estimators_),
+                "metrics": metrics or {},
+                **extra
+            }, f, indent=2)
+        os.rename(tmp_dir, self.path(version))
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Make `version` current (atomically; workers follow on their next check)."""
+        if not os.path.isdir(self.path(version)):
+            raise ValueError(f"Unknown model version {version!r}")
+        tmp_path = os.path.join(self.root, f"current.json.tmp-{os.getpid()}")
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": version, "activated": time.time()}, f)
+        os.replace(tmp_path, os.path.join(self.root, 'current.json'))
+
+    def meta(self, version):
+        with open(os.path.join(self.path(version), 'bundle.json')) as f:
+            return json.load(f)
+
+    def load(self, version=None, mmap_mode='r'):
+        """Bundle for `version` (default: current) with the forest memory-mapped; None if there is none."""
+        version = version or self.current_version()
+        if version is None:
+            return None
+        meta = self.meta(version)
+        if meta['features'] != FEATURES:
+            raise ValueError(f"Model version {version} uses features {meta['features']}, expected {FEATURES}")
+        forest = CompactForest.load(os.path.join(self.path(version), 'compact'), mmap_mode=mmap_mode)
+        return Bundle(version, forest, encoder(meta['crop_classes']), encoder(meta['fertilizer_classes']), meta)
+
+    def load_sklearn(self, version=None):
+        """(sklearn model, bundle meta) for `version` (default: current), e.g. to keep training it."""
+        version = version or self.current_version()
+        if version is None:
+            raise ValueError("No active fertilizer model; train one (python -m fertilizer.train) "
+                             "or import one (python -m fertilizer.registry import-legacy)")
+        return joblib.load(os.path.join(self.path(version), 'model.pkl')), self.meta(version)
+
+    def gc(self, keep=5):
+        """Delete all but the newest `keep` versions (never the current one)."""
+        current = self.current_version()
+        removed = [v for v in self.versions()[:-keep] if v != current] if keep > 0 else []
+        for version in removed:
+            # Workers still mapping these files keep them until they switch (unlinked inodes live on)
+            shutil.rmtree(self.path(version), ignore_errors=True)
+        return removed
+
+    def import_legacy(self, model_dir=DEFAULT_MODEL_DIR, activate=True):
+        """Publish fertilizer_model.pkl + crop/fertilizer encoders from models/train_model.py."""
+        model, crop_encoder, fertilizer_encoder = load_bundle(model_dir)
+        return self.publish(model, crop_encoder.classes_, fertilizer_encoder.classes_,
+                            metrics={"source": os.path.abspath(model_dir)}, activate=activate)
+
+model_registry = None
+
+def get_model_registry():
+    """Get or create the ModelRegistry for FERTILIZER_REGISTRY_DIR."""
+    global model_registry
+    if model_registry is None:
+        model_registry = ModelRegistry()
+    return model_registry
+
+def main():
+    parser = argparse.ArgumentParser(description="Fertilizer model registry")
+    parser.add_argument('--root', default=DEFAULT_ROOT)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list')
+    activate = sub.add_parser('activate')
+    activate.add_argument('version')
+    legacy = sub.add_parser('import-legacy')
+    legacy.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    legacy.add_argument('--no-activate', action='store_true')
+    gc = sub.add_parser('gc')
+    gc.add_argument('--keep', type=int, default=5)
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'list':
+        current = registry.current_version()
+        for version in registry.versions():
+            meta = registry.meta(version)
+            metrics = meta.get('metrics', {})
+            accuracy = metrics.get('accuracy', metrics.get('compact', {}).get('accuracy'))
+            print(f"{'*' if version == current else ' '} {version}  trees={meta['trees']}  "
+                  f"accuracy={accuracy}  parent={meta.get('parent')}")
+    elif args.command == 'activate':
+        registry.activate(args.version)
+        print(f"Activated {args.version}")
+    elif args.command == 'import-legacy':
+        print(f"Published {registry.import_legacy(args.model_dir, activate=not args.no_activate)}")
+    else:
+        print(f"Removed {registry.gc(args.keep)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Train the fertilizer classifier with a cross-validated hyperparameter search.
+
+Candidates from a random search over forest size, depth and leaf size are
+scored with k-fold cross-validation, one candidate/fold per core. The
+search keeps the smallest forest (by node count) whose CV accuracy is
+within --tolerance of the best, rather than the most accurate one. It is
+refitted on all cores and published to the model registry (registry.py)
+as a bundle: the sklearn model (joblib, --compress level), the quantized
+CompactForest the API serves (compact.py), encoders and schema. The bundle
+carries a report of held-out accuracy, artifact size, load time and
+single-row latency for both forms. From backend/:
+
+    python -m fertilizer.train --data ../datasets/training_data --samples 200000
+
+A fresh checkout has no model version. Setup runs
+
+    python -m fertilizer.train --bootstrap
+
+which, unless a version is already active, generates the synthetic
+training data (models/train_model.py) if it is missing and publishes a
+default model from a short search (a few seconds).
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import RandomizedSearchCV, train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from .compact import CompactForest
+from .online import DEFAULT_TRAINING_DATA
+from .registry import DEFAULT_ROOT, FEATURES, PROJECT_ROOT, SOIL_FEATURES, ModelRegistry
+
+SEARCH_SPACE = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [8, 12, 15, 20, None],
+    'min_samples_leaf': [1, 2, 5, 10, 20],
+    'max_features': ['sqrt', 0.5, None],
+}
+
+def load_training_data(path, samples=None, seed=42):
+    """Training rows from a columnar directory (models/train_model.py) or a CSV, optionally subsampled."""
+    if os.path.isdir(path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in meta['columns']}
+        rows = meta['rows']
+        picked = (np.sort(np.random.default_rng(seed).choice(rows, samples, replace=False))
+                  if samples and samples < rows else slice(None))
+        df = pd.DataFrame({name: np.asarray(values[picked]) for name, values in columns.items()})
+        for name, categories in meta['categories'].items():
+            df[name] = np.asarray(categories, dtype=object)[df[name].to_numpy()]
+        return df
+    df = pd.read_csv(path)
+    if samples and samples < len(df):
+        df = df.sample(samples, random_state=seed)
+    return df.reset_index(drop=True)
+
+def node_count(estimator, X=None, y=None):
+    """Scorer-compatible total number of tree nodes."""
+    return sum(tree.tree_.node_count for tree in estimator.estimators_)
+
+def file_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+def single_row_latency(predict, row, repeats=200):
+    """Median seconds of predict(row) over `repeats` calls."""
+    predict(row)
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict(row)
+        times.append(time.perf_counter() - started)
+    return float(np.median(times))
+
+def timed_load(load):
+    started = time.perf_counter()
+    loaded = load()
+    return loaded, time.perf_counter() - started
+
+def train(data=DEFAULT_TRAINING_DATA, registry_root=DEFAULT_ROOT, samples=None, n_iter=20, cv=3, jobs=-1,
+          tolerance=0.005, compress=3, seed=42, activate=True):
+    df = load_training_data(data, samples, seed)
+    crop_encoder = LabelEncoder().fit(df['crop_type'])
+    fertilizer_encoder = LabelEncoder().fit(df['recommended_fertilizer'])
+    X = pd.DataFrame(df[SOIL_FEATURES].to_numpy(np.float32), columns=SOIL_FEATURES)
+    X['crop_encoded'] = crop_encoder.transform(df['crop_type'])
+    X = X[FEATURES]
+    y = fertilizer_encoder.transform(df['recommended_fertilizer'])
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=seed)
+    print(f"{len(X_train)} training rows, {len(X_test)} held out, {len(fertilizer_encoder.classes_)} classes")
+
+    # Parallel over candidates x folds; each forest fits single-threaded
+    search = RandomizedSearchCV(
+        RandomForestClassifier(random_state=seed, n_jobs=1), SEARCH_SPACE, n_iter=n_iter, cv=cv,
+        scoring={'accuracy': 'accuracy', 'nodes': node_count}, refit=False, n_jobs=jobs, random_state=seed
+    )
+    started = time.perf_counter()
+    search.fit(X_train, y_train)
+    results = pd.DataFrame(search.cv_results_)
+    best = results['mean_test_accuracy'].max()
+    chosen = results[results['mean_test_accuracy'] >= best - tolerance].sort_values('mean_test_nodes').iloc[0]
+    params = chosen['params']
+    print(f"Search: {len(results)} candidates x {cv} folds in {time.perf_counter() - started:.1f}s; "
+          f"best CV accuracy {best:.4f}, chosen {params} "
+          f"({chosen['mean_test_accuracy']:.4f}, {chosen['mean_test_nodes']:.0f} nodes)")
+
+    started = time.perf_counter()
+    model = RandomForestClassifier(random_state=seed, n_jobs=jobs, **params).fit(X_train, y_train)
+    print(f"Refit in {time.perf_counter() - started:.1f}s")
+    compact = CompactForest.from_sklearn(model)
+
+    # Single-threaded inference in the web workers (and in the latency figures)
+    model.set_params(n_jobs=None)
+    scratch = tempfile.mkdtemp()
+    model_path = os.path.join(scratch, 'model.pkl')
+    compact_dir = os.path.join(scratch, 'compact')
+    joblib.dump(model, model_path, compress=compress)
+    compact.save(compact_dir)
+
+    # Report on the held-out rows, using the saved artifacts
+    loaded_model, model_load = timed_load(lambda: joblib.load(model_path))
+    loaded_compact, compact_load = timed_load(lambda: CompactForest.load(compact_dir))
+    X_test_array = X_test.to_numpy(np.float32)
+    sklearn_pred = loaded_model.predict(X_test)
+    compact_pred = loaded_compact.predict(X_test_array)
+    row_frame, row_array = X_test.iloc[:1], X_test_array[:1]
+    report = {
+        "params": params,
+        "cv_accuracy": round(float(chosen['mean_test_accuracy']), 4),
+        "sklearn": {
+            "accuracy": round(float(np.mean(sklearn_pred == y_test)), 4),
+            "bytes": file_size(model_path),
+            "memory_bytes": int(sum(t.tree_.__getstate__()['nodes'].nbytes + t.tree_.value.nbytes
+                                    for t in loaded_model.estimators_)),
+            "load_seconds": round(model_load, 4),
+            "row_latency_ms": round(single_row_latency(loaded_model.predict_proba, row_frame) * 1000, 3)
+        },
+        "compact": {
+            "accuracy": round(float(np.mean(compact_pred == y_test)), 4),
+            "agreement": round(float(np.mean(compact_pred == sklearn_pred)), 4),
+            "bytes": file_size(compact_dir),
+            "memory_bytes": int(loaded_compact.nbytes),
+            "load_seconds": round(compact_load, 4),
+            "row_latency_ms": round(single_row_latency(loaded_compact.predict_proba, row_array) * 1000, 3)
+        }
+    }
+    shutil.rmtree(scratch, ignore_errors=True)
+    version = ModelRegistry(registry_root).publish(model, crop_encoder.classes_, fertilizer_encoder.classes_,
+                                                   metrics=report, activate=activate, compress=compress)
+    return version, report
+
+def write_synthetic_data(directory, samples=5000, seed=42):
+    """Generate the synthetic training data of models/train_model.py (not a package) into `directory`."""
+    spec = importlib.util.spec_from_file_location(
+        'train_model', os.path.join(PROJECT_ROOT, 'models', 'train_model.py'))
+    generator = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(generator)
+    generator.write_training_data(directory, samples, seed=seed)
+
+def bootstrap(data=DEFAULT_TRAINING_DATA, registry_root=DEFAULT_ROOT, samples=5000, seed=42, force=False):
+    """
+    Publish and activate a default model unless the registry already has
+    an active version (or `force`), generating `data` first if missing.
+
+    Returns:
+        str: the new version, or None if one was already active
+    """
+    if not force and ModelRegistry(registry_root).current_version() is not None:
+        return None
+    if not os.path.exists(data):
+        print(f"Generating {samples} training rows in {data}")
+        write_synthetic_data(data, samples, seed)
+    version, _ = train(data, registry_root, n_iter=4, seed=seed)
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the fertilizer classifier (parallel CV search)")
+    parser.add_argument('--data', default=DEFAULT_TRAINING_DATA, help="Columnar directory or CSV")
+    parser.add_argument('--registry', default=DEFAULT_ROOT, help="Model registry root")
+    parser.add_argument('--no-activate', action='store_true', help="Publish without switching the API to it")
+    parser.add_argument('--samples', type=int, default=None, help="Subsample this many rows")
+    parser.add_argument('--n-iter', type=int, default=20, help="Search candidates")
+    parser.add_argument('--cv', type=int, default=3)
+    parser.add_argument('--jobs', type=int, default=-1, help="Parallel jobs (-1: all cores)")
+    parser.add_argument('--tolerance', type=float, default=0.005,
+                        help="Accept the smallest model within this CV accuracy of the best")
+    parser.add_argument('--compress', type=int, default=3, help="joblib compression level for the .pkl (0-9)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--bootstrap', action='store_true',
+                        help="Only if no version is active: generate --data if missing and publish a default model")
+    args = parser.parse_args()
+    if args.bootstrap:
+        version = bootstrap(args.data, args.registry, args.samples or 5000, args.seed)
+        print(f"Published {version} (active)" if version else "A model version is already active")
+        return
+    version, report = train(args.data, args.registry, args.samples, args.n_iter, args.cv, args.jobs, args.tolerance,
+                            args.compress, args.seed, activate=not args.no_activate)
+    print(json.dumps(report, indent=2))
+    print(f"Published {version}" + ("" if args.no_activate else " (active)"))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Mock market prices and price history (until live Agmarknet data is wired in).
+
+Everything here is a pure function of its arguments, so every worker
+process returns the same numbers and results can be memoized.
+"""
+import zlib
+from datetime import date, timedelta
+from functools import lru_cache
+import numpy as np
+
+from .rolling import ALL_MARKETS, SPAN, RollingStats
+
+UNIT = "INR/qtl"
+
+# Base prices per crop (INR/qtl)
+CROP_BASE = {
+    'wheat': {"min": 1900, "avg": 2050, "max": 2400},
+    'rice': {"min": 2000, "avg": 2300, "max": 2700},
+    'soybean': {"min": 3700, "avg": 4200, "max": 4700},
+    'tomato': {"min": 700, "avg": 1100, "max": 1800},
+    'corn': {"min": 1600, "avg": 1850, "max": 2200}
+}
+DEFAULT_BASE = {"min": 1000, "avg": 1500, "max": 2000}
+
+# Explicit overrides for some (crop, state) combos
+STATE_OVERRIDES = {
+    ('wheat', 'Punjab'): {"min": 2000, "avg": 2150, "max": 2450},
+    ('wheat', 'Madhya Pradesh'): {"min": 1950, "avg": 2100, "max": 2400},
+    ('rice', 'West Bengal'): {"min": 2100, "avg": 2350, "max": 2750},
+    ('rice', 'Tamil Nadu'): {"min": 2050, "avg": 2320, "max": 2720},
+    ('soybean', 'Maharashtra'): {"min": 3850, "avg": 4300, "max": 4800},
+    ('soybean', 'Madhya Pradesh'): {"min": 3800, "avg": 4250, "max": 4750},
+    ('tomato', 'Karnataka'): {"min": 900, "avg": 1300, "max": 1900},
+    ('corn', 'Bihar'): {"min": 1650, "avg": 1900, "max": 2250},
+}
+
+def state_factor(state):
+    """Deterministic +/-5% state variation (0.95..1.05)."""
+    h = sum(ord(c) for c in state) % 21  # 0..20
+    return 0.95 + (h / 20.0) * 0.10
+
+def district_factor(district):
+    """Deterministic +/-2% district variation (0.98..1.02); 1.0 without a district."""
+    if not district:
+        return 1.0
+    h = sum(ord(c) for c in district) % 11  # 0..10
+    return 0.98 + (h / 10.0) * 0.04
+
+def current_prices(crop, state):
+    """Current min/avg/max price band for a crop in a state."""
+    if (crop, state) in STATE_OVERRIDES:
+        return dict(STATE_OVERRIDES[(crop, state)])
+    base = CROP_BASE.get(crop, DEFAULT_BASE)
+    factor = state_factor(state)
+    return {key: int(base[key] * factor) for key in ("min", "avg", "max")}
+
+def daily_wobble(ordinals, crop):
+    """
+    Deterministic daily wobble in -5..+5 for each date ordinal and crop.
+
+    A seeded splitmix64 mix of (ordinal, crc32(crop)), vectorized over
+    `ordinals`; unlike the builtin hash() it is the same in every process.
+    """
+    x = np.asarray(ordinals, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    x ^= np.uint64(zlib.crc32(crop.encode('utf-8')))
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return (x % np.uint64(11)).astype(np.int64) - 5
+
+def history_arrays(crop, state, district, days, end_date):
+    """
+    Mock daily price history for the `days` days before `end_date`.
+
+    Returns:
+        tuple: (date ordinals, min, avg, max) as int64 arrays, oldest first
+    """
+    base = CROP_BASE.get(crop, DEFAULT_BASE)
+    sf, df = state_factor(state), district_factor(district)
+    ordinals = np.arange(end_date.toordinal() - days, end_date.toordinal(), dtype=np.int64)
+    wobble_pct = 1.0 + (daily_wobble(ordinals, crop) / 100.0) * 0.6  # +/-3%
+    mn = (base['min'] * sf * df * wobble_pct).astype(np.int64)
+    av = (base['avg'] * sf * df * wobble_pct).astype(np.int64)
+    mx = (base['max'] * sf * df * wobble_pct).astype(np.int64)
+    # Ensure ordering min <= avg <= max
+    av = np.clip(av, mn, mx)
+    return ordinals, mn, av, mx
+
+@lru_cache(maxsize=4096)
+def price_history(crop, state, district, days, end_date):
+    """
+    Memoized history_arrays as a list of {"date", "min", "avg", "max"} points.
+
+    The returned list is shared between callers and must not be modified.
+    """
+    ordinals, mn, av, mx = history_arrays(crop, state, district, days, end_date)
+    start = date.fromordinal(int(ordinals[0])) if len(ordinals) else end_date
+    return [
+        {"date": (start + timedelta(days=i)).isoformat(), "min": lo, "avg": mid, "max": hi}
+        for i, (lo, mid, hi) in enumerate(zip(mn.tolist(), av.tolist(), mx.tolist()))
+    ]
+
+def history_matrix(crops, states, districts, days, end_date):
+    """
+    Mock history for every (crop, state, district) combination in one pass.
+
+    Same numbers as history_arrays for each combination.
+
+    Returns:
+        tuple: (date ordinals of shape (days,), and min, avg, max int64 arrays
+        of shape (len(crops), len(states), len(districts), days))
+    """
+    ordinals = np.arange(end_date.toordinal() - days, end_date.toordinal(), dtype=np.int64)
+    wobble = np.stack([daily_wobble(ordinals, crop) for crop in crops]) if crops else np.empty((0, days), np.int64)
+    wobble_pct = (1.0 + (wobble / 100.0) * 0.6)[:, None, None, :]
+    sf = np.array([state_factor(s) for s in states], dtype=np.float64)[None, :, None, None]
+    df = np.array([district_factor(d) for d in districts], dtype=np.float64)[None, None, :, None]
+    bands = []
+    for key in ("min", "avg", "max"):
+        base = np.array([CROP_BASE.get(c, DEFAULT_BASE)[key] for c in crops], dtype=np.float64)[:, None, None, None]
+        bands.append((base * sf * df * wobble_pct).astype(np.int64))
+    mn, av, mx = bands
+    return ordinals, mn, np.clip(av, mn, mx), mx
+
+@lru_cache(maxsize=1024)
+def mock_rolling_stats(crop, state, end_date):
+    """
+    Rolling statistics (see rolling.py) over the mock history before `end_date`.
+
+    The returned dict is shared between callers and must not be modified.
+    """
+    ordinals, mn, av, mx = history_arrays(crop, state, '', SPAN, end_date)
+    stats = RollingStats.rebuild(ordinals, [state] * len(ordinals), mn, mx, av)
+    return {str(window): values for window, values in stats.snapshot()[ALL_MARKETS].items()}
@@ -0,0 +1,161 @@
+"""
+Rolling price statistics, maintained incrementally as daily prices arrive.
+
+For every market in a partition (plus '*' for all markets combined) the last
+SPAN days of min/max/modal prices sit in a ring buffer, next to running
+sums of the modal price for each window. Appending a day subtracts the day
+that leaves each window and adds the new one, so an ingest costs
+O(markets x new days) however long the history is. The resulting
+statistics are snapshotted at ingest time, so reads are dictionary lookups.
+
+Per window: moving average of the modal price, volatility (coefficient of
+variation of the modal price, in percent), min/max band and the number of
+days with data.
+"""
+import numpy as np
+
+WINDOWS = (7, 30, 90)
+SPAN = max(WINDOWS)
+
+# Key for the all-markets aggregate
+ALL_MARKETS = '*'
+
+class RollingStats:
+    def __init__(self, keys=(), last=None):
+        self.keys = []
+        self.index = {}
+        self.last = last
+        self.ring = {name: np.full((0, SPAN), np.nan) for name in ('min', 'max', 'modal')}
+        self.sums = np.zeros((0, len(WINDOWS), 3))  # sum, sum of squares, count
+        self._add_keys([ALL_MARKETS, *keys])
+
+    def _add_keys(self, keys):
+        new = [key for key in dict.fromkeys(keys) if key not in self.index]
+        if not new:
+            return
+        for key in new:
+            self.index[key] = len(self.keys)
+            self.keys.append(key)
+        for name, ring in self.ring.items():
+            self.ring[name] = np.vstack([ring, np.full((len(new), SPAN), np.nan)])
+        self.sums = np.concatenate([self.sums, np.zeros((len(new), len(WINDOWS), 3))])
+
+    @classmethod
+    def rebuild(cls, ordinals, keys, mins, maxs, modals):
+        """Statistics from scratch, reading only the last SPAN days of the given rows."""
+        ordinals = np.asarray(ordinals)
+        if not len(ordinals):
+            return cls()
+        stats = cls(last=int(ordinals.max()) - SPAN)
+        recent = ordinals > stats.last
+        stats.update(ordinals[recent], np.asarray(keys, dtype=object)[recent],
+                     np.asarray(mins)[recent], np.asarray(maxs)[recent], np.asarray(modals)[recent])
+        return stats
+
+    def update(self, ordinals, keys, mins, maxs, modals):
+        """
+        Append the rows for days after `last` (rows for the same day and key are combined).
+
+        Raises:
+            ValueError: if a row is not newer than the last applied day
+        """
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        if not len(ordinals):
+            return
+        if self.last is not None and ordinals.min() <= self.last:
+            raise ValueError("RollingStats.update only appends days; rebuild() to backfill")
+        keys = np.asarray(keys, dtype=object)
+        self._add_keys(keys.tolist())
+        codes = np.array([self.index[key] for key in keys.tolist()], dtype=np.int64)
+        mins, maxs, modals = (np.asarray(a, dtype=np.float64) for a in (mins, maxs, modals))
+
+        order = np.lexsort((codes, ordinals))
+        ordinals, codes, mins, maxs, modals = ordinals[order], codes[order], mins[order], maxs[order], modals[order]
+        last_day = int(ordinals[-1])
+        first_day = int(ordinals[0]) if self.last is None else self.last + 1
+        if last_day - first_day >= SPAN:
+            # Everything older than the ring is dropped anyway
+            self.ring = {name: np.full_like(ring, np.nan) for name, ring in self.ring.items()}
+            self.sums[:] = 0
+            first_day = last_day - SPAN + 1
+        bounds = np.searchsorted(ordinals, np.arange(first_day, last_day + 2))
+        for offset, day in enumerate(range(first_day, last_day + 1)):
+            rows = slice(bounds[offset], bounds[offset + 1])
+            self._advance(day, codes[rows], mins[rows], maxs[rows], modals[rows])
+        self.last = last_day
+
+    def _advance(self, day, codes, mins, maxs, modals):
+        # Drop the day leaving each window (for the longest window, the slot being reused)
+        for w, window in enumerate(WINDOWS):
+            leaving = self.ring['modal'][:, (day - window) % SPAN]
+            valid = ~np.isnan(leaving)
+            self.sums[valid, w, 0] -= leaving[valid]
+            self.sums[valid, w, 1] -= leaving[valid] ** 2
+            self.sums[valid, w, 2] -= 1
+
+        slot = day % SPAN
+        for ring in self.ring.values():
+            ring[:, slot] = np.nan
+        if not len(codes):
+            return
+        # One value per key (rows are sorted by key within the day), plus the all-markets row
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        counts = np.diff(np.r_[starts, len(codes)])
+        unique = codes[starts]
+        day_min = np.r_[mins.min(), np.minimum.reduceat(mins, starts)]
+        day_max = np.r_[maxs.max(), np.maximum.reduceat(maxs, starts)]
+        day_modal = np.r_[modals.mean(), np.add.reduceat(modals, starts) / counts]
+        targets = np.r_[self.index[ALL_MARKETS], unique]
+        self.ring['min'][targets, slot] = day_min
+        self.ring['max'][targets, slot] = day_max
+        self.ring['modal'][targets, slot] = day_modal
+        self.sums[targets, :, 0] += day_modal[:, None]
+        self.sums[targets, :, 1] += (day_modal ** 2)[:, None]
+        self.sums[targets, :, 2] += 1
+
+    def snapshot(self):
+        """
+        Statistics as of `last` for every key.
+
+        Returns:
+            dict: {key: {window: {"ma", "volatility", "min", "max", "days"}}};
+            values are None for windows without data
+        """
+        result = {key: {} for key in self.keys}
+        if self.last is None:
+            return result
+        for w, window in enumerate(WINDOWS):
+            slots = (self.last - np.arange(window)) % SPAN
+            lows = np.fmin.reduce(self.ring['min'][:, slots], axis=1)
+            highs = np.fmax.reduce(self.ring['max'][:, slots], axis=1)
+            total, squares, count = self.sums[:, w, 0], self.sums[:, w, 1], self.sums[:, w, 2]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = total / count
+                std = np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+                volatility = std / mean * 100
+            for i, key in enumerate(self.keys):
+                days = int(round(count[i]))
+                result[key][window] = {
+                    "ma": round(float(mean[i]), 2) if days else None,
+                    "volatility": round(float(volatility[i]), 2) if days > 1 else None,
+                    "min": float(lows[i]) if days else None,
+                    "max": float(highs[i]) if days else None,
+                    "days": days
+                }
+        return result
+
+    def save(self, path):
+        np.savez(path, keys=np.array(self.keys, dtype=str), last=np.array(-1 if self.last is None else self.last),
+                 ring_min=self.ring['min'], ring_max=self.ring['max'], ring_modal=self.ring['modal'], sums=self.sums)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            stats = cls()
+            stats.keys = data['keys'].tolist()
+            stats.index = {key: i for i, key in enumerate(stats.keys)}
+            last = int(data['last'])
+            stats.last = None if last < 0 else last
+            stats.ring = {'min': data['ring_min'], 'max': data['ring_max'], 'modal': data['ring_modal']}
+            stats.sums = data['sums']
+        return stats
@@ -0,0 +1,417 @@
+"""
+Embedded time-series store for daily mandi prices.
+
+Agmarknet-style CSV dumps (State, District, Market, Commodity, Arrival_Date,
+Min/Max/Modal price) are ingested into one partition per (crop, state):
+
+    <root>/<crop>/<state_slug>/meta.json
+    <root>/<crop>/<state_slug>/v<N>/{date,district,market,min,max,modal}.npy
+
+Each column is a typed NumPy array (int32 date ordinals, uint16 district and
+market codes, float32 prices), sorted by date, so a range query is two
+binary searches over a memory-mapped column. Rolling statistics
+(rolling.py) are carried forward with each version. meta.json holds the district
+and market dictionaries and names the current version; it is replaced
+atomically after a new version is written, so readers never see a partial
+partition. One ingester at a time is assumed. From backend/:
+
+    python -m market.store ingest dumps/*.csv
+    python -m market.store info
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+from datetime import date
+import numpy as np
+
+from .rolling import ALL_MARKETS, RollingStats
+
+DEFAULT_ROOT = os.getenv("MARKET_STORE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'datasets', 'market_store')
+
+COLUMNS = ('date', 'district', 'market', 'min', 'max', 'modal')
+DTYPES = {'date': np.int32, 'district': np.uint16, 'market': np.uint16,
+          'min': np.float32, 'max': np.float32, 'modal': np.float32}
+
+# Agmarknet commodity names -> crop names used by the API
+COMMODITY_ALIASES = {
+    'paddy(dhan)(common)': 'rice',
+    'paddy(dhan)(basmati)': 'rice',
+    'maize': 'corn',
+    'soyabean': 'soybean'
+}
+
+# Ordinal of 1970-01-01, to move between date ordinals and datetime64[D]
+EPOCH_ORDINAL = 719163
+
+def slug(name):
+    """Filesystem-safe, case-insensitive partition name."""
+    return re.sub(r'[^a-z0-9]+', '_', name.strip().lower()).strip('_')
+
+def normalize_crop(commodity):
+    commodity = commodity.strip().lower()
+    return COMMODITY_ALIASES.get(commodity, commodity)
+
+def _normalize_columns(frame):
+    """Map Agmarknet header variants ('Min_x0020_Price', 'Min Price', ...) to snake_case."""
+    frame.columns = [re.sub(r'[^a-z]+', '_', c.replace('_x0020_', ' ').strip().lower()).strip('_')
+                     for c in frame.columns]
+    return frame.rename(columns={'commodity': 'crop', 'arrival_date': 'date', 'price_date': 'date',
+                                 'min_price': 'min', 'max_price': 'max', 'modal_price': 'modal'})
+
+def to_ordinals(values):
+    """datetime64 array -> int32 date ordinals."""
+    return (values.astype('datetime64[D]').astype(np.int64) + EPOCH_ORDINAL).astype(np.int32)
+
+def from_ordinals(ordinals):
+    """Date ordinals -> datetime64[D] array."""
+    return (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype('datetime64[D]')
+
+class Partition:
+    """One (crop, state) partition: memory-mapped columns plus its dictionaries."""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.version = meta['version']
+        self.districts = meta['districts']
+        self.markets = meta['markets']
+        data_dir = os.path.join(path, f"v{self.version}")
+        self.columns = {name: np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode='r') for name in COLUMNS}
+        self._rolling = None
+
+    def __len__(self):
+        return len(self.columns['date'])
+
+    def rolling(self):
+        """Rolling statistics snapshot written at ingest (see rolling.py), loaded once per version."""
+        if self._rolling is None:
+            try:
+                with open(os.path.join(self.path, f"v{self.version}", 'rolling.json')) as f:
+                    self._rolling = json.load(f)
+            except OSError:
+                return None
+        return self._rolling
+
+    def date_range(self):
+        dates = self.columns['date']
+        return (int(dates[0]), int(dates[-1])) if len(dates) else (None, None)
+
+    def rows(self, start=None, end=None):
+        """Row slice for start <= date < end (ordinals; None for open-ended)."""
+        dates = self.columns['date']
+        lo = 0 if start is None else int(np.searchsorted(dates, start, 'left'))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, end, 'left'))
+        return slice(lo, hi)
+
+class MarketStore:
+    """Reader and bulk ingester for a store directory."""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _partition_path(self, crop, state):
+        return os.path.join(self.root, slug(crop), slug(state))
+
+    def partition(self, crop, state):
+        """The current Partition for (crop, state), or None if nothing was ingested for it."""
+        path = self._partition_path(crop, state)
+        for attempt in (0, 1):
+            try:
+                with open(os.path.join(path, 'meta.json')) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                cached = self._partitions.get(path)
+                if cached is not None and cached.version == meta['version']:
+                    return cached
+                try:
+                    cached = self._partitions[path] = Partition(path, meta)
+                    return cached
+                except FileNotFoundError:
+                    # Replaced by an ingest between reading meta.json and the columns
+                    if attempt:
+                        raise
+
+    def partitions(self):
+        """(crop, state display name, rows, first ordinal, last ordinal) for every partition."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for crop in sorted(os.listdir(self.root)):
+            crop_dir = os.path.join(self.root, crop)
+            if not os.path.isdir(crop_dir):
+                continue
+            for state in sorted(os.listdir(crop_dir)):
+                try:
+                    with open(os.path.join(crop_dir, state, 'meta.json')) as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                found.append((crop, meta['state'], meta['rows'], meta['first'], meta['last']))
+        return found
+
+    def query(self, crop, state, start=None, end=None, district=None, market=None, freq='D'):
+        """
+        Aggregated prices for start <= date < end (date ordinals).
+
+        Rows are combined across the matching markets per period: lowest
+        min, highest max and mean modal price. `freq` is 'D' (daily),
+        'W' (weeks starting Monday) or 'M' (calendar months).
+
+        Returns:
+            dict: 'date' (period start ordinals), 'min', 'max', 'modal' and
+            'count' arrays, or None if the partition doesn't exist
+        """
+        part = self.partition(crop, state)
+        if part is None:
+            return None
+        rows = part.rows(start, end)
+        dates = part.columns['date'][rows]
+        mn = part.columns['min'][rows]
+        mx = part.columns['max'][rows]
+        modal = part.columns['modal'][rows]
+
+        mask = None
+        for name, value, names in (('district', district, part.districts), ('market', market, part.markets)):
+            if value:
+                lookup = {n.lower(): i for i, n in enumerate(names)}
+                code = lookup.get(value.strip().lower())
+                if code is None:
+                    return _empty_result()
+                column = part.columns[name][rows] == code
+                mask = column if mask is None else mask & column
+        if mask is not None:
+            dates, mn, mx, modal = dates[mask], mn[mask], mx[mask], modal[mask]
+        if not len(dates):
+            return _empty_result()
+
+        keys = period_starts(dates, freq)
+        # keys are non-decreasing (dates are sorted), so each period is one contiguous run
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, len(keys)])
+        return {
+            'date': keys[starts],
+            'min': np.minimum.reduceat(mn, starts),
+            'max': np.maximum.reduceat(mx, starts),
+            'modal': np.add.reduceat(modal.astype(np.float64), starts) / counts,
+            'count': counts
+        }
+
+    def history(self, crop, state, days, district=None, freq='D', today=None):
+        """
+        query() over the last `days` days of data, ending today or at the newest
+        ingested day if the data is older. None if the partition doesn't exist.
+        """
+        part = self.partition(crop, state)
+        if part is None or not len(part):
+            return None
+        today = today if today is not None else date.today().toordinal()
+        end = min(today, part.date_range()[1]) + 1
+        result = self.query(crop, state, start=end - days, end=end, district=district, freq=freq)
+        result['state'] = part.meta['state']
+        return result
+
+    def ingest_csv(self, source, chunksize=250000):
+        """
+        Bulk-load an Agmarknet-style CSV (path or file object) into the store.
+
+        Rows for the same (date, district, market) replace earlier ones.
+
+        Returns:
+            dict: {(crop, state): rows in the partition after ingest}
+        """
+        # Only ingest needs pandas; API workers reading the store never import it
+        import pandas as pd
+        frames = {}
+        for chunk in pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False):
+            chunk = _normalize_columns(chunk)
+            missing = {'state', 'crop', 'date', 'modal'} - set(chunk.columns)
+            if missing:
+                raise ValueError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+            for column in ('district', 'market'):
+                if column not in chunk:
+                    chunk[column] = ''
+            for column in ('min', 'max'):
+                if column not in chunk:
+                    chunk[column] = chunk['modal']
+            chunk = pd.DataFrame({
+                'crop': chunk['crop'].map(normalize_crop),
+                'state': chunk['state'].str.strip(),
+                'district': chunk['district'].str.strip(),
+                'market': chunk['market'].str.strip(),
+                'date': pd.to_datetime(chunk['date'], dayfirst=True, errors='coerce'),
+                'min': pd.to_numeric(chunk['min'], errors='coerce'),
+                'max': pd.to_numeric(chunk['max'], errors='coerce'),
+                'modal': pd.to_numeric(chunk['modal'], errors='coerce')
+            }).dropna(subset=['date', 'modal'])
+            chunk['min'] = chunk['min'].fillna(chunk['modal'])
+            chunk['max'] = chunk['max'].fillna(chunk['modal'])
+            for (crop, state), group in chunk.groupby([chunk['crop'], chunk['state'].map(slug)], sort=False):
+                frames.setdefault((crop, state), []).append(group)
+
+        written = {}
+        for (crop, state_slug), groups in frames.items():
+            new = pd.concat(groups, ignore_index=True)
+            state = new['state'].iloc[0]
+            written[(crop, state)] = self._merge_partition(crop, state, new)
+        return written
+
+    def _merge_partition(self, crop, state, new):
+        import pandas as pd
+        path = self._partition_path(crop, state)
+        part = self.partition(crop, state)
+        frame = new[['district', 'market', 'date', 'min', 'max', 'modal']].copy()
+        frame['date'] = to_ordinals(frame['date'].values)
+        first_new = int(frame['date'].min())
+        if part is not None:
+            state = part.meta['state']
+            old = pd.DataFrame({name: np.asarray(part.columns[name]) for name in COLUMNS})
+            old['district'] = np.asarray(part.districts, dtype=object)[old['district'].values]
+            old['market'] = np.asarray(part.markets, dtype=object)[old['market'].values]
+            frame = pd.concat([old, frame], ignore_index=True)
+        frame = (frame.drop_duplicates(subset=['date', 'district', 'market'], keep='last')
+                      .sort_values(['date', 'district', 'market'], kind='stable'))
+
+        district_codes, districts = pd.factorize(frame['district'], sort=True)
+        market_codes, markets = pd.factorize(frame['market'], sort=True)
+        if len(districts) > np.iinfo(np.uint16).max or len(markets) > np.iinfo(np.uint16).max:
+            raise ValueError(f"Too many districts or markets in partition {crop}/{state}")
+        columns = {
+            'date': frame['date'].values,
+            'district': district_codes,
+            'market': market_codes,
+            'min': frame['min'].values,
+            'max': frame['max'].values,
+            'modal': frame['modal'].values
+        }
+
+        version = part.version + 1 if part is not None else 1
+        data_dir = os.path.join(path, f"v{version}")
+        os.makedirs(data_dir, exist_ok=True)
+        for name in COLUMNS:
+            np.save(os.path.join(data_dir, f"{name}.npy"), np.ascontiguousarray(columns[name], dtype=DTYPES[name]))
+        self._update_rolling(part, data_dir, frame, first_new)
+        meta = {
+            'crop': crop,
+            'state': state,
+            'version': version,
+            'rows': len(frame),
+            'first': int(columns['date'][0]),
+            'last': int(columns['date'][-1]),
+            'districts': [str(d) for d in districts],
+            'markets': [str(m) for m in markets]
+        }
+        tmp_path = os.path.join(path, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, 'meta.json'))
+        # Readers that still map the old version keep their (unlinked) files
+        if part is not None:
+            shutil.rmtree(os.path.join(path, f"v{part.version}"), ignore_errors=True)
+        return len(frame)
+
+    def _update_rolling(self, part, data_dir, frame, first_new):
+        """Carry the rolling statistics over to a new version: append new days, or rebuild on backfill."""
+        stats = None
+        if part is not None:
+            try:
+                stats = RollingStats.load(os.path.join(part.path, f"v{part.version}", 'rolling.npz'))
+            except OSError:
+                stats = None
+        if stats is not None and stats.last is not None and first_new > stats.last:
+            recent = frame[frame['date'].values > stats.last]
+            stats.update(recent['date'].values, recent['market'].values,
+                         recent['min'].values, recent['max'].values, recent['modal'].values)
+        else:
+            stats = RollingStats.rebuild(frame['date'].values, frame['market'].values,
+                                         frame['min'].values, frame['max'].values, frame['modal'].values)
+        stats.save(os.path.join(data_dir, 'rolling.npz'))
+        snapshot = {
+            "as_of": int(stats.last),
+            "markets": {key: {str(w): values for w, values in windows.items()}
+                        for key, windows in stats.snapshot().items()}
+        }
+        with open(os.path.join(data_dir, 'rolling.json'), 'w') as f:
+            json.dump(snapshot, f)
+
+    def rolling(self, crop, state, market=None):
+        """
+        Rolling statistics for one market, or all markets combined, as of the newest ingested day.
+
+        Returns:
+            dict: {"as_of": ordinal, "stats": {"7": {...}, "30": {...}, "90": {...}}},
+            or None if there is no partition or market
+        """
+        part = self.partition(crop, state)
+        if part is None:
+            return None
+        snapshot = part.rolling()
+        if snapshot is None:
+            return None
+        key = ALL_MARKETS
+        if market:
+            lookup = {name.lower(): name for name in snapshot['markets']}
+            key = lookup.get(market.strip().lower())
+            if key is None:
+                return None
+        return {"as_of": snapshot['as_of'], "stats": snapshot['markets'][key]}
+
+def _empty_result():
+    return {
+        'date': np.empty(0, dtype=np.int32),
+        'min': np.empty(0, dtype=np.float32),
+        'max': np.empty(0, dtype=np.float32),
+        'modal': np.empty(0, dtype=np.float64),
+        'count': np.empty(0, dtype=np.int64)
+    }
+
+def period_starts(ordinals, freq='D'):
+    """First day (ordinal) of the day, Monday-based week or month containing each date."""
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    if freq == 'D':
+        return ordinals
+    if freq == 'W':
+        # Ordinal 1 (0001-01-01) is a Monday
+        return ordinals - (ordinals - 1) % 7
+    if freq == 'M':
+        return to_ordinals(from_ordinals(ordinals).astype('datetime64[M]')).astype(np.int64)
+    raise ValueError(f"Unknown frequency '{freq}'. Use D, W or M")
+
+# Shared store for the API
+market_store = None
+
+def get_market_store():
+    """Get or create the MarketStore for MARKET_STORE_DIR."""
+    global market_store
+    if market_store is None:
+        market_store = MarketStore()
+    return market_store
+
+def main():
+    parser = argparse.ArgumentParser(description="Market price time-series store")
+    parser.add_argument('--store', default=DEFAULT_ROOT, help="Store directory (default MARKET_STORE_DIR)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="Load Agmarknet-style CSV files")
+    ingest.add_argument('files', nargs='+')
+    commands.add_parser('info', help="List partitions")
+    args = parser.parse_args()
+
+    store = MarketStore(args.store)
+    if args.command == 'ingest':
+        for path in args.files:
+            written = store.ingest_csv(path)
+            for (crop, state), rows in sorted(written.items()):
+                print(f"{path}: {crop}/{state}: {rows} rows")
+    else:
+        for crop, state, rows, first, last in store.partitions():
+            print(f"{crop:<12} {state:<20} {rows:>9} rows  {from_ordinals(first)} .. {from_ordinals(last)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+import threading
+import numpy as np
+from PIL import Image
+
+def perceptual_hash(image, hash_size=8):
+    """
+    Difference hash (dHash) of an image.
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale grid and
+    each bit records whether a cell is brighter than its right neighbour, so
+    re-encoded, slightly resized or recompressed copies hash the same or
+    within a few bits.
+
+    Args:
+        image: PIL Image (ideally the already downsampled model input)
+        hash_size: Grid size; the hash has hash_size * hash_size bits
+
+    Returns:
+        int: Hash as an unsigned integer
+    """
+    gray = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    px = np.asarray(gray, dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of predictions keyed by perceptual hash.
+
+    With max_distance > 0 a lookup also matches hashes that differ in up to
+    max_distance bits. The 64-bit hash is split into bands and each band value
+    is indexed; by the pigeonhole principle a near-duplicate shares at least
+    one band exactly when max_distance < bands, so only those candidates are
+    compared.
+    """
+
+    def __init__(self, max_entries=1024, max_distance=0, hash_bits=64, bands=4):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.bands = bands if 0 < max_distance < bands else 0
+        self.band_bits = hash_bits // bands
+        self._entries = OrderedDict()
+        self._band_index = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _band_keys(self, key):
+        mask = (1 << self.band_bits) - 1
+        return [(key >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def _find(self, key):
+        if key in self._entries or self.max_distance <= 0:
+            return key if key in self._entries else None
+        if self.bands:
+            candidates = set()
+            for index, band in zip(self._band_index, self._band_keys(key)):
+                candidates.update(index.get(band, ()))
+        else:
+            candidates = self._entries.keys()
+        best, best_distance = None, self.max_distance + 1
+        for candidate in candidates:
+            distance = bin(candidate ^ key).count('1')
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        return best
+
+    def get(self, key):
+        """Return the cached value for `key` (or a near-duplicate), or None."""
+        with self._lock:
+            found = self._find(key)
+            if found is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(found)
+            self.hits += 1
+            return self._entries[found]
+
+    def put(self, key, value):
+        """Store `value` under `key`, evicting the least recently used entry if full."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._entries[key] = value
+                return
+            self._entries[key] = value
+            for index, band in zip(self._band_index, self._band_keys(key)):
+                index.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                for index, band in zip(self._band_index, self._band_keys(old_key)):
+                    keys = index.get(band)
+                    keys.discard(old_key)
+                    if not keys:
+                        del index[band]
+
+    def stats(self):
+        """Size and hit/miss counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses
+            }
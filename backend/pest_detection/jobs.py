@@ -0,0 +1,178 @@
+"""
+Pest detection jobs shared by all workers of a host.
+
+Every job is a JSON file under the jobs directory (PEST_JOBS_DIR, default
+datasets/pest_jobs), replaced atomically on every state change. Only the
+submitting worker's threads run a job and write its file; any worker can
+read it, so a status poll or event stream that lands on another worker
+(serve.py runs one per core) still finds the job. Workers on different
+hosts need the directory on a shared filesystem, or sticky routing.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.getenv("PEST_JOBS_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'datasets', 'pest_jobs')
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the pending queue is at capacity."""
+
+class JobQueue:
+    """
+    Job queue: a bounded in-process queue drained by a fixed pool of worker
+    threads, with job records in `directory`. Finished jobs are kept for
+    `result_ttl` seconds so clients can poll or stream their result; jobs
+    that never finish (their worker died) are dropped after `stale_after`.
+    """
+
+    def __init__(self, handler, workers=2, max_pending=64, result_ttl=600, directory=DEFAULT_DIR,
+                 stale_after=3600, poll_interval=0.25):
+        self.handler = handler
+        self.result_ttl = result_ttl
+        self.directory = directory
+        self.stale_after = max(stale_after, result_ttl)
+        self.poll_interval = poll_interval
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=max_pending)
+        # Completion events of this worker's unfinished jobs
+        self._events = {}
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"pest-job-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        self._workers.append(threading.Thread(target=self._expire_loop, name="pest-job-expiry", daemon=True))
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, *args):
+        """
+        Enqueue `handler(*args)` and return the new job id.
+
+        Raises:
+            QueueFull: if max_pending jobs are already waiting
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "created": time.time(),
+            "finished": None,
+            "result": None,
+            "http_status": None
+        }
+        done = threading.Event()
+        with self._lock:
+            self._events[job_id] = done
+        self._write(job)
+        try:
+            self._queue.put_nowait((job, args))
+        except queue.Full:
+            with self._lock:
+                del self._events[job_id]
+            self._remove(job_id)
+            raise QueueFull(f"Too many pending jobs ({self._queue.maxsize})")
+        return job_id
+
+    def get(self, job_id):
+        """The job record, or None if unknown or expired."""
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def wait(self, job_id, timeout):
+        """Block up to `timeout` seconds for a job to finish; returns True if it has."""
+        with self._lock:
+            done = self._events.get(job_id)
+        if done is not None:
+            return done.wait(timeout)
+        # Another worker's job (or finished): watch its file
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return False
+            if job["finished"] is not None:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _path(self, job_id):
+        # Ids come from URLs: only our own hex ids map to a file
+        if not job_id.isalnum():
+            job_id = "invalid"
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, job):
+        path = self._path(job["id"])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _remove(self, job_id):
+        try:
+            os.remove(self._path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def _work(self):
+        while True:
+            job, args = self._queue.get()
+            job["status"] = "running"
+            try:
+                self._write(job)
+                job["result"], job["http_status"] = self.handler(*args)
+                # The handler reports rejected input (e.g. not a leaf) as a 4xx, not an exception
+                job["status"] = "failed" if job["http_status"] >= 400 else "done"
+            except Exception as e:
+                logger.exception("Job %s failed", job["id"])
+                job["result"] = {"success": False, "error": str(e), "prediction": None}
+                job["http_status"] = 500
+                job["status"] = "failed"
+            finally:
+                job["finished"] = time.time()
+                try:
+                    self._write(job)
+                except OSError:
+                    logger.exception("Could not record job %s", job["id"])
+                with self._lock:
+                    done = self._events.pop(job["id"], None)
+                if done is not None:
+                    done.set()
+                self._queue.task_done()
+
+    def _expire_loop(self):
+        while True:
+            time.sleep(min(60, self.result_ttl))
+            try:
+                self._expire()
+            except Exception:
+                logger.exception("Expiring pest jobs failed")
+
+    def _expire(self):
+        """Remove expired job files (every worker does this; losing a race to another is fine)."""
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            job = self.get(name[:-len(".json")])
+            if job is None:
+                continue
+            if job["finished"] is not None and job["finished"] < now - self.result_ttl \
+                    or job["finished"] is None and job["created"] < now - self.stale_after:
+                self._remove(job["id"])
@@ -0,0 +1,96 @@
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds (upper bounds), from sub-millisecond cache hits to slow uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """
+    Thread-safe histogram with one series per label value, rendered in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        """Record one observation for `label_value`."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """{label_value: {"count": n, "sum": seconds}} for every series."""
+        with self._lock:
+            return {key: {"count": s[2], "sum": s[1]} for key, s in self._series.items()}
+
+    def render(self):
+        """Prometheus text format lines for this histogram."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(s[0]), s[1], s[2]) for key, s in self._series.items()}
+        for key in sorted(series):
+            counts, total, count = series[key]
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{self.label}="{key}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{self.label}="{key}",le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{self.label}="{key}"}} {total}')
+            lines.append(f'{self.name}_count{{{self.label}="{key}"}} {count}')
+        return lines
+
+# Per-stage latency of the pest detection pipeline
+PEST_STAGE_SECONDS = Histogram(
+    'pest_stage_seconds',
+    'Time spent in each pest detection pipeline stage',
+    'stage'
+)
+
+# Fraction of requests whose stage timings are logged at INFO (0 disables)
+LOG_SAMPLE_RATE = float(os.getenv("PEST_LOG_SAMPLE_RATE", "0"))
+
+class StageTimer:
+    """
+    Times pipeline stages into PEST_STAGE_SECONDS and keeps this request's
+    timings so a sampled summary can be logged.
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            PEST_STAGE_SECONDS.observe(name, elapsed)
+
+    def log_sampled(self, logger, message, *args):
+        """Log `message` plus the stage timings for a PEST_LOG_SAMPLE_RATE fraction of calls."""
+        if LOG_SAMPLE_RATE <= 0 or random.random() >= LOG_SAMPLE_RATE or not logger.isEnabledFor(logging.INFO):
+            return
+        stages = ' '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.timings.items())
+        logger.info(message + ' ' + stages, *args)
+
+def render_metrics():
+    """All pest pipeline metrics in the Prometheus text exposition format."""
+    return '\n'.join(PEST_STAGE_SECONDS.render()) + '\n'
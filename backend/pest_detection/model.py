@@ -1,138 +1,85 @@
 import os
-import numpy as np
-from PIL import Image
+import logging
+import threading
 import torch
 from torchvision import transforms
 import torch.nn as nn
 import torch.nn.functional as F
 from torchvision import models
 
+from .utils import fit_image
+from .metrics import StageTimer
+from .treatment import CLASSES, TREATMENT_INFO, build_result
+from .tiers import BACKBONES, resolve_tier, weights_filename
+from .runtime import CHANNELS_LAST, configure_torch
+
+logger = logging.getLogger(__name__)
+
+def build_backbone(backbone, pretrained=False):
+    """
+    Build a torchvision backbone without its ImageNet classifier.
+    
+    Args:
+        backbone: 'resnet18', 'efficientnet_b0' or 'mobilenet_v3_small' (see tiers.BACKBONES)
+        pretrained: Download ImageNet weights (only needed to seed training)
+        
+    Returns:
+        tuple: (model, name of the classifier attribute, classifier input features)
+    """
+    if backbone == 'resnet18':
+        net = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1 if pretrained else None)
+        return net, 'fc', net.fc.in_features
+    if backbone == 'efficientnet_b0':
+        net = models.efficientnet_b0(weights=models.EfficientNet_B0_Weights.IMAGENET1K_V1 if pretrained else None)
+        return net, 'classifier', net.classifier[1].in_features
+    if backbone == 'mobilenet_v3_small':
+        net = models.mobilenet_v3_small(weights=models.MobileNet_V3_Small_Weights.IMAGENET1K_V1 if pretrained else None)
+        return net, 'classifier', net.classifier[0].in_features
+    raise ValueError(f"Unknown backbone '{backbone}'. Available: {', '.join(BACKBONES.values())}")
+
 # Define the model architecture
 class PestDetector(nn.Module):
-    def __init__(self, num_classes=4):
+    def __init__(self, num_classes=4, pretrained=False, backbone='resnet18'):
         super(PestDetector, self).__init__()
-        # Use a pre-trained ResNet18 model
-        self.model = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
+        # Backbone (ResNet18 by default). ImageNet weights are only fetched when
+        # explicitly requested (e.g. to seed training); inference loads local weights.
+        self.model, self.head_attr, num_ftrs = build_backbone(backbone, pretrained=pretrained)
         
-        # Replace the final fully connected layer
-        num_ftrs = self.model.fc.in_features
-        self.model.fc = nn.Sequential(
+        # Replace the final classifier with the shared pest head
+        setattr(self.model, self.head_attr, nn.Sequential(
             nn.Linear(num_ftrs, 512),
             nn.ReLU(),
             nn.Dropout(0.2),
             nn.Linear(512, num_classes)
-        )
+        ))
     
     def forward(self, x):
         return self.model(x)
 
 class PestDetectionModel:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, tier=None, channels_last=None):
+        # Thread counts are per process and fixed on first use (see runtime.py)
+        configure_torch()
+        self.tier = resolve_tier(tier)
+        self.backbone = BACKBONES[self.tier]
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.classes = ['healthy', 'diseased', 'pest_infested', 'nutrient_deficiency']
+        self.classes = list(CLASSES)
         
-        # Detailed treatment information for each condition with specific recommendations
-        self.treatment_info = {
-            'healthy': {
-                'description': 'Your plant appears to be in good health!',
-                'recommendations': [
-                    'Continue with regular watering schedule (check soil moisture before watering)',
-                    'Ensure 6-8 hours of sunlight daily',
-                    'Rotate the plant periodically for even growth',
-                    'Wipe leaves with a damp cloth monthly to remove dust',
-                    'Inspect weekly for early signs of pests or disease'
-                ],
-                'care_tips': [
-                    'Use room temperature water to avoid shocking the roots',
-                    'Fertilize monthly during growing season with balanced fertilizer',
-                    'Prune dead or yellowing leaves to encourage new growth',
-                    'Check for proper drainage to prevent root rot'
-                ]
-            },
-            'diseased': {
-                'description': 'Your plant shows signs of disease.',
-                'immediate_actions': [
-                    '🚫 Isolate the plant immediately to prevent spreading',
-                    '✂️ Prune affected leaves with sterilized shears',
-                    '🧴 Apply appropriate fungicide (copper-based for fungal, bactericide for bacterial)',
-                    '💧 Water at soil level, avoid wetting leaves'
-                ],
-                'treatment_plan': [
-                    '1. Remove and destroy all infected plant material',
-                    '2. Apply recommended treatment every 7-10 days',
-                    '3. Improve air circulation around the plant',
-                    '4. Disinfect tools after use to prevent spread'
-                ],
-                'prevention': [
-                    'Water in the morning to allow leaves to dry',
-                    'Space plants properly for good air flow',
-                    'Use mulch to prevent soil-borne diseases',
-                    'Choose disease-resistant plant varieties'
-                ]
-            },
-            'pest_infested': {
-                'description': 'Pest infestation detected on your plant.',
-                'organic_solutions': [
-                    '🐞 Release beneficial insects (ladybugs, lacewings)',
-                    '🌿 Apply neem oil solution (2 tbsp neem oil + 1 tsp dish soap + 1 gallon water)',
-                    '🧼 Use insecticidal soap spray for soft-bodied insects',
-                    '🧄 Make garlic or chili pepper spray as a natural deterrent'
-                ],
-                'treatment_steps': [
-                    '1. Isolate the affected plant',
-                    '2. Remove visible pests with a strong water spray',
-                    '3. Apply chosen treatment thoroughly (undersides of leaves too!)',
-                    '4. Repeat every 5-7 days for 2-3 weeks',
-                    '5. Monitor for new infestations'
-                ],
-                'prevention': [
-                    'Inspect new plants before bringing them home',
-                    'Keep the growing area clean and free of debris',
-                    'Use yellow sticky traps for early detection',
-                    'Encourage natural predators in your garden'
-                ]
-            },
-            'nutrient_deficiency': {
-                'description': 'Your plant shows signs of nutrient deficiency.',
-                'common_deficiencies': {
-                    'nitrogen': {
-                        'symptoms': ['Yellowing of older leaves', 'Stunted growth', 'Smaller than normal leaves'],
-                        'solutions': ['Apply balanced fertilizer (10-10-10)', 'Add compost or manure', 'Use fish emulsion']
-                    },
-                    'phosphorus': {
-                        'symptoms': ['Dark green or purple leaves', 'Poor root development', 'Delayed maturity'],
-                        'solutions': ['Apply bone meal', 'Use rock phosphate', 'Add composted manure']
-                    },
-                    'potassium': {
-                        'symptoms': ['Brown leaf edges', 'Weak stems', 'Poor fruit development'],
-                        'solutions': ['Apply potash', 'Use wood ash', 'Add banana peels to compost']
-                    },
-                    'magnesium': {
-                        'symptoms': ['Yellowing between leaf veins', 'Leaf curling', 'Poor growth'],
-                        'solutions': ['Apply Epsom salt (1 tbsp/gallon water)', 'Use dolomitic lime', 'Add compost']
-                    }
-                },
-                'general_advice': [
-                    'Conduct a soil test to confirm deficiencies',
-                    'Maintain proper soil pH (6.0-7.0 for most plants)',
-                    'Use organic matter to improve nutrient availability',
-                    'Water consistently to prevent nutrient lockout'
-                ]
-            }
-        }
+        # Detailed treatment information for each condition (see treatment.py)
+        self.treatment_info = TREATMENT_INFO
         
         # Initialize the model
-        self.model = PestDetector(num_classes=len(self.classes)).to(self.device)
+        self.model = PestDetector(num_classes=len(self.classes), backbone=self.backbone).to(self.device)
         
         # Set default model path if not provided
         if model_path is None:
             model_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
-            model_path = os.path.join(model_dir, 'pest_detection.pth')
+            model_path = os.path.join(model_dir, weights_filename(self.tier))
         
         # Load pretrained weights if available
         try:
             if os.path.exists(model_path):
-                print(f"Loading model from {model_path}")
+                logger.info("Loading model from %s", model_path)
                 # Load the state dict with map_location to ensure compatibility
                 state_dict = torch.load(model_path, map_location=self.device)
                 # Handle the case where the saved model is a DataParallel model
@@ -144,115 +91,167 @@ class PestDetectionModel:
                         new_state_dict[name] = v
                     state_dict = new_state_dict
                 self.model.load_state_dict(state_dict)
-                print("Model loaded successfully")
+                logger.info("Model loaded successfully")
             else:
-                print(f"Warning: Model file not found at {model_path}. Using randomly initialized weights.")
+                logger.warning("Model file not found at %s. Using randomly initialized weights.", model_path)
         except Exception as e:
-            print(f"Error loading model: {str(e)}")
-            print("Using randomly initialized weights")
+            logger.error("Error loading model: %s. Using randomly initialized weights", e)
         
         self.model.eval()
         
-        # Define image transformations
+        # Channels-last lets oneDNN skip layout reorders in the convolutions
+        self.channels_last = CHANNELS_LAST if channels_last is None else channels_last
+        self.memory_format = torch.channels_last if self.channels_last else torch.contiguous_format
+        self.model = self.model.to(memory_format=self.memory_format)
+        
+        # Define image transformations. Resizing happens once, in fit_image,
+        # so images coming from load_image go straight to tensor conversion.
+        self.input_size = (224, 224)
         self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
             transforms.ToTensor(),
             transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
     
-    def predict(self, image):
+    def warmup(self, iterations=3):
+        """Run a few dummy forward passes so the first real request doesn't pay for lazy init."""
+        dummy = self.to_model_input(torch.zeros(1, 3, self.input_size[1], self.input_size[0]))
+        with torch.inference_mode():
+            for _ in range(iterations):
+                self.model(dummy)
+    
+    def to_model_input(self, batch):
+        """Move an NCHW batch to the model's device and memory format."""
+        return batch.to(self.device).contiguous(memory_format=self.memory_format)
+    
+    def build_result(self, predicted_class, confidence):
+        """Assemble the prediction dict (treatment info and legacy 'advice') for a class."""
+        return build_result(predicted_class, confidence)
+    
+    def image_tensor(self, image):
+        """Convert a PIL image to a normalized CHW tensor, resizing only if it isn't model-sized."""
+        if image.size != self.input_size or image.mode != 'RGB':
+            image = fit_image(image, self.input_size)
+        return self.transform(image)
+    
+    def classify_array(self, pixels):
+        """
+        Classify a batch of model-sized RGB images given as raw pixels.
+        
+        Args:
+            pixels (np.ndarray): uint8 array of shape (N, height, width, 3)
+            
+        Returns:
+            tuple: (class indices, confidences) as lists of length N
+        """
+        mean = torch.tensor([0.485, 0.456, 0.406], device=self.device).view(1, 3, 1, 1)
+        std = torch.tensor([0.229, 0.224, 0.225], device=self.device).view(1, 3, 1, 1)
+        batch = torch.from_numpy(pixels).to(self.device).permute(0, 3, 1, 2).float().div_(255)
+        batch = self.to_model_input((batch - mean) / std)
+        with torch.inference_mode():
+            probabilities = F.softmax(self.model(batch), dim=1)
+            confidences, predicted = torch.max(probabilities, 1)
+        return predicted.tolist(), confidences.tolist()
+    
+    def predict_batch(self, images, timer=None):
+        """
+        Predict a list of images with a single forward pass.
+        
+        Args:
+            images (list of PIL.Image): Input images
+            timer (StageTimer, optional): Records the batch_tensor and batch_forward stages
+            
+        Returns:
+            list: One prediction result dict per image, in the same order
+        """
+        timer = timer or StageTimer()
+        try:
+            with timer.stage('batch_tensor'):
+                batch = self.to_model_input(torch.stack([self.image_tensor(image) for image in images]))
+            with timer.stage('batch_forward'), torch.inference_mode():
+                probabilities = F.softmax(self.model(batch), dim=1)
+                confidences, predicted = torch.max(probabilities, 1)
+            return [
+                self.build_result(self.classes[index], confidence)
+                for index, confidence in zip(predicted.tolist(), confidences.tolist())
+            ]
+        except Exception as e:
+            logger.exception("Error during batch prediction")
+            error = {
+                'status': 'error',
+                'message': f'Error during prediction: {str(e)}',
+                'prediction': None
+            }
+            return [error] * len(images)
+    
+    def predict(self, image, timer=None):
         """
         Predict the class of the input image and provide treatment information.
         
         Args:
             image (PIL.Image): Input image
+            timer (StageTimer, optional): Records the tensor and forward stages
             
         Returns:
             dict: Prediction results with class, confidence, and detailed treatment information
         """
+        timer = timer or StageTimer()
         try:
-            print("Starting image prediction...")
-            print(f"Image mode: {image.mode}, size: {image.size}")
+            logger.debug("Starting prediction. Image mode: %s, size: %s", image.mode, image.size)
             
             # Preprocess the image
-            try:
-                img_tensor = self.transform(image).unsqueeze(0).to(self.device)
-                print("Image transformed successfully")
-            except Exception as e:
-                print(f"Error transforming image: {str(e)}")
-                raise
+            with timer.stage('tensor'):
+                img_tensor = self.to_model_input(self.image_tensor(image).unsqueeze(0))
             
             # Make prediction
-            try:
-                with torch.no_grad():
-                    print("Running model inference...")
-                    outputs = self.model(img_tensor)
-                    print("Model inference completed")
-                    probabilities = F.softmax(outputs, dim=1)
-                    confidence, predicted = torch.max(probabilities, 1)
-                    confidence = confidence.item()
-                    print(f"Predicted class index: {predicted.item()}, confidence: {confidence:.4f}")
-            except Exception as e:
-                print(f"Error during model inference: {str(e)}")
-                raise
-                
-            # Get the predicted class and confidence
-            try:
-                predicted_class = self.classes[predicted.item()]
-                print(f"Predicted class: {predicted_class}")
-            except Exception as e:
-                print(f"Error getting predicted class: {str(e)}")
-                raise
-            
-            # Get detailed treatment information based on the predicted class
-            treatment_info = self.treatment_info.get(predicted_class, {})
-            
-            # Prepare the response with detailed treatment information
-            result = {
-                'status': 'success',
-                'prediction': {
-                    'class': predicted_class,
-                    'confidence': round(confidence, 4),
-                    'description': treatment_info.get('description', ''),
-                    'recommendations': treatment_info.get('recommendations', []),
-                    'care_tips': treatment_info.get('care_tips', []),
-                    'immediate_actions': treatment_info.get('immediate_actions', []),
-                    'treatment_plan': treatment_info.get('treatment_plan', []),
-                    'organic_solutions': treatment_info.get('organic_solutions', []),
-                    'treatment_steps': treatment_info.get('treatment_steps', []),
-                    'prevention': treatment_info.get('prevention', []),
-                    'common_deficiencies': treatment_info.get('common_deficiencies', {}) if predicted_class == 'nutrient_deficiency' else None,
-                    'general_advice': treatment_info.get('general_advice', [])
-                }
-            }
+            with timer.stage('forward'), torch.inference_mode():
+                outputs = self.model(img_tensor)
+                probabilities = F.softmax(outputs, dim=1)
+                confidence, predicted = torch.max(probabilities, 1)
+                confidence = confidence.item()
             
-            # Add legacy 'advice' field for backward compatibility
-            if predicted_class == 'healthy':
-                result['prediction']['advice'] = treatment_info['description']
-            elif predicted_class == 'diseased':
-                result['prediction']['advice'] = treatment_info['description'] + ' ' + ' '.join(treatment_info.get('immediate_actions', []))
-            elif predicted_class == 'pest_infested':
-                result['prediction']['advice'] = treatment_info['description'] + ' ' + ' '.join(treatment_info.get('organic_solutions', []))
-            elif predicted_class == 'nutrient_deficiency':
-                result['prediction']['advice'] = treatment_info['description'] + ' Consider a soil test to identify specific deficiencies.'
+            # Get the predicted class and confidence
+            predicted_class = self.classes[predicted.item()]
+            logger.debug("Predicted class: %s, confidence: %.4f", predicted_class, confidence)
             
-            print(f"Prediction successful. Confidence: {confidence:.2%}")
-            print(f"Prediction successful: {result}")
-            return result
+            return self.build_result(predicted_class, confidence)
             
         except Exception as e:
+            logger.exception("Error during prediction")
             return {
                 'status': 'error',
                 'message': f'Error during prediction: {str(e)}',
                 'prediction': None
             }
 
-# Singleton instance
-pest_detector = None
+# Singleton instances, one per tier
+pest_detectors = {}
+_pest_detector_lock = threading.Lock()
+_pest_detector_ready = threading.Event()
+
+def get_pest_detector(model_path=None, tier=None):
+    """Get or create the pest detector instance for a tier (default: PEST_MODEL_TIER)."""
+    tier = resolve_tier(tier)
+    detector = pest_detectors.get(tier)
+    if detector is None:
+        with _pest_detector_lock:
+            detector = pest_detectors.get(tier)
+            if detector is None:
+                detector = pest_detectors[tier] = PestDetectionModel(model_path=model_path, tier=tier)
+    return detector
+
+def warm_up_pest_detector(model_path=None, iterations=3, tiers=None):
+    """Load the pest detector for each tier (default tier only by default), warm it up, then mark ready."""
+    detector = None
+    for tier in (tiers or [None]):
+        detector = get_pest_detector(model_path=model_path, tier=tier)
+        detector.warmup(iterations=iterations)
+    _pest_detector_ready.set()
+    return detector
+
+def is_pest_detector_ready():
+    """True once warm_up_pest_detector has completed (or mark_pest_detector_ready was called)."""
+    return _pest_detector_ready.is_set()
 
-def get_pest_detector(model_path=None):
-    """Get or create the pest detector instance."""
-    global pest_detector
-    if pest_detector is None:
-        pest_detector = PestDetectionModel(model_path=model_path)
-    return pest_detector
+def mark_pest_detector_ready():
+    """Mark the detector ready without a warm-up (PEST_WARMUP=0: loaded on first use)."""
+    _pest_detector_ready.set()
@@ -0,0 +1,224 @@
+"""
+Client for the standalone pest model server (see server.py).
+
+Importing this module does not import torch, so web workers that talk to a
+shared model server stay small. Wire protocol (network byte order) over a
+Unix domain socket, one request/response pair at a time per connection:
+
+    request:  b'PEST' | op:u8 | count:u16 | width:u16 | height:u16 | count*height*width*3 RGB bytes
+    response: b'PEST' | status:u8 | count:u16 | count * (class_index:u8, confidence:f32)
+              (status != 0: | length:u32 | UTF-8 error message)
+
+op 1 classifies `count` images, op 2 is a ping (count = 0), op 3 asks for the
+server's model tier (count = 0; response: | length:u32 | UTF-8 tier name).
+"""
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+from .metrics import StageTimer
+from .treatment import CLASSES, TREATMENT_INFO, build_result
+from .utils import fit_image
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PEST'
+OP_CLASSIFY = 1
+OP_PING = 2
+OP_INFO = 3
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+REQUEST_HEADER = struct.Struct('!4sBHHH')
+RESPONSE_HEADER = struct.Struct('!4sBH')
+PREDICTION = struct.Struct('!Bf')
+ERROR_LENGTH = struct.Struct('!I')
+TEXT_LENGTH = struct.Struct('!I')
+
+def recv_exact(sock, size):
+    """Read exactly `size` bytes into a (writable) bytearray or raise ConnectionError."""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while size:
+        n = sock.recv_into(view, size)
+        if not n:
+            raise ConnectionError("Connection closed by peer")
+        view = view[n:]
+        size -= n
+    return buf
+
+class RemotePestDetector:
+    """
+    Drop-in replacement for PestDetectionModel that forwards model-sized
+    images to the model server. Each thread keeps its own connection.
+    """
+
+    def __init__(self, socket_path, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.classes = list(CLASSES)
+        self.treatment_info = TREATMENT_INFO
+        self.input_size = (224, 224)
+        self._local = threading.local()
+        self._tier = None
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _call(self, op, pixels=None):
+        count = 0 if pixels is None else len(pixels)
+        height, width = (0, 0) if pixels is None else pixels.shape[1:3]
+        frame = REQUEST_HEADER.pack(MAGIC, op, count, width, height)
+        for attempt in (0, 1):
+            reused = getattr(self._local, 'sock', None) is not None
+            try:
+                sock = self._connection()
+                sock.sendall(frame)
+                if pixels is not None:
+                    sock.sendall(memoryview(np.ascontiguousarray(pixels)).cast('B'))
+                break
+            except socket.timeout:
+                # The server may be working through a partial request: don't add a second one
+                self._close()
+                raise
+            except OSError:
+                # Stale connection (e.g. server restarted) fails on send, before the
+                # server has a request to work on: reconnect and resend once
+                self._close()
+                if attempt or not reused:
+                    raise
+        try:
+            return self._response(sock, op)
+        except OSError:
+            # Timeout or broken connection mid-response: the stream is out of step, never resent
+            self._close()
+            raise
+
+    def _response(self, sock, op):
+        magic, status, n = RESPONSE_HEADER.unpack(recv_exact(sock, RESPONSE_HEADER.size))
+        if magic != MAGIC:
+            raise ConnectionError("Bad response from pest model server")
+        if status != STATUS_OK:
+            (length,) = ERROR_LENGTH.unpack(recv_exact(sock, ERROR_LENGTH.size))
+            raise RuntimeError(recv_exact(sock, length).decode('utf-8'))
+        if op == OP_INFO:
+            (length,) = TEXT_LENGTH.unpack(recv_exact(sock, TEXT_LENGTH.size))
+            return recv_exact(sock, length).decode('utf-8')
+        payload = recv_exact(sock, n * PREDICTION.size)
+        return [PREDICTION.unpack_from(payload, i * PREDICTION.size) for i in range(n)]
+
+    def ping(self):
+        self._call(OP_PING)
+
+    def server_tier(self):
+        """The model tier the server runs (its --tier), or None if it can't be reached."""
+        if self._tier is None:
+            try:
+                self._tier = self._call(OP_INFO)
+            except (OSError, RuntimeError):
+                logger.warning("Could not get the model tier from %s", self.socket_path)
+        return self._tier
+
+    def warmup(self, iterations=3):
+        """Wait for the model server to accept connections."""
+        for _ in range(iterations):
+            self.ping()
+
+    def build_result(self, predicted_class, confidence):
+        return build_result(predicted_class, confidence)
+
+    def _pixels(self, images):
+        sized = [image if image.size == self.input_size and image.mode == 'RGB' else fit_image(image, self.input_size)
+                 for image in images]
+        return np.stack([np.asarray(image, dtype=np.uint8) for image in sized])
+
+    def predict_batch(self, images, timer=None):
+        """Predict a list of images on the model server; same results as PestDetectionModel.predict_batch."""
+        timer = timer or StageTimer()
+        try:
+            with timer.stage('batch_tensor'):
+                pixels = self._pixels(images)
+            with timer.stage('batch_forward'):
+                predictions = self._call(OP_CLASSIFY, pixels)
+            return [self.build_result(self.classes[index], confidence) for index, confidence in predictions]
+        except Exception as e:
+            logger.exception("Error during remote batch prediction")
+            error = {
+                'status': 'error',
+                'message': f'Error during prediction: {str(e)}',
+                'prediction': None
+            }
+            return [error] * len(images)
+
+    def predict(self, image, timer=None):
+        """Predict one image on the model server; same result as PestDetectionModel.predict."""
+        timer = timer or StageTimer()
+        try:
+            with timer.stage('tensor'):
+                pixels = self._pixels([image])
+            with timer.stage('forward'):
+                (index, confidence), = self._call(OP_CLASSIFY, pixels)
+            return self.build_result(self.classes[index], confidence)
+        except Exception as e:
+            logger.exception("Error during remote prediction")
+            return {
+                'status': 'error',
+                'message': f'Error during prediction: {str(e)}',
+                'prediction': None
+            }
+
+# Singleton instance
+pest_detector = None
+_pest_detector_ready = threading.Event()
+
+def get_pest_detector(model_path=None, tier=None):
+    """
+    Get the client for the model server at PEST_MODEL_SOCKET.
+    
+    The server runs a single tier (its --tier option), so `tier` and
+    `model_path` are accepted for interface compatibility and ignored;
+    api/pest.py rejects requests for any other tier (server_tier()).
+    """
+    global pest_detector
+    if pest_detector is None:
+        pest_detector = RemotePestDetector(os.environ["PEST_MODEL_SOCKET"])
+    return pest_detector
+
+def warm_up_pest_detector(model_path=None, iterations=3, tiers=None, wait=60.0):
+    """Wait up to `wait` seconds for the model server to answer pings, then mark ready."""
+    detector = get_pest_detector()
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            detector.warmup(iterations=iterations)
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+    _pest_detector_ready.set()
+    return detector
+
+def is_pest_detector_ready():
+    """True once warm_up_pest_detector has reached the model server (or mark_pest_detector_ready was called)."""
+    return _pest_detector_ready.is_set()
+
+def mark_pest_detector_ready():
+    """Mark the detector ready without a warm-up (PEST_WARMUP=0: loaded on first use)."""
+    _pest_detector_ready.set()
@@ -0,0 +1,79 @@
+"""
+Per-process torch CPU settings for pest inference.
+
+By default torch starts one intra-op thread per core in every process, so N
+gunicorn workers on a C-core box run N*C threads and thrash. Each worker
+instead takes its share of the cores:
+
+    PEST_TORCH_THREADS          intra-op threads (default: cores // WEB_CONCURRENCY)
+    PEST_TORCH_INTEROP_THREADS  inter-op threads (default: torch's own)
+    PEST_CHANNELS_LAST          1 to run the model in channels-last memory format
+
+WEB_CONCURRENCY is the gunicorn worker count (default 1). Use
+`python -m pest_detection.sweep` to find the best split for a machine.
+"""
+import logging
+import os
+import threading
+import torch
+
+logger = logging.getLogger(__name__)
+
+CHANNELS_LAST = os.getenv("PEST_CHANNELS_LAST", "0") == "1"
+
+_configured = False
+_configure_lock = threading.Lock()
+
+def available_cores():
+    """CPUs this process may run on (respects container and taskset limits where supported)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def default_threads(workers=None):
+    """Intra-op threads per process when `workers` processes share the available cores."""
+    if workers is None:
+        workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    return max(1, available_cores() // max(1, workers))
+
+def configure_torch(threads=None, interop_threads=None, workers=None):
+    """
+    Set torch's intra-op and inter-op thread counts for this process.
+
+    Only the first call has an effect, since torch cannot change the inter-op
+    pool once it has been used. Arguments override the PEST_TORCH_* settings;
+    `workers` is the number of torch processes sharing the cores.
+
+    Returns:
+        tuple: (intra-op threads, inter-op threads) in effect
+    """
+    global _configured
+    with _configure_lock:
+        if not _configured:
+            _configured = True
+            threads = threads or int(os.getenv("PEST_TORCH_THREADS", "0")) or default_threads(workers)
+            interop_threads = interop_threads or int(os.getenv("PEST_TORCH_INTEROP_THREADS", "0"))
+            torch.set_num_threads(threads)
+            if interop_threads:
+                try:
+                    torch.set_num_interop_threads(interop_threads)
+                except RuntimeError as e:
+                    logger.warning("Could not set torch inter-op threads: %s", e)
+            logger.info("torch threads: %d intra-op, %d inter-op",
+                        torch.get_num_threads(), torch.get_num_interop_threads())
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+def configure_torch_after_fork(workers=None):
+    """
+    Apply this worker's thread counts after forking from a master that
+    loaded the model with configure_torch(threads=1) (see serve.py).
+
+    The master must not start torch's thread pools (OpenMP's is not
+    fork-safe), so it loads single-threaded and each worker configures
+    its own share of the cores here.
+    """
+    global _configured
+    with _configure_lock:
+        _configured = False
+    return configure_torch(workers=workers)
@@ -0,0 +1,125 @@
+"""
+Standalone pest model server.
+
+Holds a single PestDetectionModel and serves the binary protocol described
+in remote.py over a Unix domain socket, so any number of web workers can
+share one model (and one set of torch threads). Run from backend/:
+
+    python -m pest_detection.server --socket /tmp/pest-model.sock --threads 4
+
+and start the web app with PEST_MODEL_SOCKET=/tmp/pest-model.sock.
+"""
+import argparse
+import logging
+import os
+import socketserver
+import threading
+import numpy as np
+import torch
+
+from .model import PestDetectionModel
+from .runtime import configure_torch
+from .remote import (
+    MAGIC, OP_CLASSIFY, OP_PING, OP_INFO, STATUS_OK, STATUS_ERROR,
+    REQUEST_HEADER, RESPONSE_HEADER, PREDICTION, ERROR_LENGTH, TEXT_LENGTH, recv_exact
+)
+
+logger = logging.getLogger(__name__)
+
+# Largest batch accepted in one request
+MAX_BATCH = 256
+
+class PestModelHandler(socketserver.BaseRequestHandler):
+    """Serves request frames on one client connection until it closes."""
+
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                header = recv_exact(sock, REQUEST_HEADER.size)
+            except ConnectionError:
+                return
+            magic, op, count, width, height = REQUEST_HEADER.unpack(header)
+            if magic != MAGIC:
+                logger.warning("Bad frame from client; closing connection")
+                return
+            try:
+                if op == OP_PING:
+                    sock.sendall(RESPONSE_HEADER.pack(MAGIC, STATUS_OK, 0))
+                    continue
+                if op == OP_INFO:
+                    tier = self.server.detector.tier.encode('utf-8')
+                    sock.sendall(RESPONSE_HEADER.pack(MAGIC, STATUS_OK, 0) + TEXT_LENGTH.pack(len(tier)) + tier)
+                    continue
+                if op != OP_CLASSIFY or not 0 < count <= MAX_BATCH or (width, height) != self.server.detector.input_size:
+                    # Frame can't be trusted to be in sync any more
+                    self.send_error(f"Unsupported request (op={op}, count={count}, size={width}x{height})")
+                    return
+                data = recv_exact(sock, count * height * width * 3)
+                pixels = np.frombuffer(data, dtype=np.uint8).reshape(count, height, width, 3)
+                with self.server.model_lock:
+                    indices, confidences = self.server.detector.classify_array(pixels)
+                payload = b''.join(PREDICTION.pack(i, c) for i, c in zip(indices, confidences))
+                sock.sendall(RESPONSE_HEADER.pack(MAGIC, STATUS_OK, count) + payload)
+            except ConnectionError:
+                return
+            except Exception as e:
+                logger.exception("Error serving prediction")
+                self.send_error(str(e))
+
+    def send_error(self, message):
+        data = message.encode('utf-8')
+        self.request.sendall(RESPONSE_HEADER.pack(MAGIC, STATUS_ERROR, 0) + ERROR_LENGTH.pack(len(data)) + data)
+
+class PestModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, detector):
+        self.detector = detector
+        # One forward pass at a time; torch's own threads parallelise each pass
+        self.model_lock = threading.Lock()
+        super().__init__(socket_path, PestModelHandler)
+
+def serve(socket_path, model_path=None, tier=None, threads=None, interop_threads=None,
+          channels_last=None, warmup_iterations=3):
+    """Load the model, warm it up and serve on `socket_path` until interrupted."""
+    # The server is the only torch process, so it defaults to all cores
+    configure_torch(threads, interop_threads, workers=1)
+
+    detector = PestDetectionModel(model_path=model_path, tier=tier, channels_last=channels_last)
+    detector.warmup(iterations=warmup_iterations)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = PestModelServer(socket_path, detector)
+    logger.info("Pest model server listening on %s (tier: %s, torch threads: %d)",
+                socket_path, detector.tier, torch.get_num_threads())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared pest detection model server")
+    parser.add_argument('--socket', default=os.getenv("PEST_MODEL_SOCKET", "/tmp/pest-model.sock"),
+                        help="Unix domain socket path to listen on")
+    parser.add_argument('--model-path', default=None, help="Path to pest_detection.pth")
+    parser.add_argument('--tier', default=None, help="Model tier: fast, balanced or accurate (default PEST_MODEL_TIER)")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="torch intra-op threads (default PEST_TORCH_THREADS, else all cores)")
+    parser.add_argument('--interop-threads', type=int, default=None, help="torch inter-op threads")
+    parser.add_argument('--channels-last', action='store_true', default=None,
+                        help="Run the model in channels-last memory format (default PEST_CHANNELS_LAST)")
+    parser.add_argument('--warmup', type=int, default=3, help="Warm-up forward passes before serving")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    serve(args.socket, model_path=args.model_path, tier=args.tier, threads=args.threads,
+          interop_threads=args.interop_threads, channels_last=args.channels_last,
+          warmup_iterations=args.warmup)
+
+if __name__ == '__main__':
+    main()
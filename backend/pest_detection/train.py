@@ -0,0 +1,350 @@
+"""
+Train the pest detector on a folder of labelled leaf photos.
+
+Images are laid out one folder per class (names from treatment.CLASSES):
+
+    data/pests/healthy/*.jpg
+    data/pests/diseased/*.jpg
+    ...
+
+The first run decodes every photo once, with the same load_image path used
+at inference, into a memory-mapped uint8 cache (images.npy + labels.npy +
+manifest.json under --cache-dir); later epochs and later runs read pixels
+straight from the page cache. The cache is rebuilt when files are added,
+removed or modified. Run from backend/:
+
+    python -m pest_detection.train --data-dir data/pests --tier fast --pretrained --amp
+
+The best epoch (by validation accuracy) is written to models/ under the
+tier's weights filename, so PestDetectionModel picks it up unchanged; a
+resumable checkpoint (optimizer and scheduler state) is kept next to it.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Dataset
+
+from .model import PestDetector
+from .runtime import configure_torch
+from .tiers import BACKBONES, resolve_tier, weights_filename
+from .treatment import CLASSES
+from .utils import load_image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+def scan_images(data_dir):
+    """
+    List labelled images under `data_dir`.
+
+    Returns:
+        list: (relative path, class index, size in bytes, mtime in ns) sorted by path
+
+    Raises:
+        ValueError: if a class folder isn't one of CLASSES or no images are found
+    """
+    entries = []
+    for name in sorted(os.listdir(data_dir)):
+        class_dir = os.path.join(data_dir, name)
+        if name.startswith('.') or not os.path.isdir(class_dir):
+            continue
+        if name not in CLASSES:
+            raise ValueError(f"Unknown class folder '{name}'. Expected: {', '.join(CLASSES)}")
+        for root, _, files in os.walk(class_dir):
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    stat = os.stat(path)
+                    entries.append((os.path.relpath(path, data_dir), CLASSES.index(name), stat.st_size, stat.st_mtime_ns))
+    if not entries:
+        raise ValueError(f"No images found under {data_dir}")
+    entries.sort()
+    return entries
+
+def build_cache(data_dir, cache_dir, input_size=(224, 224), workers=4):
+    """
+    Decode every image once into a memory-mapped (N, height, width, 3) uint8 array.
+
+    Reuses an existing cache whose manifest matches the current files.
+
+    Returns:
+        tuple: (path of the images .npy file, labels array)
+    """
+    entries = scan_images(data_dir)
+    width, height = input_size
+    manifest = {"input_size": [width, height], "files": [list(entry) for entry in entries]}
+    images_path = os.path.join(cache_dir, 'images.npy')
+    labels_path = os.path.join(cache_dir, 'labels.npy')
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+
+    try:
+        with open(manifest_path) as f:
+            current = json.load(f) == manifest
+    except (OSError, ValueError):
+        current = False
+
+    if not current:
+        os.makedirs(cache_dir, exist_ok=True)
+        logger.info("Decoding %d images into %s", len(entries), cache_dir)
+        start = time.perf_counter()
+        tmp_path = images_path + '.tmp'
+        images = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                           shape=(len(entries), height, width, 3))
+
+        def decode(i):
+            image, _ = load_image(os.path.join(data_dir, entries[i][0]), input_size)
+            images[i] = np.asarray(image, dtype=np.uint8)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(decode, range(len(entries))))
+        images.flush()
+        del images
+        os.replace(tmp_path, images_path)
+        np.save(labels_path, np.array([entry[1] for entry in entries], dtype=np.int64))
+        # The manifest goes last: a cache without one is never trusted
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        logger.info("Cache built in %.1fs", time.perf_counter() - start)
+
+    return images_path, np.load(labels_path)
+
+class CachedImageDataset(Dataset):
+    """
+    Images from the memmap cache as uint8 CHW tensors, with random flips and
+    shifted crops when `augment` is set. Normalization happens per batch.
+    Each DataLoader worker maps the cache file itself instead of receiving a
+    pickled copy of the array.
+    """
+
+    def __init__(self, images_path, labels, indices, augment=False, pad=16):
+        self.images_path = images_path
+        self._images = None
+        self.labels = labels
+        self.indices = np.asarray(indices)
+        self.augment = augment
+        self.pad = pad
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if self._images is None:
+            self._images = np.load(self.images_path, mmap_mode='r')
+        index = self.indices[i]
+        pixels = np.asarray(self._images[index])
+        if self.augment:
+            rng = np.random.default_rng()
+            if rng.random() < 0.5:
+                pixels = pixels[:, ::-1]
+            if rng.random() < 0.5:
+                pixels = pixels[::-1]
+            if self.pad:
+                height, width = pixels.shape[:2]
+                padded = np.pad(pixels, ((self.pad, self.pad), (self.pad, self.pad), (0, 0)), mode='reflect')
+                top, left = rng.integers(0, 2 * self.pad + 1, size=2)
+                pixels = padded[top:top + height, left:left + width]
+        # Copy out of the read-only map (and any flipped view) into a writable array
+        tensor = torch.from_numpy(np.array(pixels, order='C')).permute(2, 0, 1)
+        return tensor, int(self.labels[index])
+
+def split_indices(labels, val_fraction, seed=0):
+    """Per-class random train/validation split (at least one validation image per class with 2+ images)."""
+    rng = np.random.default_rng(seed)
+    train, val = [], []
+    for label in np.unique(labels):
+        indices = rng.permutation(np.flatnonzero(labels == label))
+        n_val = int(round(len(indices) * val_fraction))
+        if val_fraction > 0 and len(indices) > 1:
+            n_val = max(1, n_val)
+        val.extend(indices[:n_val])
+        train.extend(indices[n_val:])
+    return np.sort(train), np.sort(val)
+
+def normalize(batch, device, memory_format):
+    """uint8 NCHW batch -> normalized float batch on `device`."""
+    mean = torch.tensor(MEAN, device=device).view(1, 3, 1, 1)
+    std = torch.tensor(STD, device=device).view(1, 3, 1, 1)
+    batch = batch.to(device, non_blocking=True).float().div_(255)
+    return ((batch - mean) / std).contiguous(memory_format=memory_format)
+
+def save_atomic(obj, path):
+    """torch.save to a temporary file, then rename over `path`."""
+    tmp_path = path + '.tmp'
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def evaluate(model, loader, device, memory_format, autocast):
+    """Validation loss and accuracy."""
+    model.eval()
+    criterion = nn.CrossEntropyLoss(reduction='sum')
+    total_loss, correct, count = 0.0, 0, 0
+    with torch.inference_mode():
+        for batch, labels in loader:
+            labels = labels.to(device)
+            with autocast():
+                outputs = model(normalize(batch, device, memory_format))
+                total_loss += criterion(outputs.float(), labels).item()
+            correct += (outputs.argmax(1) == labels).sum().item()
+            count += len(labels)
+    return total_loss / max(1, count), correct / max(1, count)
+
+def train(data_dir, tier=None, output=None, cache_dir=None, epochs=10, batch_size=32, lr=1e-3,
+          weight_decay=1e-4, val_fraction=0.15, workers=4, amp=False, channels_last=False,
+          pretrained=False, freeze_backbone=False, resume=False, seed=0):
+    """
+    Train a PestDetector for `tier` and write its best weights to `output`.
+
+    Returns:
+        dict: best validation accuracy, its epoch and the weights path
+    """
+    tier = resolve_tier(tier)
+    backbone = BACKBONES[tier]
+    models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+    output = output or os.path.join(models_dir, weights_filename(tier))
+    checkpoint_path = output + '.ckpt'
+    cache_dir = cache_dir or os.path.join(data_dir, '.cache')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    torch.manual_seed(seed)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+
+    images_path, labels = build_cache(data_dir, cache_dir, workers=workers)
+    train_idx, val_idx = split_indices(labels, val_fraction, seed=seed)
+    logger.info("%d training / %d validation images, %d classes", len(train_idx), len(val_idx), len(CLASSES))
+
+    loader_args = dict(batch_size=batch_size, num_workers=workers, pin_memory=device.type == 'cuda',
+                       persistent_workers=workers > 0)
+    train_loader = DataLoader(CachedImageDataset(images_path, labels, train_idx, augment=True),
+                              shuffle=True, drop_last=len(train_idx) > batch_size, **loader_args)
+    val_loader = DataLoader(CachedImageDataset(images_path, labels, val_idx), **loader_args) if len(val_idx) else None
+
+    model = PestDetector(num_classes=len(CLASSES), pretrained=pretrained, backbone=backbone)
+    if freeze_backbone:
+        for param in model.parameters():
+            param.requires_grad = False
+        for param in getattr(model.model, model.head_attr).parameters():
+            param.requires_grad = True
+    model = model.to(device, memory_format=memory_format)
+
+    optimizer = torch.optim.AdamW([p for p in model.parameters() if p.requires_grad], lr=lr, weight_decay=weight_decay)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(optimizer, max_lr=lr, epochs=epochs,
+                                                    steps_per_epoch=max(1, len(train_loader)))
+    # bfloat16 autocast on CPU needs no loss scaling; float16 on CUDA does
+    amp_dtype = torch.float16 if device.type == 'cuda' else torch.bfloat16
+    scaler = torch.amp.GradScaler(device.type, enabled=amp and amp_dtype == torch.float16)
+
+    def autocast():
+        return torch.autocast(device.type, dtype=amp_dtype, enabled=amp)
+
+    start_epoch, best = 0, {"accuracy": -1.0, "epoch": None}
+    if resume and os.path.exists(checkpoint_path):
+        checkpoint = torch.load(checkpoint_path, map_location=device)
+        if checkpoint['epochs'] != epochs:
+            # The one-cycle schedule is laid out for the original run length
+            raise ValueError(f"Checkpoint was started with --epochs {checkpoint['epochs']}; resume with the same value")
+        model.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        scheduler.load_state_dict(checkpoint['scheduler'])
+        scaler.load_state_dict(checkpoint['scaler'])
+        start_epoch, best = checkpoint['epoch'] + 1, checkpoint['best']
+        logger.info("Resumed from %s at epoch %d", checkpoint_path, start_epoch + 1)
+
+    criterion = nn.CrossEntropyLoss(label_smoothing=0.1)
+    for epoch in range(start_epoch, epochs):
+        model.train()
+        if freeze_backbone:
+            # Keep BatchNorm statistics of the frozen backbone fixed
+            for module in model.modules():
+                if isinstance(module, nn.modules.batchnorm._BatchNorm):
+                    module.eval()
+        start = time.perf_counter()
+        total_loss, count = 0.0, 0
+        for batch, targets in train_loader:
+            targets = targets.to(device, non_blocking=True)
+            with autocast():
+                loss = criterion(model(normalize(batch, device, memory_format)).float(), targets)
+            optimizer.zero_grad(set_to_none=True)
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
+            scheduler.step()
+            total_loss += loss.item() * len(targets)
+            count += len(targets)
+
+        elapsed = time.perf_counter() - start
+        if val_loader is not None:
+            val_loss, accuracy = evaluate(model, val_loader, device, memory_format, autocast)
+        else:
+            val_loss, accuracy = float('nan'), 0.0
+        logger.info("epoch %d/%d: train loss %.4f, val loss %.4f, val accuracy %.3f (%.0f images/s)",
+                    epoch + 1, epochs, total_loss / max(1, count), val_loss, accuracy, count / elapsed)
+
+        if accuracy > best["accuracy"]:
+            best = {"accuracy": accuracy, "epoch": epoch + 1}
+            # Plain float32 state dict in contiguous format: what PestDetectionModel loads
+            state_dict = {key: value.detach().to('cpu').contiguous() for key, value in model.state_dict().items()}
+            save_atomic(state_dict, output)
+            logger.info("Saved best weights to %s", output)
+        save_atomic({
+            'model': model.state_dict(),
+            'optimizer': optimizer.state_dict(),
+            'scheduler': scheduler.state_dict(),
+            'scaler': scaler.state_dict(),
+            'epoch': epoch,
+            'epochs': epochs,
+            'best': best,
+            'tier': tier
+        }, checkpoint_path)
+
+    return {"accuracy": best["accuracy"], "epoch": best["epoch"], "weights": output}
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the pest detection model")
+    parser.add_argument('--data-dir', required=True, help="Folder with one sub-folder of images per class")
+    parser.add_argument('--tier', default=None, help="Model tier: fast, balanced or accurate (default PEST_MODEL_TIER)")
+    parser.add_argument('--output', default=None, help="Weights path (default: models/ file for the tier)")
+    parser.add_argument('--cache-dir', default=None, help="Decoded image cache (default: <data-dir>/.cache)")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--lr', type=float, default=1e-3, help="Peak learning rate (one-cycle schedule)")
+    parser.add_argument('--weight-decay', type=float, default=1e-4)
+    parser.add_argument('--val-fraction', type=float, default=0.15)
+    parser.add_argument('--workers', type=int, default=4, help="DataLoader and cache-decode workers")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads (default: all cores)")
+    parser.add_argument('--amp', action='store_true', help="Mixed precision (bfloat16 on CPU, float16 on CUDA)")
+    parser.add_argument('--channels-last', action='store_true', help="Train in channels-last memory format")
+    parser.add_argument('--pretrained', action='store_true', help="Start from ImageNet weights (downloads once)")
+    parser.add_argument('--freeze-backbone', action='store_true', help="Only train the classifier head")
+    parser.add_argument('--resume', action='store_true', help="Continue an interrupted run from the checkpoint next to --output")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    configure_torch(args.threads, workers=1)
+    result = train(args.data_dir, tier=args.tier, output=args.output, cache_dir=args.cache_dir,
+                   epochs=args.epochs, batch_size=args.batch_size, lr=args.lr, weight_decay=args.weight_decay,
+                   val_fraction=args.val_fraction, workers=args.workers, amp=args.amp,
+                   channels_last=args.channels_last, pretrained=args.pretrained,
+                   freeze_backbone=args.freeze_backbone, resume=args.resume, seed=args.seed)
+    logger.info("Best validation accuracy %.3f at epoch %s; weights in %s",
+                result["accuracy"], result["epoch"], result["weights"])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# Classes predicted by the pest detection model, in output order
+CLASSES = ['healthy', 'diseased', 'pest_infested', 'nutrient_deficiency']
+
+# Detailed treatment information for each condition with specific recommendations
+TREATMENT_INFO = {
+    'healthy': {
+        'description': 'Your plant appears to be in good health!',
+        'recommendations': [
+            'Continue with regular watering schedule (check soil moisture before watering)',
+            'Ensure 6-8 hours of sunlight daily',
+            'Rotate the plant periodically for even growth',
+            'Wipe leaves with a damp cloth monthly to remove dust',
+            'Inspect weekly for early signs of pests or disease'
+        ],
+        'care_tips': [
+            'Use room temperature water to avoid shocking the roots',
+            'Fertilize monthly during growing season with balanced fertilizer',
+            'Prune dead or yellowing leaves to encourage new growth',
+            'Check for proper drainage to prevent root rot'
+        ]
+    },
+    'diseased': {
+        'description': 'Your plant shows signs of disease.',
+        'immediate_actions': [
+            '🚫 Isolate the plant immediately to prevent spreading',
+            '✂️ Prune affected leaves with sterilized shears',
+            '🧴 Apply appropriate fungicide (copper-based for fungal, bactericide for bacterial)',
+            '💧 Water at soil level, avoid wetting leaves'
+        ],
+        'treatment_plan': [
+            '1. Remove and destroy all infected plant material',
+            '2. Apply recommended treatment every 7-10 days',
+            '3. Improve air circulation around the plant',
+            '4. Disinfect tools after use to prevent spread'
+        ],
+        'prevention': [
+            'Water in the morning to allow leaves to dry',
+            'Space plants properly for good air flow',
+            'Use mulch to prevent soil-borne diseases',
+            'Choose disease-resistant plant varieties'
+        ]
+    },
+    'pest_infested': {
+        'description': 'Pest infestation detected on your plant.',
+        'organic_solutions': [
+            '🐞 Release beneficial insects (ladybugs, lacewings)',
+            '🌿 Apply neem oil solution (2 tbsp neem oil + 1 tsp dish soap + 1 gallon water)',
+            '🧼 Use insecticidal soap spray for soft-bodied insects',
+            '🧄 Make garlic or chili pepper spray as a natural deterrent'
+        ],
+        'treatment_steps': [
+            '1. Isolate the affected plant',
+            '2. Remove visible pests with a strong water spray',
+            '3. Apply chosen treatment thoroughly (undersides of leaves too!)',
+            '4. Repeat every 5-7 days for 2-3 weeks',
+            '5. Monitor for new infestations'
+        ],
+        'prevention': [
+            'Inspect new plants before bringing them home',
+            'Keep the growing area clean and free of debris',
+            'Use yellow sticky traps for early detection',
+            'Encourage natural predators in your garden'
+        ]
+    },
+    'nutrient_deficiency': {
+        'description': 'Your plant shows signs of nutrient deficiency.',
+        'common_deficiencies': {
+            'nitrogen': {
+                'symptoms': ['Yellowing of older leaves', 'Stunted growth', 'Smaller than normal leaves'],
+                'solutions': ['Apply balanced fertilizer (10-10-10)', 'Add compost or manure', 'Use fish emulsion']
+            },
+            'phosphorus': {
+                'symptoms': ['Dark green or purple leaves', 'Poor root development', 'Delayed maturity'],
+                'solutions': ['Apply bone meal', 'Use rock phosphate', 'Add composted manure']
+            },
+            'potassium': {
+                'symptoms': ['Brown leaf edges', 'Weak stems', 'Poor fruit development'],
+                'solutions': ['Apply potash', 'Use wood ash', 'Add banana peels to compost']
+            },
+            'magnesium': {
+                'symptoms': ['Yellowing between leaf veins', 'Leaf curling', 'Poor growth'],
+                'solutions': ['Apply Epsom salt (1 tbsp/gallon water)', 'Use dolomitic lime', 'Add compost']
+            }
+        },
+        'general_advice': [
+            'Conduct a soil test to confirm deficiencies',
+            'Maintain proper soil pH (6.0-7.0 for most plants)',
+            'Use organic matter to improve nutrient availability',
+            'Water consistently to prevent nutrient lockout'
+        ]
+    }
+}
+
+def build_result(predicted_class, confidence):
+    """Assemble the prediction dict (treatment info and legacy 'advice') for a class."""
+    # Get detailed treatment information based on the predicted class
+    treatment_info = TREATMENT_INFO.get(predicted_class, {})
+    
+    # Prepare the response with detailed treatment information
+    result = {
+        'status': 'success',
+        'prediction': {
+            'class': predicted_class,
+            'confidence': round(confidence, 4),
+            'description': treatment_info.get('description', ''),
+            'recommendations': treatment_info.get('recommendations', []),
+            'care_tips': treatment_info.get('care_tips', []),
+            'immediate_actions': treatment_info.get('immediate_actions', []),
+            'treatment_plan': treatment_info.get('treatment_plan', []),
+            'organic_solutions': treatment_info.get('organic_solutions', []),
+            'treatment_steps': treatment_info.get('treatment_steps', []),
+            'prevention': treatment_info.get('prevention', []),
+            'common_deficiencies': treatment_info.get('common_deficiencies', {}) if predicted_class == 'nutrient_deficiency' else None,
+            'general_advice': treatment_info.get('general_advice', [])
+        }
+    }
+    
+    # Add legacy 'advice' field for backward compatibility
+    if predicted_class == 'healthy':
+        result['prediction']['advice'] = treatment_info['description']
+    elif predicted_class == 'diseased':
+        result['prediction']['advice'] = treatment_info['description'] + ' ' + ' '.join(treatment_info.get('immediate_actions', []))
+    elif predicted_class == 'pest_infested':
+        result['prediction']['advice'] = treatment_info['description'] + ' ' + ' '.join(treatment_info.get('organic_solutions', []))
+    elif predicted_class == 'nutrient_deficiency':
+        result['prediction']['advice'] = treatment_info['description'] + ' Consider a soil test to identify specific deficiencies.'
+    
+    return result
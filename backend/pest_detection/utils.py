@@ -1,6 +1,79 @@
-from PIL import Image, ImageOps
+from PIL import Image
 import numpy as np
 
+def _cover_box(size, target_size):
+    """Centered crop box of `size` that has the aspect ratio of `target_size`."""
+    w, h = size
+    tw, th = target_size
+    if w * th > h * tw:
+        crop_w, crop_h = h * tw / th, h
+    else:
+        crop_w, crop_h = w, w * th / tw
+    left = (w - crop_w) / 2
+    top = (h - crop_h) / 2
+    return (left, top, left + crop_w, top + crop_h)
+
+def fit_image(image, target_size=(224, 224)):
+    """
+    Center-crop and resize an image to exactly `target_size` in one resampling pass.
+    
+    Args:
+        image: PIL Image
+        target_size: Target size (width, height)
+        
+    Returns:
+        PIL Image: RGB image of size `target_size`
+    """
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if image.size != tuple(target_size):
+        # reducing_gap lets PIL shrink by an integer factor first (cheap box
+        # reduce) so the LANCZOS filter only runs over a near-target image
+        image = image.resize(target_size, Image.Resampling.LANCZOS,
+                             box=_cover_box(image.size, target_size), reducing_gap=2.0)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+def decode_image(source, target_size=(224, 224)):
+    """
+    Decode an uploaded image no larger than needed to produce `target_size`.
+    
+    JPEGs are decoded in draft mode, so libjpeg scales by 1/2, 1/4 or 1/8
+    during decode and a 12 MP photo never materialises at full size.
+    
+    Args:
+        source: File path or file-like object
+        target_size: Size (width, height) the image will be fitted to
+        
+    Returns:
+        tuple: (image: decoded PIL Image, original_size: (width, height))
+    """
+    image = Image.open(source)
+    original_size = image.size
+    
+    # Smallest decode size whose center crop still covers target_size
+    scale = max(target_size[0] / original_size[0], target_size[1] / original_size[1])
+    if scale < 1:
+        image.draft('RGB', (int(original_size[0] * scale) + 1, int(original_size[1] * scale) + 1))
+    image.load()
+    
+    return image, original_size
+
+def load_image(source, target_size=(224, 224)):
+    """
+    Decode an uploaded image straight to a model-sized RGB image.
+    
+    Args:
+        source: File path or file-like object
+        target_size: Target size (width, height)
+        
+    Returns:
+        tuple: (image: PIL Image of size `target_size`, original_size: (width, height))
+    """
+    image, original_size = decode_image(source, target_size)
+    return fit_image(image, target_size), original_size
+
 def preprocess_image(image, target_size=(224, 224)):
     """
     Preprocess the image for model inference.
@@ -14,20 +87,64 @@ def preprocess_image(image, target_size=(224, 224)):
     """
     try:
         if not isinstance(image, Image.Image):
-            image = Image.open(image).convert('RGB')
-            
-        # Resize and maintain aspect ratio
-        image = ImageOps.fit(image, target_size, Image.Resampling.LANCZOS)
-        
-        # Enhance image quality
-        image = image.convert('RGB')
+            return load_image(image, target_size)[0]
         
-        return image
+        return fit_image(image, target_size)
         
     except Exception as e:
         raise ValueError(f"Error preprocessing image: {str(e)}")
 
-def is_leaf_image(image, green_threshold=0.15, edge_threshold=0.01):
+# Longest side of the sample grid the leaf gate works on
+LEAF_GATE_SIZE = 64
+
+def _leaf_gate_features(image):
+    """
+    Green ratio, leaf colour ratio and edge density of an RGB image, estimated
+    from a LEAF_GATE_SIZE grid of sampled pixels with integer arithmetic only.
+    
+    Pixels are sampled (not averaged), so the colour ratios are unbiased
+    estimates of the full-image ratios. Edge density uses central differences
+    against each sample's real neighbours, matching np.gradient on the full
+    image. The HSV hue/saturation tests are cross-multiplied so no division or
+    colour-space conversion is needed.
+    """
+    w, h = image.size
+    grid = (max(1, min(w - 2, round(w * LEAF_GATE_SIZE / max(w, h)))),
+            max(1, min(h - 2, round(h * LEAF_GATE_SIZE / max(w, h)))))
+    
+    def sample(dx, dy):
+        box = (1 + dx, 1 + dy, w - 1 + dx, h - 1 + dy)
+        return np.asarray(image.resize(grid, Image.Resampling.NEAREST, box=box), dtype=np.int32)
+    
+    rgb = sample(0, 0)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    
+    # Green dominance: g > 1.1 * r and g > 1.1 * b
+    green = (10 * g > 11 * r) & (10 * g > 11 * b) & (g > 20)
+    
+    # PIL's HSV bytes are v = max, s = floor(255 * delta / v) and
+    # h = floor(42.5 * x / delta), x being the sextant-offset hue numerator,
+    # so "s > 40" is 255 * delta >= 41 * v and "h > t" is 85 * x >= 2 * (t + 1) * delta
+    v = np.maximum(np.maximum(r, g), b)
+    delta = v - np.minimum(np.minimum(r, g), b)
+    x = np.where(v == r, g - b, np.where(v == g, 2 * delta + b - r, 4 * delta + r - g))
+    x85 = 85 * np.where(x < 0, x + 6 * delta, x)
+    saturated = 255 * delta >= 41 * v
+    hue_green = (x85 >= 62 * delta) & (x85 < 180 * delta) & (v > 30)
+    hue_yellow = (x85 >= 32 * delta) & (x85 < 60 * delta) & (v > 50)
+    hue_brown = (x85 >= 22 * delta) & (x85 < 50 * delta) & (v < 70) & (v > 20)
+    leaf_colour = (saturated & hue_green).sum() + (saturated & hue_yellow).sum() + (saturated & hue_brown).sum()
+    
+    # Central differences of ITU-R 601 luma, as np.gradient computes them
+    weights = np.array([299, 587, 114], dtype=np.int32)
+    gx = (sample(1, 0) - sample(-1, 0)) @ weights
+    gy = (sample(0, 1) - sample(0, -1)) @ weights
+    edge_sum = int(np.abs(gx).sum() + np.abs(gy).sum())
+    
+    n = green.size
+    return green.sum() / n, leaf_colour / n, edge_sum / (2 * 1000 * 255 * n)
+
+def is_leaf_image(image, green_threshold=0.15, edge_threshold=0.01, original_size=None):
     """
     Enhanced check if the image contains a plant leaf.
     
@@ -35,6 +152,7 @@ def is_leaf_image(image, green_threshold=0.15, edge_threshold=0.01):
         image: PIL Image
         green_threshold: Minimum percentage of green pixels required
         edge_threshold: Minimum edge density required for leaf-like texture
+        original_size: Size of the upload before downscaling, used for the minimum size check
         
     Returns:
         tuple: (is_leaf: bool, message: str)
@@ -51,35 +169,14 @@ def is_leaf_image(image, green_threshold=0.15, edge_threshold=0.01):
                 return False, "Unsupported image format"
         
         # Check image size
-        if min(image.size) < 50:  # Too small to be a proper leaf image
+        if min(original_size or image.size) < 50:  # Too small to be a proper leaf image
             return False, "Image is too small. Please upload a clearer image."
         
-        # Convert to numpy array
-        img_array = np.array(image)
-        if img_array.size == 0:
+        if image.size[0] == 0 or image.size[1] == 0:
             return False, "Empty image"
         
-        # Calculate color distribution
-        r, g, b = img_array[..., 0], img_array[..., 1], img_array[..., 2]
-        
-        # Check for green dominance
-        green_pixels = (g > r * 1.1) & (g > b * 1.1) & (g > 20)
-        green_ratio = np.mean(green_pixels)
-        
-        # Check for typical leaf colors (green, yellow, brown)
-        hsv_img = np.array(image.convert('HSV'))
-        h, s, v = hsv_img[..., 0], hsv_img[..., 1], hsv_img[..., 2]
-        
-        # Hue ranges for green (30-90), yellow (15-30), brown (10-25 with low value)
-        is_green = ((h > 30) & (h < 90) & (s > 40) & (v > 30)).mean()
-        is_yellow = ((h > 15) & (h < 30) & (s > 40) & (v > 50)).mean()
-        is_brown = ((h > 10) & (h < 25) & (s > 40) & (v < 70) & (v > 20)).mean()
-        
-        leaf_color_ratio = is_green + is_yellow + is_brown
-        
-        # Simple edge detection for texture
-        gray = np.array(image.convert('L'))
-        edges = np.abs(np.gradient(gray.astype(float))).sum() / (255 * gray.size)
+        # Colour distribution (green dominance, green/yellow/brown hues) and texture
+        green_ratio, leaf_color_ratio, edges = _leaf_gate_features(image)
         
         # Decision logic
         is_leaf = (green_ratio > green_threshold or leaf_color_ratio > 0.2) and edges > edge_threshold
@@ -0,0 +1,387 @@
+"""
+Production server for the API: gunicorn with the app preloaded in the master.
+
+The master imports the app and loads what the served blueprints use (their
+datasets, chat index, fertilizer model and pest detector weights) once,
+then forks the workers. They share those pages copy-on-write instead of
+each reading and unpickling its own copy, and start serving right away.
+Anything that can't cross a fork is started in each worker: torch's
+thread pools, the pest warm-up thread, the feedback writer.
+
+Workers default to one per core (WEB_CONCURRENCY); the CPU-bound routes
+(pest detection, model suggestions) can't use more than one core per
+process. Each worker runs SERVE_THREADS threads (default: two per core it
+owns, at least 2) for requests that mostly wait (upstream calls, streamed
+responses); torch gets cores // workers threads (pest_detection/runtime.py).
+
+`reload` swaps the whole server without dropping a connection. The running
+master re-executes itself (SIGUSR2), so the new master loads the new code
+and models and forks its workers on the same sockets while the old ones
+keep serving. Once they are all up, the old master is stopped gracefully
+(SIGTERM: in-flight requests finish within --graceful-timeout). If the new
+master fails to start, the old one keeps running. `bench` starts the
+server in both modes and reports memory per worker and requests/s.
+
+`run --asgi` serves asgi.py instead: the endpoints that wait on upstream
+services, on one asyncio event loop per worker (uvicorn workers), with the
+same reload. From backend/:
+
+    python serve.py run                      # 0.0.0.0:5000
+    python serve.py run --no-preload         # every worker loads its own copy
+    python serve.py run --asgi --bind 0.0.0.0:5001
+    python serve.py reload
+    python serve.py bench --workers 4 --duration 20
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PIDFILE = os.getenv("SERVE_PIDFILE") or os.path.join(tempfile.gettempdir(), 'fertilizer-api.pid')
+
+def available_cores():
+    """CPUs this process may run on (respects container and taskset limits where supported)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def default_workers():
+    return int(os.getenv("WEB_CONCURRENCY", "0")) or available_cores()
+
+def default_threads(workers):
+    return int(os.getenv("SERVE_THREADS", "0")) or max(2, 2 * available_cores() // workers)
+
+def load_app(before_fork):
+    """
+    Import the app and load everything its blueprints use up front.
+
+    Runs in the master with `before_fork`, else in each worker.
+    """
+    if before_fork:
+        # No threads in the master: they would not exist in the forked workers
+        import api.pest
+        api.pest.WARMUP_ON_REGISTER = False
+    from app import app
+
+    started = time.perf_counter()
+    if before_fork and 'pest' in app.blueprints and 'PEST_MODEL_SOCKET' not in os.environ:
+        # Load torch single-threaded so no thread pool is running at fork time
+        from pest_detection.runtime import configure_torch
+        configure_torch(threads=1)
+    # Each blueprint loads only what it uses (e.g. no pandas in a pest-only deployment)
+    for blueprint in app.blueprints.values():
+        preload = getattr(sys.modules[blueprint.import_name], 'preload', None)
+        if preload is not None:
+            preload()
+    logger.info("Loaded %s in %.1fs%s", ', '.join(app.blueprints), time.perf_counter() - started,
+                " (before forking workers)" if before_fork else "")
+    return app
+
+def load_asgi_app():
+    """Import asgi.py and read the dataset it uses."""
+    from asgi import app
+    from api.data import get_dataset
+
+    get_dataset('soil')
+    return app
+
+def application(preload, options, asgi=False):
+    """The gunicorn application (gunicorn is only imported by `run`)."""
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+            self.cfg.set('preload_app', preload)
+            self.cfg.set('post_fork', self.post_fork)
+
+        def load(self):
+            self.app = load_asgi_app() if asgi else load_app(before_fork=preload)
+            return self.app
+
+        def post_fork(self, server, worker):
+            if not preload:
+                return  # the worker loads the app itself, after this
+            if 'pest_detection.runtime' in sys.modules:
+                from pest_detection.runtime import configure_torch_after_fork
+                configure_torch_after_fork()
+            if 'pest' in getattr(self.app, 'blueprints', {}) and os.getenv("PEST_WARMUP", "1") != "0":
+                from api.pest import start_pest_warmup
+                start_pest_warmup()
+
+    return Server()
+
+def child_pids(pid):
+    """Direct children of `pid` (Linux /proc)."""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields after it are fixed
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+def memory(pid):
+    """{"rss", "pss", "uss"} in bytes for `pid` (PSS splits shared pages between the processes mapping them)."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].endswith(':'):
+                values[parts[0][:-1]] = int(parts[1]) * 1024
+    return {
+        "rss": values.get('Rss', 0),
+        "pss": values.get('Pss', 0),
+        "uss": values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+def read_pid(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0) or None
+    except (OSError, ValueError):
+        return None
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+def reload(pidfile, timeout=120.0, settle=2.0):
+    """
+    Rolling reload of the server whose master pid is in `pidfile`.
+
+    Returns:
+        int: pid of the new master
+    """
+    old = read_pid(pidfile)
+    if old is None or not alive(old):
+        raise RuntimeError(f"No running server in {pidfile}")
+    workers = len(child_pids(old))
+    os.kill(old, signal.SIGUSR2)
+    # gunicorn writes the new master's pid to <pidfile>.2 until the old master exits
+    deadline = time.monotonic() + timeout
+    new = None
+    while time.monotonic() < deadline:
+        new = read_pid(pidfile + '.2')
+        if new and len(child_pids(new)) >= workers:
+            break
+        if new and not alive(new):
+            raise RuntimeError("New master exited; the old server is still running")
+        time.sleep(0.2)
+    else:
+        raise RuntimeError("New workers did not start in time; the old server is still running")
+    time.sleep(settle)
+    os.kill(old, signal.SIGTERM)
+    while alive(old) and time.monotonic() < deadline:
+        time.sleep(0.2)
+    return new
+
+def request(connection, method, path, body, headers):
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+def multipart_image():
+    """(body, content type) of a multipart upload with one generated leaf photo in 'image'."""
+    from api.startup import leaf_image
+    boundary = 'serve-bench-boundary'
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="leaf.png"\r\n'
+            f'Content-Type: image/png\r\n\r\n').encode() + leaf_image().read() + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+def bench_calls(mix):
+    """(method, path, body, headers) per request kind in `mix`."""
+    from api.startup import FIRST_REQUESTS
+    blueprints = {'recommend': 'recommendation', 'soils': 'soils', 'market': 'market', 'chat': 'chat', 'pest': 'pest'}
+    calls = []
+    for kind in mix:
+        method, path, body = FIRST_REQUESTS[blueprints[kind]]
+        if body == 'image':
+            body, content_type = multipart_image()
+        else:
+            body, content_type = json.dumps(body).encode() if body is not None else None, 'application/json'
+        calls.append((method, path, body, {'Content-Type': content_type}))
+    return calls
+
+def load_test(port, calls, concurrency, duration):
+    """Keep-alive clients cycling through `calls` for `duration` seconds."""
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+    latencies = [[] for _ in range(concurrency)]
+    deadline = time.monotonic() + duration
+
+    def client(i):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        n = i
+        while time.monotonic() < deadline:
+            method, path, body, headers = calls[n % len(calls)]
+            n += 1
+            started = time.perf_counter()
+            try:
+                status = request(connection, method, path, body, headers)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                status = None
+            latencies[i].append(time.perf_counter() - started)
+            if status == 200:
+                counts[i] += 1
+            else:
+                errors[i] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    ordered = sorted(t for per_client in latencies for t in per_client)
+    return {
+        "rps": sum(counts) / elapsed,
+        "errors": sum(errors),
+        "p50_ms": ordered[len(ordered) // 2] * 1000 if ordered else None,
+        "p99_ms": ordered[int(len(ordered) * 0.99)] * 1000 if ordered else None
+    }
+
+def wait_ready(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            if request(connection, 'GET', '/api/ready', None, {}) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server on port {port} not ready after {timeout}s")
+
+def bench_mode(preload, args, calls):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    pidfile = os.path.join(tempfile.mkdtemp(), 'bench.pid')
+    command = [sys.executable, os.path.abspath(__file__), 'run', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.workers), '--threads', str(args.threads), '--pid', pidfile]
+    if not preload:
+        command.append('--no-preload')
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=dict(os.environ, LOG_LEVEL='WARNING'))
+    try:
+        wait_ready(port, args.timeout)
+        ready_seconds = time.perf_counter() - started
+        # Every worker has served a few of each request (and loaded what they use)
+        load_test(port, calls, max(args.concurrency, args.workers * 2), 3)
+        result = load_test(port, calls, args.concurrency, args.duration)
+        master = read_pid(pidfile)
+        workers = [memory(pid) for pid in child_pids(master)]
+        result.update(ready_seconds=ready_seconds, master=memory(master), workers=workers)
+        return result
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+def bench(args):
+    mix = [kind.strip() for kind in args.mix.split(',') if kind.strip()]
+    calls = bench_calls(mix)
+    mib = 1024 * 1024
+    print(f"{args.workers} workers x {args.threads} threads, {args.concurrency} clients, "
+          f"{args.duration:.0f}s of {', '.join(mix)}")
+    for preload in (True, False):
+        result = bench_mode(preload, args, calls)
+        workers = result['workers']
+        total_pss = result['master']['pss'] + sum(w['pss'] for w in workers)
+        print(f"\n{'preload' if preload else 'no preload'}: ready in {result['ready_seconds']:.1f}s, "
+              f"{result['rps']:.1f} requests/s (p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+              f"{result['errors']} errors)")
+        print(f"  master    RSS {result['master']['rss'] / mib:7.1f} MiB  PSS {result['master']['pss'] / mib:7.1f} MiB")
+        for i, worker in enumerate(workers):
+            print(f"  worker {i}  RSS {worker['rss'] / mib:7.1f} MiB  PSS {worker['pss'] / mib:7.1f} MiB  "
+                  f"private {worker['uss'] / mib:7.1f} MiB")
+        print(f"  total PSS {total_pss / mib:.1f} MiB (memory actually used by the server)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with gunicorn (preloaded, forked workers)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run')
+    run.add_argument('--bind', default=os.getenv("SERVE_BIND", "0.0.0.0:5000"))
+    run.add_argument('--workers', type=int, default=None, help="Default: WEB_CONCURRENCY or one per core")
+    run.add_argument('--threads', type=int, default=None, help="Per worker; default: SERVE_THREADS or 2 per core share")
+    run.add_argument('--no-preload', action='store_true', help="Load the app in every worker instead of the master")
+    run.add_argument('--asgi', action='store_true',
+                     help="Serve asgi.py (advisory, weather alerts, translate, tts) on asyncio workers")
+    run.add_argument('--pid', default=DEFAULT_PIDFILE)
+    run.add_argument('--timeout', type=int, default=120, help="Seconds before a silent worker is restarted")
+    run.add_argument('--graceful-timeout', type=int, default=30)
+    run.add_argument('--max-requests', type=int, default=0,
+                     help="Recycle a worker after this many requests (staggered by 10%% jitter); 0: never")
+    reload_cmd = sub.add_parser('reload')
+    reload_cmd.add_argument('--pid', default=DEFAULT_PIDFILE)
+    reload_cmd.add_argument('--timeout', type=float, default=120.0)
+    bench_cmd = sub.add_parser('bench')
+    bench_cmd.add_argument('--workers', type=int, default=None)
+    bench_cmd.add_argument('--threads', type=int, default=None)
+    bench_cmd.add_argument('--concurrency', type=int, default=16, help="Keep-alive client threads")
+    bench_cmd.add_argument('--duration', type=float, default=10.0)
+    bench_cmd.add_argument('--mix', default='recommend,soils,market,chat',
+                           help="Requests to cycle through: recommend, soils, market, chat, pest")
+    bench_cmd.add_argument('--timeout', type=float, default=180.0, help="Seconds to wait for readiness")
+    args = parser.parse_args()
+    if args.command in ('run', 'bench'):
+        args.workers = args.workers or default_workers()
+        args.threads = args.threads or default_threads(args.workers)
+
+    if args.command == 'reload':
+        print(f"Reloaded; new master {reload(args.pid, args.timeout)}")
+    elif args.command == 'bench':
+        bench(args)
+    else:
+        # Torch in each worker takes cores // WEB_CONCURRENCY threads (pest_detection/runtime.py)
+        os.environ['WEB_CONCURRENCY'] = str(args.workers)
+        options = {
+            'bind': args.bind,
+            'workers': args.workers,
+            'threads': args.threads,
+            'pidfile': args.pid,
+            'timeout': args.timeout,
+            'graceful_timeout': args.graceful_timeout,
+            'max_requests': args.max_requests,
+            'max_requests_jitter': args.max_requests // 10,
+            'keepalive': 5,
+        }
+        if args.asgi:
+            # One event loop per worker; threads don't apply
+            options['worker_class'] = 'uvicorn_worker.UvicornWorker'
+            print(f"Serving asgi.py on {args.bind}: {args.workers} asyncio workers"
+                  + ("" if args.no_preload else ", preloaded"), flush=True)
+        else:
+            print(f"Serving on {args.bind}: {args.workers} workers x {args.threads} threads"
+                  + ("" if args.no_preload else ", preloaded"), flush=True)
+        application(not args.no_preload, options, asgi=args.asgi).run()
+
+if __name__ == '__main__':
+    main()
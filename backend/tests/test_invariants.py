@@ -0,0 +1,122 @@
+"""
+Invariants of the optimized paths against their straightforward versions:
+incremental rolling statistics, store downsampling, the compact forest and
+the pest model server's wire format. From backend/:
+
+    python -m pytest -q tests
+"""
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+
+from market.store import MarketStore, from_ordinals
+
+def price_rows(start, days, markets=('Azadpur', 'Ghazipur', 'Narela'), seed=0):
+    """Agmarknet-style rows: one row per day and market, with gaps."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for day in pd.date_range(start, periods=days):
+        for market in markets:
+            if rng.random() < 0.2:
+                continue
+            modal = float(rng.integers(1500, 2500))
+            rows.append({'State': 'Delhi', 'District': 'Delhi', 'Market': market, 'Commodity': 'Wheat',
+                         'Arrival_Date': day.strftime('%d/%m/%Y'), 'Min_Price': modal - rng.integers(0, 200),
+                         'Max_Price': modal + rng.integers(0, 200), 'Modal_Price': modal})
+    return pd.DataFrame(rows)
+
+def ingest(root, *frames):
+    os.makedirs(str(root), exist_ok=True)
+    store = MarketStore(str(root))
+    for i, frame in enumerate(frames):
+        path = os.path.join(str(root), f"dump{i}.csv")
+        frame.to_csv(path, index=False)
+        store.ingest_csv(path)
+    return store
+
+def test_rolling_incremental_matches_full_ingest(tmp_path):
+    rows = price_rows('2024-01-01', 200)
+    cut = rows['Arrival_Date'].map(lambda d: pd.to_datetime(d, dayfirst=True)) < pd.Timestamp('2024-05-01')
+    full = ingest(tmp_path / 'full', rows)
+    incremental = ingest(tmp_path / 'incremental', rows[cut], rows[~cut])
+    for market in (None, 'Azadpur', 'Narela'):
+        expected = full.rolling('wheat', 'Delhi', market)
+        actual = incremental.rolling('wheat', 'Delhi', market)
+        assert actual['as_of'] == expected['as_of']
+        for window, stats in expected['stats'].items():
+            assert actual['stats'][window]['days'] == stats['days']
+            for name in ('ma', 'volatility', 'min', 'max'):
+                assert actual['stats'][window][name] == pytest.approx(stats[name], abs=0.011)
+
+@pytest.mark.parametrize('freq, period', [('D', 'D'), ('W', 'W-SUN'), ('M', 'M')])
+def test_store_downsampling_matches_pandas(tmp_path, freq, period):
+    rows = price_rows('2024-01-01', 120, seed=1)
+    store = ingest(tmp_path, rows)
+    result = store.query('wheat', 'Delhi', freq=freq)
+
+    frame = rows.assign(date=pd.to_datetime(rows['Arrival_Date'], dayfirst=True))
+    expected = frame.groupby(frame['date'].dt.to_period(period).dt.start_time).agg(
+        min=('Min_Price', 'min'), max=('Max_Price', 'max'), modal=('Modal_Price', 'mean'),
+        count=('Modal_Price', 'size'))
+    assert list(from_ordinals(result['date'])) == list(expected.index.values.astype('datetime64[D]'))
+    np.testing.assert_allclose(result['min'], expected['min'])
+    np.testing.assert_allclose(result['max'], expected['max'])
+    np.testing.assert_allclose(result['modal'], expected['modal'], rtol=1e-6)
+    np.testing.assert_array_equal(result['count'], expected['count'])
+
+def test_compact_forest_agrees_with_sklearn(tmp_path):
+    from sklearn.datasets import make_classification
+    from sklearn.ensemble import RandomForestClassifier
+    from fertilizer.compact import CompactForest
+
+    X, y = make_classification(n_samples=2000, n_features=8, n_informative=6, n_classes=4, random_state=0)
+    model = RandomForestClassifier(n_estimators=30, max_depth=12, random_state=0).fit(X, y)
+    CompactForest.from_sklearn(model).save(str(tmp_path))
+    compact = CompactForest.load(str(tmp_path))
+
+    X = X.astype(np.float32)
+    # Leaf probabilities are quantized to 1/255, so only near-ties may flip
+    np.testing.assert_allclose(compact.predict_proba(X), model.predict_proba(X), atol=0.005)
+    assert np.mean(compact.predict(X) == model.predict(X)) >= 0.99
+
+class FakeDetector:
+    tier = 'fast'
+    input_size = (8, 6)
+
+    def classify_array(self, pixels):
+        if pixels.max() == 255:
+            raise ValueError("overexposed")
+        means = pixels.reshape(len(pixels), -1).mean(axis=1)
+        return [int(m) % 7 for m in means], [float(m) / 255 for m in means]
+
+@pytest.fixture
+def model_server(tmp_path):
+    pytest.importorskip('torch')  # server.py runs the real model
+    from pest_detection.server import PestModelServer
+    path = str(tmp_path / 'pest.sock')
+    server = PestModelServer(path, FakeDetector())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+def test_model_server_wire_round_trip(model_server):
+    from pest_detection.remote import OP_CLASSIFY, OP_INFO, RemotePestDetector
+
+    client = RemotePestDetector(model_server, timeout=5)
+    width, height = FakeDetector.input_size
+    pixels = np.random.default_rng(0).integers(0, 255, (5, height, width, 3), dtype=np.uint8)
+    indices, confidences = FakeDetector().classify_array(pixels)
+
+    assert client._call(OP_INFO) == 'fast'
+    predictions = client._call(OP_CLASSIFY, pixels)
+    assert [index for index, _ in predictions] == indices
+    np.testing.assert_allclose([confidence for _, confidence in predictions], confidences, rtol=1e-6)
+
+    # A server-side error comes back as a message, and the connection stays usable
+    with pytest.raises(RuntimeError, match='overexposed'):
+        client._call(OP_CLASSIFY, np.full((1, height, width, 3), 255, dtype=np.uint8))
+    client.ping()
+    assert client._call(OP_CLASSIFY, pixels[:2]) == predictions[:2]
@@ -54,7 +54,9 @@ const Recommendation = () => {
   const [marketData, setMarketData] = useState(null);
   const [marketLoading, setMarketLoading] = useState(false);
 
-  const [feedback, setFeedback] = useState({ feature: 'advisory', rating: 5, comments: '' });
+  // Rating of the learned model's suggestions (folded into the model, see backend/fertilizer/online.py)
+  const [modelResult, setModelResult] = useState(null);
+  const [feedback, setFeedback] = useState({ feature: 'recommendation', rating: 5, fertilizer: '' });
   const [feedbackLoading, setFeedbackLoading] = useState(false);
 
   // Location lists for dropdowns
@@ -254,16 +256,20 @@ const Recommendation = () => {
 
   // Feedback
   const submitFeedback = async () => {
-    if (!feedback.comments?.trim()) {
-      toast.error('Please enter your comments');
+    if (!modelResult || !feedback.fertilizer) {
+      toast.error('Please choose the fertilizer you applied');
       return;
     }
     setFeedbackLoading(true);
     try {
-      const res = await axios.post('http://localhost:5000/api/feedback', feedback);
+      const res = await axios.post('http://localhost:5000/api/feedback', {
+        ...feedback,
+        inputs: modelResult.inputs,
+        model_version: modelResult.version
+      });
       if (res.data.success) {
         toast.success('Thanks for your feedback!');
-        setFeedback(prev => ({ ...prev, comments: '' }));
+        setModelResult(null);
       } else {
         toast.error('Failed to submit feedback');
       }
@@ -302,6 +308,13 @@ const Recommendation = () => {
       
       if (response.data.success) {
         setRecommendations(response.data.recommendations);
+        const suggestions = response.data.model_suggestions || [];
+        setModelResult(suggestions.length ? {
+          suggestions,
+          inputs: response.data.inputs,
+          version: response.data.model_version
+        } : null);
+        setFeedback(prev => ({ ...prev, fertilizer: suggestions.length ? suggestions[0].fertilizer : '' }));
         setShowResults(true);
         toast.success('Recommendations generated successfully!');
       } else {
@@ -622,6 +635,34 @@ const Recommendation = () => {
                     </div>
                   ))
                 )}
+
+                {modelResult && (
+                  <div className="border rounded-lg p-4">
+                    <h3 className="font-semibold text-lg mb-2">Model Suggestions</h3>
+                    <ul className="text-sm mb-4">
+                      {modelResult.suggestions.map((s) => (
+                        <li key={s.fertilizer}>{s.fertilizer} ({s.confidence}%)</li>
+                      ))}
+                    </ul>
+                    <div className="grid md:grid-cols-3 gap-4">
+                      <div className="md:col-span-2">
+                        <label className="label">Fertilizer applied</label>
+                        <select className="input-field" value={feedback.fertilizer} onChange={(e) => setFeedback(prev => ({ ...prev, fertilizer: e.target.value }))}>
+                          {modelResult.suggestions.map((s) => (
+                            <option key={s.fertilizer} value={s.fertilizer}>{s.fertilizer}</option>
+                          ))}
+                        </select>
+                      </div>
+                      <div>
+                        <label className="label">Rating (1-5)</label>
+                        <input type="number" min="1" max="5" className="input-field" value={feedback.rating} onChange={(e) => setFeedback(prev => ({ ...prev, rating: Number(e.target.value) }))} />
+                      </div>
+                    </div>
+                    <div className="mt-4">
+                      <button onClick={submitFeedback} disabled={feedbackLoading} className="btn-secondary">{feedbackLoading ? '...' : 'Rate Suggestion'}</button>
+                    </div>
+                  </div>
+                )}
               </div>
             )}
           </div>
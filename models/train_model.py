@@ -5,133 +5,171 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
+import argparse
+import json
 import os
+import shutil
+import time
 
-def create_training_data():
-    """Create synthetic training data for fertilizer recommendation"""
-    
-    # Load existing datasets
-    soil_data = pd.read_csv('../datasets/soil_data.csv')
-    crop_data = pd.read_csv('../datasets/crop_data.csv')
-    fertilizer_data = pd.read_csv('../datasets/fertilizer_data.csv')
-    
-    # Create training dataset
-    training_data = []
-    
-    # Define fertilizer recommendations based on crop and soil conditions
-    fertilizer_mapping = {
-        'rice': ['Urea', 'DAP', 'MOP', 'NPK 10-26-26'],
-        'wheat': ['Urea', 'DAP', 'NPK 12-32-16', 'Zinc Sulphate'],
-        'corn': ['Urea', 'DAP', 'MOP', 'NPK 19-19-19'],
-        'soybean': ['DAP', 'MOP', 'NPK 14-35-14', 'Rhizobium'],
-        'cotton': ['Urea', 'DAP', 'MOP', 'NPK 12-32-16'],
-        'tomato': ['NPK 19-19-19', 'Calcium Nitrate', 'Magnesium Sulphate'],
-        'potato': ['NPK 15-15-15', 'MOP', 'Sulphur', 'Magnesium Sulphate'],
-        'sugarcane': ['Urea', 'SSP', 'MOP', 'Gypsum']
+DATASETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'datasets')
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CROPS = ['rice', 'wheat', 'corn', 'soybean', 'cotton', 'tomato', 'potato', 'sugarcane']
+
+# Fertilizer recommendations based on crop (used when no deficiency rule applies)
+FERTILIZER_MAPPING = {
+    'rice': ['Urea', 'DAP', 'MOP', 'NPK 10-26-26'],
+    'wheat': ['Urea', 'DAP', 'NPK 12-32-16', 'Zinc Sulphate'],
+    'corn': ['Urea', 'DAP', 'MOP', 'NPK 19-19-19'],
+    'soybean': ['DAP', 'MOP', 'NPK 14-35-14', 'Rhizobium'],
+    'cotton': ['Urea', 'DAP', 'MOP', 'NPK 12-32-16'],
+    'tomato': ['NPK 19-19-19', 'Calcium Nitrate', 'Magnesium Sulphate'],
+    'potato': ['NPK 15-15-15', 'MOP', 'Sulphur', 'Magnesium Sulphate'],
+    'sugarcane': ['Urea', 'SSP', 'MOP', 'Gypsum']
+}
+
+# Soil parameter distributions per crop: mean and std of ph, nitrogen, phosphorus, potassium
+SOIL_MEANS = np.array([
+    [6.0, 90, 50, 40],     # rice
+    [6.8, 120, 70, 55],    # wheat
+    [6.5, 150, 80, 70],    # corn
+    [6.5, 40, 60, 90],     # soybean
+    [7.0, 100, 55, 75],    # cotton
+    [6.5, 180, 90, 140],   # tomato
+    [5.8, 130, 70, 180],   # potato
+    [6.8, 200, 65, 90],    # sugarcane
+])
+SOIL_STDS = np.array([
+    [0.5, 20, 15, 10],
+    [0.4, 25, 20, 15],
+    [0.3, 30, 20, 15],
+    [0.4, 15, 20, 20],
+    [0.5, 25, 15, 20],
+    [0.3, 40, 25, 30],
+    [0.4, 30, 20, 40],
+    [0.4, 50, 20, 25],
+])
+SOIL_LIMITS = np.array([[4.5, 10, 5, 10], [8.5, 300, 150, 250]])
+
+# Deficiency rules, checked in order; the first match wins
+RULE_FERTILIZERS = ['Urea', 'DAP', 'MOP', 'Lime', 'Vermicompost']
+FERTILIZERS = sorted(set(RULE_FERTILIZERS).union(*FERTILIZER_MAPPING.values()))
+
+FEATURE_COLUMNS = ['soil_ph', 'nitrogen', 'phosphorus', 'potassium',
+                   'organic_matter', 'moisture', 'temperature']
+
+def generate_chunk(n_samples, rng):
+    """
+    `n_samples` synthetic rows as column arrays.
+
+    All samples are drawn at once, with each row's crop selecting its
+    distribution parameters, and the labelling rules are applied as
+    array masks.
+
+    Returns:
+        dict: crop_type and recommended_fertilizer as codes into CROPS and
+        FERTILIZERS (uint8), FEATURE_COLUMNS as float32
+    """
+    crop = rng.integers(0, len(CROPS), n_samples)
+    soil = np.clip(rng.normal(SOIL_MEANS[crop], SOIL_STDS[crop]), SOIL_LIMITS[0], SOIL_LIMITS[1])
+    ph, nitrogen, phosphorus, potassium = soil.T
+    organic_matter = np.clip(rng.normal(2.5, 0.8, n_samples), 0.5, 5.0)
+    moisture = np.clip(rng.normal(40, 10, n_samples), 20, 70)
+    temperature = np.clip(rng.normal(26, 4, n_samples), 15, 40)
+
+    # Otherwise a random pick from the crop's own fertilizers
+    codes = {name: i for i, name in enumerate(FERTILIZERS)}
+    width = max(len(v) for v in FERTILIZER_MAPPING.values())
+    choices = np.array([[codes[f] for f in FERTILIZER_MAPPING[c]] + [0] * (width - len(FERTILIZER_MAPPING[c]))
+                        for c in CROPS])
+    counts = np.array([len(FERTILIZER_MAPPING[c]) for c in CROPS])
+    fallback = choices[crop, (rng.random(n_samples) * counts[crop]).astype(np.int64)]
+    fertilizer = np.select(
+        [nitrogen < 80, phosphorus < 40, potassium < 60, ph < 6.0, organic_matter < 2.0],
+        [codes[f] for f in RULE_FERTILIZERS],
+        fallback
+    )
+
+    return {
+        'crop_type': crop.astype(np.uint8),
+        'soil_ph': np.round(ph, 2).astype(np.float32),
+        'nitrogen': np.round(nitrogen, 1).astype(np.float32),
+        'phosphorus': np.round(phosphorus, 1).astype(np.float32),
+        'potassium': np.round(potassium, 1).astype(np.float32),
+        'organic_matter': np.round(organic_matter, 2).astype(np.float32),
+        'moisture': np.round(moisture, 1).astype(np.float32),
+        'temperature': np.round(temperature, 1).astype(np.float32),
+        'recommended_fertilizer': fertilizer.astype(np.uint8)
     }
-    
-    # Generate synthetic data
-    crops = ['rice', 'wheat', 'corn', 'soybean', 'cotton', 'tomato', 'potato', 'sugarcane']
-    
-    for _ in range(5000):  # Generate 5000 samples
-        crop = np.random.choice(crops)
-        
-        # Generate soil parameters with some correlation to crop requirements
-        if crop in ['rice']:
-            ph = np.random.normal(6.0, 0.5)
-            nitrogen = np.random.normal(90, 20)
-            phosphorus = np.random.normal(50, 15)
-            potassium = np.random.normal(40, 10)
-        elif crop in ['wheat']:
-            ph = np.random.normal(6.8, 0.4)
-            nitrogen = np.random.normal(120, 25)
-            phosphorus = np.random.normal(70, 20)
-            potassium = np.random.normal(55, 15)
-        elif crop in ['corn']:
-            ph = np.random.normal(6.5, 0.3)
-            nitrogen = np.random.normal(150, 30)
-            phosphorus = np.random.normal(80, 20)
-            potassium = np.random.normal(70, 15)
-        elif crop in ['soybean']:
-            ph = np.random.normal(6.5, 0.4)
-            nitrogen = np.random.normal(40, 15)
-            phosphorus = np.random.normal(60, 20)
-            potassium = np.random.normal(90, 20)
-        elif crop in ['cotton']:
-            ph = np.random.normal(7.0, 0.5)
-            nitrogen = np.random.normal(100, 25)
-            phosphorus = np.random.normal(55, 15)
-            potassium = np.random.normal(75, 20)
-        elif crop in ['tomato']:
-            ph = np.random.normal(6.5, 0.3)
-            nitrogen = np.random.normal(180, 40)
-            phosphorus = np.random.normal(90, 25)
-            potassium = np.random.normal(140, 30)
-        elif crop in ['potato']:
-            ph = np.random.normal(5.8, 0.4)
-            nitrogen = np.random.normal(130, 30)
-            phosphorus = np.random.normal(70, 20)
-            potassium = np.random.normal(180, 40)
-        else:  # sugarcane
-            ph = np.random.normal(6.8, 0.4)
-            nitrogen = np.random.normal(200, 50)
-            phosphorus = np.random.normal(65, 20)
-            potassium = np.random.normal(90, 25)
-        
-        # Ensure values are within reasonable ranges
-        ph = np.clip(ph, 4.5, 8.5)
-        nitrogen = np.clip(nitrogen, 10, 300)
-        phosphorus = np.clip(phosphorus, 5, 150)
-        potassium = np.clip(potassium, 10, 250)
-        
-        organic_matter = np.random.normal(2.5, 0.8)
-        organic_matter = np.clip(organic_matter, 0.5, 5.0)
-        
-        moisture = np.random.normal(40, 10)
-        moisture = np.clip(moisture, 20, 70)
-        
-        temperature = np.random.normal(26, 4)
-        temperature = np.clip(temperature, 15, 40)
-        
-        # Select fertilizer based on crop and nutrient deficiencies
-        available_fertilizers = fertilizer_mapping[crop]
-        
-        # Simple rule-based selection
-        if nitrogen < 80:
-            fertilizer = 'Urea'
-        elif phosphorus < 40:
-            fertilizer = 'DAP'
-        elif potassium < 60:
-            fertilizer = 'MOP'
-        elif ph < 6.0:
-            fertilizer = 'Lime'
-        elif organic_matter < 2.0:
-            fertilizer = 'Vermicompost'
-        else:
-            fertilizer = np.random.choice(available_fertilizers)
-        
-        training_data.append({
-            'crop_type': crop,
-            'soil_ph': round(ph, 2),
-            'nitrogen': round(nitrogen, 1),
-            'phosphorus': round(phosphorus, 1),
-            'potassium': round(potassium, 1),
-            'organic_matter': round(organic_matter, 2),
-            'moisture': round(moisture, 1),
-            'temperature': round(temperature, 1),
-            'recommended_fertilizer': fertilizer
-        })
-    
-    return pd.DataFrame(training_data)
 
-def train_fertilizer_model():
+def write_training_data(directory, n_samples, seed=42, chunk_size=1_000_000):
+    """
+    Generate `n_samples` rows into a columnar dataset: one .npy file per
+    column plus meta.json with the category names, filled chunk by chunk.
+
+    Chunk i is drawn from its own stream spawned from `seed`, so the data
+    depends only on (n_samples, seed, chunk_size). The dataset replaces
+    any previous one at `directory` once it is complete.
+    """
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    n_chunks = max(1, -(-n_samples // chunk_size))
+    streams = np.random.SeedSequence(seed).spawn(n_chunks)
+    columns = None
+    for i, stream in enumerate(streams):
+        start, stop = i * chunk_size, min(n_samples, (i + 1) * chunk_size)
+        chunk = generate_chunk(stop - start, np.random.default_rng(stream))
+        if columns is None:
+            columns = {name: np.lib.format.open_memmap(os.path.join(tmp_dir, f"{name}.npy"), mode='w+',
+                                                       dtype=values.dtype, shape=(n_samples,))
+                       for name, values in chunk.items()}
+        for name, values in chunk.items():
+            columns[name][start:stop] = values
+    for column in columns.values():
+        column.flush()
+    del columns
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            "rows": n_samples,
+            "seed": seed,
+            "chunk_size": chunk_size,
+            "columns": ['crop_type'] + FEATURE_COLUMNS + ['recommended_fertilizer'],
+            "categories": {"crop_type": CROPS, "recommended_fertilizer": FERTILIZERS}
+        }, f, indent=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+
+def load_training_data(directory, mmap=True):
+    """Columnar dataset from write_training_data as a DataFrame (categorical text columns)."""
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    data = {}
+    for name in meta['columns']:
+        values = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r' if mmap else None)
+        if name in meta['categories']:
+            values = pd.Categorical.from_codes(values, meta['categories'][name])
+        data[name] = values
+    return pd.DataFrame(data)
+
+def create_training_data(n_samples=5000, seed=42):
+    """Create synthetic training data for fertilizer recommendation"""
+    frame = pd.DataFrame(generate_chunk(n_samples, np.random.default_rng(seed)))
+    frame['crop_type'] = np.array(CROPS)[frame['crop_type']]
+    frame['recommended_fertilizer'] = np.array(FERTILIZERS)[frame['recommended_fertilizer']]
+    # float32 -> float64 without the float32 representation noise
+    frame[FEATURE_COLUMNS] = frame[FEATURE_COLUMNS].astype(np.float64).round(2)
+    return frame
+
+def train_fertilizer_model(n_samples=5000, seed=42):
     """Train machine learning model for fertilizer recommendation"""
     
     print("Creating training data...")
-    df = create_training_data()
-    
-    # Save training data
-    df.to_csv('../datasets/training_data.csv', index=False)
+    data_dir = os.path.join(DATASETS_DIR, 'training_data')
+    write_training_data(data_dir, n_samples, seed=seed)
+    df = load_training_data(data_dir, mmap=False)
+    df['crop_type'] = df['crop_type'].astype(str)
+    df['recommended_fertilizer'] = df['recommended_fertilizer'].astype(str)
     print(f"Training data saved with {len(df)} samples")
     
     # Prepare features and target
@@ -159,7 +197,8 @@ def train_fertilizer_model():
         max_depth=15,
         min_samples_split=5,
         min_samples_leaf=2,
-        random_state=42
+        random_state=42,
+        n_jobs=-1
     )
     
     model.fit(X_train, y_train)
@@ -170,8 +209,8 @@ def train_fertilizer_model():
     
     print(f"Model Accuracy: {accuracy:.3f}")
     print("\nClassification Report:")
-    print(classification_report(y_test, y_pred, 
-                              target_names=fertilizer_encoder.classes_))
+    print(classification_report(y_test, y_pred, labels=np.arange(len(fertilizer_encoder.classes_)),
+                              target_names=fertilizer_encoder.classes_, zero_division=0))
     
     # Feature importance
     feature_names = feature_columns + ['crop_type']
@@ -184,11 +223,11 @@ def train_fertilizer_model():
     print(importance_df)
     
     # Save model and encoders
-    os.makedirs('../models', exist_ok=True)
+    os.makedirs(MODELS_DIR, exist_ok=True)
     
-    joblib.dump(model, '../models/fertilizer_model.pkl')
-    joblib.dump(crop_encoder, '../models/crop_encoder.pkl')
-    joblib.dump(fertilizer_encoder, '../models/fertilizer_encoder.pkl')
+    joblib.dump(model, os.path.join(MODELS_DIR, 'fertilizer_model.pkl'))
+    joblib.dump(crop_encoder, os.path.join(MODELS_DIR, 'crop_encoder.pkl'))
+    joblib.dump(fertilizer_encoder, os.path.join(MODELS_DIR, 'fertilizer_encoder.pkl'))
     
     print("\nModel and encoders saved successfully!")
     
@@ -233,8 +272,21 @@ def predict_fertilizer(model, crop_encoder, fertilizer_encoder,
         return None
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic data and train the fertilizer model")
+    parser.add_argument('--samples', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--generate-only', metavar='DIR', default=None,
+                        help="Only write the columnar dataset to DIR (e.g. for tens of millions of rows)")
+    args = parser.parse_args()
+    if args.generate_only:
+        started = time.perf_counter()
+        write_training_data(args.generate_only, args.samples, seed=args.seed, chunk_size=args.chunk_size)
+        print(f"Wrote {args.samples} rows to {args.generate_only} in {time.perf_counter() - started:.1f}s")
+        raise SystemExit(0)
+
     # Train the model
-    model, crop_encoder, fertilizer_encoder = train_fertilizer_model()
+    model, crop_encoder, fertilizer_encoder = train_fertilizer_model(args.samples, args.seed)
     
     # Test prediction
     print("\n" + "="*50)
@@ -8,8 +8,8 @@ $ErrorActionPreference = 'Stop'
 $projectRoot = Split-Path -Parent $MyInvocation.MyCommand.Path
 Write-Host "Project root: $projectRoot"
 
-# Backend: activate venv and run Flask API
-$backendCmd = "cd `"$projectRoot`"; . .\.venv\Scripts\Activate.ps1; python backend/app.py"
+# Backend: activate venv, publish a default fertilizer model if none is active, and run Flask API
+$backendCmd = "cd `"$projectRoot\backend`"; . ..\.venv\Scripts\Activate.ps1; python -m fertilizer.train --bootstrap; python app.py"
 Write-Host "Starting backend..."
 Start-Process PowerShell -ArgumentList '-NoExit','-Command', $backendCmd
 